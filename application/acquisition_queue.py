@@ -0,0 +1,270 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+import queue
+import threading
+import time
+
+from application.event_bus import event_bus, AcquisitionJobEvent
+from enums.enums import CameraMagnitude, CornerPosition, JobStatus, StitchingType
+from utils.logger import logger
+
+
+@dataclass
+class AcquisitionJob:
+    """撮影キューの1領域分の撮影条件と状態"""
+
+    start_position: Tuple[float, float]
+    grid_size_x: int
+    grid_size_y: int
+    magnitude: CameraMagnitude
+    stitching_type: StitchingType
+    corner: CornerPosition = CornerPosition.TOP_LEFT
+    job_id: int = 0
+    status: JobStatus = JobStatus.QUEUED
+    message: str = ""
+    output_path: Optional[str] = None
+    num_tiles: int = 0
+    submitted_at: datetime = field(default_factory=datetime.now)
+    acquire_s: float = 0.0
+    stitch_s: float = 0.0
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.CANCELLED)
+
+
+class AcquisitionQueue:
+    """
+    複数の領域を登録しておき、順番に無人で撮影・結合する
+
+    - 撮影スレッドは領域の開始位置に移動して StitchingController.acquire で撮影し、結合スレッドに渡す
+    - 結合スレッドは StitchingController.stitch_acquisition で結合・保存する。次の領域の撮影と並行して動く
+    - 結合待ちの領域は max_pending_stitch までで、超えると撮影スレッドが待つ (保持するタイルの上限)
+    - 対物レンズは手動で切り替えるため、倍率が変わるジョブの前で WAITING を発行し confirm_objective を待つ
+    - ジョブの状態は AcquisitionJobEvent で発行する
+    """
+
+    def __init__(self, config: Dict[str, Any], controller_service, stitching_controller):
+        queue_config = config.get("stitching", {}).get("acquisition_queue", {}) or {}
+        self.max_pending_stitch = max(1, queue_config.get("max_pending_stitch", 2))
+        self.save_tiles = queue_config.get("save_tiles", True)
+
+        self.controller_service = controller_service
+        self.stitching_controller = stitching_controller
+
+        self._jobs: List[AcquisitionJob] = []
+        self._pending: Deque[AcquisitionJob] = deque()
+        self._condition = threading.Condition()
+        self._next_id = 1
+        self._running = False
+        self._current_magnitude: Optional[CameraMagnitude] = None
+        self._acquire_thread: Optional[threading.Thread] = None
+        self._stitch_thread: Optional[threading.Thread] = None
+        self._started_at = 0.0
+        self._completed: List[AcquisitionJob] = []
+
+    @property
+    def is_running(self) -> bool:
+        return self._running
+
+    def jobs(self) -> List[AcquisitionJob]:
+        """登録された全ジョブ (終了したものを含む) の一覧"""
+        with self._condition:
+            return list(self._jobs)
+
+    def remaining(self) -> int:
+        """終了していないジョブの数"""
+        with self._condition:
+            return sum(1 for job in self._jobs if not job.is_finished)
+
+    def submit(self, job: AcquisitionJob) -> int:
+        """ジョブを登録してjob_idを返す (実行中なら順番が来たときに撮影する)"""
+        with self._condition:
+            job.job_id = self._next_id
+            self._next_id += 1
+            job.status = JobStatus.QUEUED
+            self._jobs.append(job)
+            self._pending.append(job)
+            self._condition.notify_all()
+        self._publish(job, f"Queued {job.grid_size_x}x{job.grid_size_y} {job.magnitude.value} at {job.start_position}")
+        return job.job_id
+
+    def cancel(self, job_id: int) -> bool:
+        """撮影を始めていないジョブを取り消す"""
+        with self._condition:
+            job = next((job for job in self._pending if job.job_id == job_id), None)
+            if job is None:
+                return False
+            self._pending.remove(job)
+            job.status = JobStatus.CANCELLED
+            self._condition.notify_all()
+        self._publish(job, "Cancelled")
+        return True
+
+    def start(self, current_magnitude: Optional[CameraMagnitude] = None) -> bool:
+        """
+        キューの処理を始める
+        param current_magnitude: 現在の対物レンズの倍率。異なる倍率のジョブは切り替えの確認を待つ (Noneなら最初のジョブの倍率とみなす)
+        """
+        with self._condition:
+            if self._running:
+                return False
+            self._running = True
+            self._current_magnitude = current_magnitude
+            self._started_at = time.perf_counter()
+            self._completed = []
+            # 前回の停止時に切り替え待ちだったジョブは、改めて確認を求める
+            for job in self._pending:
+                job.status = JobStatus.QUEUED
+        # 停止直後に再開しても前回のスレッドと混ざらないように、キューは実行ごとに作る
+        stitch_queue = queue.Queue(maxsize=self.max_pending_stitch)
+        self._acquire_thread = threading.Thread(
+            target=self._acquire_loop, args=(stitch_queue,), name="AcquisitionQueue-acquire", daemon=True
+        )
+        self._stitch_thread = threading.Thread(
+            target=self._stitch_loop, args=(stitch_queue,), name="AcquisitionQueue-stitch", daemon=True
+        )
+        self._acquire_thread.start()
+        self._stitch_thread.start()
+        return True
+
+    def stop(self, cancel_pending: bool = True):
+        """
+        撮影中の領域を撮り終えたら停止する。撮影済みの領域は結合まで行う
+        param cancel_pending: Trueなら未撮影のジョブを取り消す (Falseなら次回のstartまで残す)
+        """
+        cancelled = []
+        with self._condition:
+            self._running = False
+            if cancel_pending:
+                while self._pending:
+                    job = self._pending.popleft()
+                    job.status = JobStatus.CANCELLED
+                    cancelled.append(job)
+            self._condition.notify_all()
+        for job in cancelled:
+            self._publish(job, "Cancelled")
+
+    def confirm_objective(self, magnitude: CameraMagnitude):
+        """対物レンズを切り替えたことを通知し、その倍率のジョブの撮影を再開する"""
+        with self._condition:
+            self._current_magnitude = magnitude
+            self._condition.notify_all()
+
+    def _next_job(self) -> Optional[AcquisitionJob]:
+        """次に撮影するジョブを取り出す。倍率が変わる場合は切り替えの確認を待つ (停止したらNone)"""
+        while True:
+            with self._condition:
+                while self._running and (not self._pending or self._is_waiting_objective(self._pending[0])):
+                    self._condition.wait()
+                if not self._running:
+                    return None
+
+                job = self._pending[0]
+                if self._current_magnitude is None or job.magnitude == self._current_magnitude:
+                    self._pending.popleft()
+                    self._current_magnitude = job.magnitude
+                    job.status = JobStatus.ACQUIRING
+                    return job
+                job.status = JobStatus.WAITING
+            # 購読者がconfirm_objectiveを呼べるように、ロックの外で発行する
+            self._publish(job, f"Switch the objective to {job.magnitude.value}")
+
+    def _is_waiting_objective(self, job: AcquisitionJob) -> bool:
+        return job.status == JobStatus.WAITING and job.magnitude != self._current_magnitude
+
+    def _acquire_loop(self, stitch_queue: queue.Queue):
+        try:
+            while True:
+                job = self._next_job()
+                if job is None:
+                    break
+                acquisition = self._acquire(job)
+                if acquisition is not None:
+                    # 結合が追いつかない場合はここで待つ
+                    stitch_queue.put((job, acquisition))
+        finally:
+            stitch_queue.put(None)
+
+    def _acquire(self, job: AcquisitionJob) -> Optional[Dict[str, Any]]:
+        self._publish(job, "Acquiring...")
+        start = time.perf_counter()
+        try:
+            x, y = job.start_position
+            if not self.controller_service.is_valid_movement(x, y, is_relative=False):
+                self._finish(job, JobStatus.FAILED, "Start position exceeds movement limits")
+                return None
+            self.controller_service.move_to(x, y, is_relative=False)
+            acquisition = self.stitching_controller.acquire(
+                job.grid_size_x, job.grid_size_y, job.magnitude, job.corner, job.stitching_type
+            )
+        except Exception as e:
+            self._finish(job, JobStatus.FAILED, f"Acquisition failed: {str(e)}")
+            return None
+
+        job.acquire_s = time.perf_counter() - start
+        if acquisition is None:
+            self._finish(job, JobStatus.FAILED, "Acquisition failed")
+            return None
+        job.num_tiles = len(acquisition["images"])
+        logger.info(f"Job {job.job_id}: captured {job.num_tiles} tiles in {job.acquire_s:.1f}s")
+        return acquisition
+
+    def _stitch_loop(self, stitch_queue: queue.Queue):
+        while True:
+            item = stitch_queue.get()
+            if item is None:
+                break
+            job, acquisition = item
+            self._stitch(job, acquisition)
+        self._log_summary()
+
+    def _stitch(self, job: AcquisitionJob, acquisition: Dict[str, Any]):
+        job.status = JobStatus.STITCHING
+        self._publish(job, f"Stitching {job.num_tiles} tiles...")
+        start = time.perf_counter()
+        folder_name = f"job_{job.job_id:03d}_{job.submitted_at.strftime('%Y%m%d_%H%M%S')}"
+        try:
+            output_path = self.stitching_controller.stitch_acquisition(
+                acquisition, job.stitching_type, folder_name, self.save_tiles
+            )
+        except Exception as e:
+            output_path = None
+            logger.error(f"Job {job.job_id}: stitching failed: {e}")
+        job.stitch_s = time.perf_counter() - start
+
+        if output_path is None:
+            self._finish(job, JobStatus.FAILED, "Stitching failed")
+            return
+        job.output_path = output_path
+        self._completed.append(job)
+        self._finish(job, JobStatus.COMPLETED, f"Saved to {output_path}")
+
+    def _finish(self, job: AcquisitionJob, status: JobStatus, message: str):
+        job.status = status
+        self._publish(job, message)
+
+    def _publish(self, job: AcquisitionJob, message: str):
+        job.message = message
+        event_bus.publish(AcquisitionJobEvent(
+            job_id=job.job_id,
+            status=job.status,
+            message=message,
+            remaining=self.remaining(),
+            output_path=job.output_path,
+        ))
+
+    def _log_summary(self):
+        """撮影キューのスループットをログに出力する (結合を撮影と並行したことで短縮された時間を含む)"""
+        finished = self._completed
+        if not finished:
+            return
+        elapsed = time.perf_counter() - self._started_at
+        sequential = sum(job.acquire_s + job.stitch_s for job in finished)
+        tiles = sum(job.num_tiles for job in finished)
+        logger.info(
+            f"Acquisition queue finished: {len(finished)} jobs, {tiles} tiles in {elapsed:.1f}s "
+            f"({tiles / max(elapsed, 1e-6) * 3600:.0f} tiles/h, sequential estimate {sequential:.1f}s)"
+        )
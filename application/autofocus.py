@@ -0,0 +1,141 @@
+from typing import Any, Dict, Optional
+import math
+import time
+
+import numpy as np
+
+from service.focus_measure import FocusMeasure
+from utils.logger import logger
+
+
+class Autofocus:
+    """
+    Z軸を動かして合焦度が最大になる位置を探す
+
+    - 粗い探索: 中心の前後 search_range_mm を coarse_steps 点で評価する
+      最良点が範囲の端なら、その点を中心に max_extensions 回まで探索し直す
+    - 細かい探索: 粗い探索の最良点の両隣の範囲を黄金分割探索で tolerance_mm まで絞り込む
+      (合焦度は焦点の近くでは単峰なので、評価回数は範囲の対数に比例する)
+    - 各評価は Z の移動・撮影・合焦度の計算 (FocusMeasure) で、同じパルス位置は再評価しない
+    - バックラッシュの影響を避けるため、下向きに移動するときは approach_mm だけ行き過ぎてから上向きに戻る
+    """
+
+    GOLDEN_RATIO = (math.sqrt(5) - 1) / 2
+
+    def __init__(self, config: Dict[str, Any], z_axis_service, image_service):
+        autofocus_config = config.get("autofocus", {}) or {}
+        self.search_range_mm = autofocus_config.get("search_range_mm", 0.1)
+        self.coarse_steps = max(3, autofocus_config.get("coarse_steps", 9))
+        self.tolerance_mm = autofocus_config.get("tolerance_mm", 0.001)
+        self.approach_mm = autofocus_config.get("approach_mm", 0.01)
+        self.max_extensions = autofocus_config.get("max_extensions", 2)
+        self.measure = FocusMeasure(config)
+
+        self.z_axis_service = z_axis_service
+        self.image_service = image_service
+        self._scores: Dict[int, float] = {}
+
+    @property
+    def available(self) -> bool:
+        return self.z_axis_service is not None
+
+    def run(self, center: Optional[float] = None, search_range_mm: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        合焦位置を探してそこへ移動する
+        param center: 探索範囲の中心 (Noneなら現在位置)
+        param search_range_mm: 探索範囲の幅 (Noneなら設定値)
+
+        return {"z", "score", "evaluations", "elapsed_s", "at_edge"}
+            at_edge: 探索し直しても最良点が探索範囲の端 (焦点が範囲外にある可能性がある)
+            Z軸がない場合や撮影に失敗した場合はNone
+        """
+        if not self.available:
+            return None
+        start_time = time.perf_counter()
+        self._scores = {}
+        if center is None:
+            center = self.z_axis_service.get_current_position()
+        half_range = (search_range_mm if search_range_mm is not None else self.search_range_mm) / 2
+
+        # 粗い探索 (下から順に評価するので移動の向きは変わらない)
+        # 最良点が範囲の端 (Z軸の移動範囲の端を除く) なら、そこを中心に探索し直す
+        for _ in range(self.max_extensions + 1):
+            low = max(center - half_range, self.z_axis_service.z_min)
+            high = min(center + half_range, self.z_axis_service.z_max)
+            coarse = np.linspace(low, high, self.coarse_steps)
+            scores = []
+            for z in coarse:
+                score = self.evaluate(float(z))
+                if score is None:
+                    return None
+                scores.append(score)
+            best = int(np.argmax(scores))
+            at_edge = (best == 0 and low > self.z_axis_service.z_min) or \
+                (best == len(coarse) - 1 and high < self.z_axis_service.z_max)
+            if not at_edge:
+                break
+            center = float(coarse[best])
+
+        # 黄金分割探索
+        a, b = float(coarse[max(best - 1, 0)]), float(coarse[min(best + 1, len(coarse) - 1)])
+        c, d = b - self.GOLDEN_RATIO * (b - a), a + self.GOLDEN_RATIO * (b - a)
+        score_c, score_d = self.evaluate(c), self.evaluate(d)
+        while score_c is not None and score_d is not None and b - a > self.tolerance_mm:
+            if score_c >= score_d:
+                b, d, score_d = d, c, score_c
+                c = b - self.GOLDEN_RATIO * (b - a)
+                score_c = self.evaluate(c)
+            else:
+                a, c, score_c = c, d, score_d
+                d = a + self.GOLDEN_RATIO * (b - a)
+                score_d = self.evaluate(d)
+        if score_c is None or score_d is None:
+            return None
+
+        # 評価した中で最良の位置へ移動する
+        pulses, score = max(self._scores.items(), key=lambda item: item[1])
+        z = pulses / self.z_axis_service.pulses_per_mm
+        self.move_to(z)
+        result = {
+            "z": z,
+            "score": score,
+            "evaluations": len(self._scores),
+            "elapsed_s": time.perf_counter() - start_time,
+            "at_edge": at_edge,
+        }
+        logger.info(
+            f"Autofocus: z={z:.4f} mm (score {score:.1f}), {result['evaluations']} evaluations "
+            f"in {result['elapsed_s']:.2f}s, range {low:.4f}-{high:.4f} mm"
+        )
+        if at_edge:
+            logger.warning("Autofocus: best focus is at the edge of the search range")
+        return result
+
+    def evaluate(self, z: float) -> Optional[float]:
+        """Zへ移動して撮影し、合焦度を返す。撮影に失敗した場合はNone"""
+        pulses = int(round(z * self.z_axis_service.pulses_per_mm))
+        if pulses in self._scores:
+            return self._scores[pulses]
+        self.move_to(pulses / self.z_axis_service.pulses_per_mm)
+        score = self.measure_current()
+        if score is not None:
+            self._scores[pulses] = score
+        return score
+
+    def measure_current(self) -> Optional[float]:
+        """現在のZで撮影した画像の合焦度。撮影に失敗した場合はNone"""
+        frame = self.image_service.capture(refresh=True)
+        if frame is None:
+            return None
+        try:
+            return self.measure.measure(frame)
+        finally:
+            frame.release()
+
+    def move_to(self, z: float):
+        """Zへ移動する (移動範囲に収める。下向きの場合はapproach_mmだけ行き過ぎてから戻る)"""
+        z = min(max(z, self.z_axis_service.z_min), self.z_axis_service.z_max)
+        current = self.z_axis_service.get_current_position()
+        if self.approach_mm > 0 and z < current:
+            self.z_axis_service.move_to(max(z - self.approach_mm, self.z_axis_service.z_min))
+        self.z_axis_service.move_to(z)
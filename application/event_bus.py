@@ -1,9 +1,12 @@
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Any, Callable, Dict, List
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
 import threading
-from enums.enums import ProgressStatus
+import time
+from enums.enums import DeliveryPolicy, DispatchMode, JobStatus, OverflowPolicy, ProgressStatus
 from utils.logger import logger
+from .event_bus_metrics import EventBusMetrics
 
 
 @dataclass
@@ -11,6 +14,21 @@ class ImageCaptureEvent:
     image_data: Any
     timestamp: datetime
     is_stitched_image: bool = False
+    # image_dataの元になった共有フレーム (utils.frame.Frame)。保持する場合はacquire()する
+    frame: Optional[Any] = None
+
+    def is_droppable(self) -> bool:
+        """スティッチング結果は間引かずに必ず配信する"""
+        return not self.is_stitched_image
+
+    def retain(self):
+        """非同期配信でキューに積まれている間、フレームが返却されないよう参照を保持する"""
+        if self.frame is not None:
+            self.frame.acquire()
+
+    def release(self):
+        if self.frame is not None:
+            self.frame.release()
 
 
 @dataclass
@@ -40,6 +58,10 @@ class StitchingProgressEvent:
     progress_message: str
     status: ProgressStatus = ProgressStatus.IN_PROGRESS
 
+    def is_droppable(self) -> bool:
+        """完了・失敗などの状態遷移は間引かずに必ず配信する"""
+        return self.status == ProgressStatus.IN_PROGRESS
+
 
 @dataclass
 class PositionUpdateEvent:
@@ -47,37 +69,510 @@ class PositionUpdateEvent:
     y: float
 
 
+@dataclass
+class AcquisitionJobEvent:
+    job_id: int
+    status: JobStatus
+    message: str = ""
+    # 終了していないジョブの数 (0ならキューの処理が終わった)
+    remaining: int = 0
+    # 完了したジョブの結合画像の保存先
+    output_path: Optional[str] = None
+
+    def is_droppable(self) -> bool:
+        """ジョブの状態遷移は間引かずに必ず配信する"""
+        return False
+
+
+# config.yamlのイベント名からイベント型を引くためのテーブル
+EVENT_TYPES: Dict[str, type] = {
+    event_type.__name__: event_type
+    for event_type in (
+        ImageCaptureEvent,
+        ErrorEvent,
+        StartMoveEvent,
+        StopMoveEvent,
+        MoveToEvent,
+        StitchingProgressEvent,
+        PositionUpdateEvent,
+        AcquisitionJobEvent,
+    )
+}
+
+
+class _Subscription:
+    """Per-subscriber delivery state used for conflation, rate limiting and asynchronous dispatch"""
+
+    def __init__(
+        self,
+        callback: Callable,
+        queue_size: int,
+        overflow_policy: OverflowPolicy,
+        uses_bus_queue_size: bool = True,
+        uses_bus_overflow_policy: bool = True,
+    ):
+        self.callback = callback
+        self.lock = threading.Lock()
+        self.busy = False
+        self.pending = None
+        self.last_delivery = 0.0
+        # レート制限で間引いたイベントのうち最新のもの (間隔が空いた時点でtrailing_timerが配信する)
+        self.trailing = None
+        self.trailing_timer: Optional[threading.Timer] = None
+
+        # 非同期配信用のキューとワーカー
+        self.queue_size = queue_size
+        self.overflow_policy = overflow_policy
+        # subscribeで指定しなかった設定は、set_dispatch_modeでバス全体の設定を変えると追従する
+        self.uses_bus_queue_size = uses_bus_queue_size
+        self.uses_bus_overflow_policy = uses_bus_overflow_policy
+        self.queue: Deque[Any] = deque()
+        self.condition = threading.Condition(self.lock)
+        self.worker: Optional[threading.Thread] = None
+        self.stopped = False
+
+    @property
+    def name(self) -> str:
+        return getattr(self.callback, "__qualname__", repr(self.callback))
+
+
+def _is_droppable(event) -> bool:
+    is_droppable = getattr(event, "is_droppable", None)
+    return not callable(is_droppable) or is_droppable()
+
+
+def _retain(event):
+    """キューに積む間、イベントが参照する共有リソース(フレームなど)を保持する"""
+    retain = getattr(event, "retain", None)
+    if callable(retain):
+        retain()
+
+
+def _release(event):
+    release = getattr(event, "release", None)
+    if callable(release):
+        release()
+
+
 class EventBus:
+    DEFAULT_QUEUE_SIZE = 16
+
     def __init__(self):
-        self._subscribers: Dict[type, List[Callable]] = {}
+        self._subscribers: Dict[type, List[_Subscription]] = {}
+        self._policies: Dict[type, Tuple[DeliveryPolicy, Optional[float]]] = {}
         self._lock = threading.Lock()
+        self.metrics = EventBusMetrics()
+
+        self._dispatch_mode = DispatchMode.SYNC
+        self._queue_size = self.DEFAULT_QUEUE_SIZE
+        self._overflow_policy = OverflowPolicy.DROP_OLDEST
 
-    def subscribe(self, event_type: type, callback: Callable):
+    def subscribe(
+        self,
+        event_type: type,
+        callback: Callable,
+        queue_size: Optional[int] = None,
+        overflow_policy: Optional[OverflowPolicy] = None,
+    ):
+        """
+        イベントを購読する
+        param queue_size: 非同期配信時のこの購読者のキュー長 (Noneの場合はバス全体の設定)
+        param overflow_policy: 非同期配信時のキューあふれ時の動作 (Noneの場合はバス全体の設定)
+        """
         with self._lock:
+            subscription = _Subscription(
+                callback,
+                queue_size or self._queue_size,
+                overflow_policy or self._overflow_policy,
+                uses_bus_queue_size=queue_size is None,
+                uses_bus_overflow_policy=overflow_policy is None,
+            )
             if event_type not in self._subscribers:
                 self._subscribers[event_type] = []
-            self._subscribers[event_type].append(callback)
+            self._subscribers[event_type].append(subscription)
+            if self._dispatch_mode == DispatchMode.ASYNC:
+                self._start_worker(subscription)
 
     def unsubscribe(self, event_type: type, callback: Callable):
+        removed = None
         with self._lock:
             if event_type in self._subscribers:
-                if callback in self._subscribers[event_type]:
-                    self._subscribers[event_type].remove(callback)
+                for subscription in self._subscribers[event_type]:
+                    if subscription.callback == callback:
+                        self._subscribers[event_type].remove(subscription)
+                        removed = subscription
+                        break
+        if removed is not None:
+            self._cancel_trailing(removed)
+            self._stop_worker(removed)
+
+    def set_delivery_policy(self, event_type: type, policy: DeliveryPolicy, max_rate_hz: Optional[float] = None):
+        """
+        イベント型ごとの配信ポリシーを設定する
+        param event_type: 対象のイベント型
+        param policy: DELIVER_ALL(全件配信) / LATEST_ONLY(最新のみ) / RATE_LIMITED(最大max_rate_hzで配信)
+        param max_rate_hz: RATE_LIMITEDのときの購読者ごとの最大配信レート (間引いたイベントのうち最新のものは間隔が空いた時点で配信する)
+        """
+        if policy == DeliveryPolicy.RATE_LIMITED and (max_rate_hz is None or max_rate_hz <= 0):
+            raise ValueError(f"max_rate_hz must be positive for {policy.value} ({event_type.__name__})")
+        with self._lock:
+            self._policies[event_type] = (policy, max_rate_hz if policy == DeliveryPolicy.RATE_LIMITED else None)
+
+    def get_delivery_policy(self, event_type: type) -> DeliveryPolicy:
+        with self._lock:
+            return self._policies.get(event_type, (DeliveryPolicy.DELIVER_ALL, None))[0]
+
+    def set_dispatch_mode(
+        self,
+        mode: DispatchMode,
+        queue_size: Optional[int] = None,
+        overflow_policy: Optional[OverflowPolicy] = None,
+    ):
+        """
+        配信モードを切り替える
+        SYNC: publishを呼んだスレッドで全購読者のコールバックを実行する
+        ASYNC: 購読者ごとのキューに積んで即座に返り、購読者ごとのワーカースレッドで実行する
+            コールバックは発行元ともGUIのスレッドとも別のスレッドで呼ばれるため、購読者はスレッドセーフであること
+            (Tkのウィジェットを操作する購読者は、MicroscopeGUI._on_gui_thread のようにTkのスレッドへ処理を渡す)
+        queue_size・overflow_policy は、モードが変わらない場合も購読時に指定しなかった既存の購読者に反映する
+        """
+        if queue_size is not None and queue_size < 1:
+            raise ValueError(f"queue_size must be at least 1, got {queue_size}")
+
+        with self._lock:
+            if queue_size is not None:
+                self._queue_size = queue_size
+            if overflow_policy is not None:
+                self._overflow_policy = overflow_policy
+            previous_mode = self._dispatch_mode
+            self._dispatch_mode = mode
+            subscriptions = [sub for subs in self._subscribers.values() for sub in subs]
+            for subscription in subscriptions:
+                with subscription.condition:
+                    if subscription.uses_bus_queue_size:
+                        subscription.queue_size = self._queue_size
+                    if subscription.uses_bus_overflow_policy:
+                        subscription.overflow_policy = self._overflow_policy
+                    # BLOCKで待っている発行元に、キュー長・ポリシーの変更を確認させる
+                    subscription.condition.notify_all()
+
+        if mode == previous_mode:
+            return
+        for subscription in subscriptions:
+            if mode == DispatchMode.ASYNC:
+                with self._lock:
+                    self._start_worker(subscription)
+            else:
+                # キューに残っているイベントを配信してからワーカーを止める
+                self._stop_worker(subscription, drain=True)
+
+    def get_dispatch_mode(self) -> DispatchMode:
+        with self._lock:
+            return self._dispatch_mode
+
+    def configure(self, config: Dict[str, Any]):
+        """config.yamlのevent_busセクションから配信ポリシー・配信モード・計測設定を設定する"""
+        bus_config = config.get("event_bus", {}) or {}
+        metrics_config = bus_config.get("metrics", {}) or {}
+        self.metrics.slow_callback_ms = metrics_config.get("slow_callback_ms", self.metrics.slow_callback_ms)
+        self.metrics.rate_window_s = metrics_config.get("rate_window_s", self.metrics.rate_window_s)
+
+        policies = bus_config.get("delivery_policies", {}) or {}
+        for event_name, setting in policies.items():
+            event_type = EVENT_TYPES.get(event_name)
+            if event_type is None:
+                logger.warning(f"Unknown event type in event_bus.delivery_policies: {event_name}")
+                continue
+            try:
+                policy = DeliveryPolicy(setting.get("policy", DeliveryPolicy.DELIVER_ALL.value))
+                self.set_delivery_policy(event_type, policy, setting.get("max_rate_hz"))
+            except ValueError as e:
+                logger.warning(f"Invalid delivery policy for {event_name}: {e}")
+
+        try:
+            self.set_dispatch_mode(
+                DispatchMode(bus_config.get("dispatch_mode", DispatchMode.SYNC.value)),
+                bus_config.get("queue_size"),
+                OverflowPolicy(bus_config.get("overflow_policy", OverflowPolicy.DROP_OLDEST.value)),
+            )
+        except ValueError as e:
+            logger.warning(f"Invalid event_bus dispatch settings: {e}")
 
     def publish(self, event):
         event_type = type(event)
         with self._lock:
             subscribers = self._subscribers.get(event_type, []).copy()
+            policy, max_rate_hz = self._policies.get(event_type, (DeliveryPolicy.DELIVER_ALL, None))
+            is_async = self._dispatch_mode == DispatchMode.ASYNC
+        self._count(event_type, "published")
 
-        for callback in subscribers:
-            try:
-                callback(event)
-            except Exception as e:
-                logger.error(f"Error in event callback for {event_type.__name__}: {e}", exc_info=True)
+        # 完了通知などの間引いてはいけないイベントは常に全件配信する
+        if policy != DeliveryPolicy.DELIVER_ALL and not _is_droppable(event):
+            policy = DeliveryPolicy.DELIVER_ALL
+
+        for subscription in subscribers:
+            if is_async and subscription.worker is not None:
+                self._enqueue(subscription, event, policy, max_rate_hz)
+            elif policy == DeliveryPolicy.DELIVER_ALL:
+                self._invoke(subscription, event)
+            else:
+                self._deliver_latest(subscription, event, policy, max_rate_hz)
+
+    def _rate_limited(self, subscription: _Subscription, event, policy: DeliveryPolicy, max_rate_hz: Optional[float]) -> bool:
+        """
+        前回配信から1/max_rate_hz秒以内ならイベントを保持してTrueを返す (subscription.lockを保持した状態で呼ぶ)
+        保持したイベントは間隔が空いた時点で配信する (発行が止まっても最後のイベントが配信されないままにならないように)
+        """
+        if max_rate_hz is None:
+            return False
+        now = time.monotonic()
+        wait = subscription.last_delivery + 1.0 / max_rate_hz - now
+        if wait > 0:
+            replaced = subscription.trailing
+            _retain(event)
+            subscription.trailing = event
+            if replaced is not None:
+                _release(replaced)
+                self._count(type(replaced), "dropped")
+            if subscription.trailing_timer is None:
+                subscription.trailing_timer = threading.Timer(
+                    wait, self._deliver_trailing, args=(subscription, policy, max_rate_hz)
+                )
+                subscription.trailing_timer.daemon = True
+                subscription.trailing_timer.start()
+            return True
+
+        subscription.last_delivery = now
+        # 保持していたイベントより新しいイベントを配信するため、保持していたイベントは破棄する
+        if subscription.trailing is not None:
+            _release(subscription.trailing)
+            self._count(type(subscription.trailing), "dropped")
+            subscription.trailing = None
+        return False
+
+    def _deliver_trailing(self, subscription: _Subscription, policy: DeliveryPolicy, max_rate_hz: float):
+        """レート制限で保持したイベントを配信する (trailing_timerのスレッドで呼ばれる)"""
+        with subscription.lock:
+            event = subscription.trailing
+            subscription.trailing = None
+            subscription.trailing_timer = None
+        if event is None:
+            return
+        try:
+            # まだ間隔が空いていなければ、_rate_limitedが再び保持して配信を予約する
+            if subscription.worker is not None:
+                self._enqueue(subscription, event, policy, max_rate_hz)
+            else:
+                self._deliver_latest(subscription, event, policy, max_rate_hz)
+        finally:
+            _release(event)
+
+    def _cancel_trailing(self, subscription: _Subscription):
+        """購読解除した購読者に保持していたイベントを配信しないようにする"""
+        with subscription.lock:
+            timer, event = subscription.trailing_timer, subscription.trailing
+            subscription.trailing_timer = None
+            subscription.trailing = None
+        if timer is not None:
+            timer.cancel()
+        if event is not None:
+            _release(event)
+
+    def _deliver_latest(self, subscription: _Subscription, event, policy: DeliveryPolicy, max_rate_hz: Optional[float]):
+        """
+        購読者がコールバック処理中なら最新のイベントだけを保持し、処理完了後に配信する
+        max_rate_hzが指定されている場合は、前回配信から1/max_rate_hz秒以内のイベントは最新のものだけを保持し、間隔が空いた時点で配信する
+        保持したイベントは発行元がpublishから戻った後に配信されるため、共有フレームの参照を保持する
+        """
+        with subscription.lock:
+            if self._rate_limited(subscription, event, policy, max_rate_hz):
+                return
+
+            deferred = subscription.busy
+            if deferred:
+                # 未配信のイベントは新しいイベントで上書きする
+                replaced = subscription.pending
+                _retain(event)
+                subscription.pending = event
+                if replaced is not None:
+                    self._count(type(replaced), "conflated")
+            else:
+                subscription.busy = True
+        if deferred:
+            if replaced is not None:
+                _release(replaced)
+            return
+
+        retained = False
+        while event is not None:
+            self._invoke(subscription, event)
+            if retained:
+                _release(event)
+            with subscription.lock:
+                event = subscription.pending
+                subscription.pending = None
+                if event is None:
+                    subscription.busy = False
+            retained = True
+
+    def _enqueue(self, subscription: _Subscription, event, policy: DeliveryPolicy, max_rate_hz: Optional[float]):
+        """購読者のキューにイベントを積む。キューがあふれた場合はoverflow_policyに従う"""
+        event_type = type(event)
+        droppable = _is_droppable(event)
+        with subscription.condition:
+            if subscription.stopped:
+                return
+            if droppable and self._rate_limited(subscription, event, policy, max_rate_hz):
+                return
+
+            if droppable and policy != DeliveryPolicy.DELIVER_ALL:
+                # 最新値のみ配信: キュー内の未配信イベントは新しいイベントで置き換える
+                stale = [queued for queued in subscription.queue if _is_droppable(queued)]
+                for queued in stale:
+                    subscription.queue.remove(queued)
+                    _release(queued)
+                    self._count(event_type, "conflated")
+
+            # 間引けないイベントはキュー長を超えても積む
+            while droppable and len(subscription.queue) >= subscription.queue_size:
+                if subscription.overflow_policy == OverflowPolicy.DROP_NEWEST:
+                    self._count(event_type, "dropped")
+                    return
+                if subscription.overflow_policy == OverflowPolicy.DROP_OLDEST:
+                    oldest = next((queued for queued in subscription.queue if _is_droppable(queued)), None)
+                    if oldest is None:
+                        break
+                    subscription.queue.remove(oldest)
+                    _release(oldest)
+                    self._count(type(oldest), "dropped")
+                else:
+                    # BLOCK: ワーカーがキューを消化するまで発行元を待たせる
+                    subscription.condition.wait()
+                    if subscription.stopped:
+                        return
+
+            _retain(event)
+            subscription.queue.append(event)
+            depth = len(subscription.queue)
+            subscription.condition.notify_all()
+        self.metrics.record_queue_depth(event_type.__name__, subscription.name, depth)
+
+    def _worker_loop(self, subscription: _Subscription):
+        while True:
+            with subscription.condition:
+                while not subscription.queue and not subscription.stopped:
+                    subscription.condition.wait()
+                if not subscription.queue:
+                    # 終了を決めたのと同じロックの中で外す (_start_workerがこのスレッドを再開させないように)
+                    if subscription.worker is threading.current_thread():
+                        subscription.worker = None
+                    subscription.condition.notify_all()
+                    return
+                event = subscription.queue.popleft()
+                depth = len(subscription.queue)
+                subscription.busy = True
+                subscription.condition.notify_all()
+            self.metrics.record_queue_depth(type(event).__name__, subscription.name, depth)
+
+            self._invoke(subscription, event)
+            _release(event)
+
+            with subscription.condition:
+                subscription.busy = False
+                subscription.condition.notify_all()
+
+    def _start_worker(self, subscription: _Subscription):
+        """
+        購読者のワーカースレッドを起動する (self._lockを保持した状態で呼ぶ)
+        停止を指示したワーカーがまだ終了していない場合 (遅いコールバックの処理中) は、新しいスレッドを作らずに
+        そのワーカーを続けさせる (同じキューを2つのスレッドが処理すると配信順が崩れるため)
+        """
+        with subscription.condition:
+            subscription.stopped = False
+            if subscription.worker is not None:
+                subscription.condition.notify_all()
+                return
+            subscription.worker = threading.Thread(
+                target=self._worker_loop,
+                args=(subscription,),
+                name=f"EventBus-{subscription.name}",
+                daemon=True,
+            )
+            subscription.worker.start()
+
+    def _stop_worker(self, subscription: _Subscription, drain: bool = False, timeout: float = 1.0):
+        """ワーカーに停止を指示し、終了を待つ (ワーカーは終了するときに自身をsubscription.workerから外す)"""
+        with subscription.condition:
+            worker = subscription.worker
+            if worker is None:
+                return
+            if not drain:
+                while subscription.queue:
+                    _release(subscription.queue.popleft())
+            subscription.stopped = True
+            subscription.condition.notify_all()
+        if worker is not threading.current_thread():
+            worker.join(timeout)
+            if worker.is_alive():
+                logger.warning(f"Event bus worker for {subscription.name} is still running a callback")
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        非同期配信のキューがすべて消化されるまで待機する (テスト・終了処理用)
+        return: タイムアウトまでにすべて配信できればTrue
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            subscriptions = [sub for subs in self._subscribers.values() for sub in subs]
+
+        for subscription in subscriptions:
+            worker = subscription.worker
+            if worker is None or worker is threading.current_thread():
+                continue
+            with subscription.condition:
+                while (subscription.queue or subscription.busy) and worker.is_alive():
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    subscription.condition.wait(remaining)
+        return True
+
+    def _invoke(self, subscription: _Subscription, event):
+        event_type = type(event)
+        start = time.perf_counter()
+        try:
+            subscription.callback(event)
+        except Exception as e:
+            logger.error(f"Error in event callback for {event_type.__name__}: {e}", exc_info=True)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.metrics.record_callback(event_type.__name__, subscription.name, elapsed_ms)
+        self._count(event_type, "delivered")
+
+    def _count(self, event_type: type, key: str):
+        self.metrics.count(event_type.__name__, key)
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        """イベント型ごとの配信数・破棄数・上書き数を取得する"""
+        return self.metrics.get_counters()
+
+    def reset_stats(self):
+        self.metrics.reset()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """発行レート・購読者ごとの処理時間ヒストグラム・キュー長を取得する"""
+        return self.metrics.snapshot()
+
+    def dump_metrics(self):
+        """計測値をログに出力する (終了時に呼ぶ)"""
+        logger.info(self.metrics.format_report())
 
     def clear_all_subscribers(self):
         with self._lock:
+            subscriptions = [sub for subs in self._subscribers.values() for sub in subs]
             self._subscribers.clear()
+        for subscription in subscriptions:
+            self._cancel_trailing(subscription)
+            self._stop_worker(subscription)
 
 
 # Global event bus instance
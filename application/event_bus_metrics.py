@@ -0,0 +1,171 @@
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+import threading
+import time
+
+from utils.logger import logger
+
+
+class LatencyHistogram:
+    """Fixed-bucket histogram of callback latencies in milliseconds"""
+
+    BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, elapsed_ms: float):
+        index = len(self.BUCKETS_MS)
+        for i, upper_ms in enumerate(self.BUCKETS_MS):
+            if elapsed_ms <= upper_ms:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def percentile(self, percent: float) -> float:
+        """バケットの上限値で近似したパーセンタイル [ms]"""
+        if self.count == 0:
+            return 0.0
+        target = self.count * percent / 100.0
+        cumulative = 0
+        for i, bucket_count in enumerate(self.counts):
+            cumulative += bucket_count
+            if cumulative >= target:
+                return min(float(self.BUCKETS_MS[i]), self.max_ms) if i < len(self.BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        labels = [f"<={upper_ms}ms" for upper_ms in self.BUCKETS_MS] + [f">{self.BUCKETS_MS[-1]}ms"]
+        return {
+            "count": self.count,
+            "mean_ms": self.total_ms / self.count if self.count else 0.0,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "max_ms": self.max_ms,
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class EventBusMetrics:
+    """
+    EventBusの計測値を集計する
+    - イベント型ごとの発行数・配信数・破棄数・上書き数と直近の発行レート
+    - 購読者ごとのコールバック処理時間のヒストグラムと予算超過回数
+    - 非同期配信時の購読者ごとのキュー長
+    """
+
+    COUNTER_KEYS = ("published", "delivered", "dropped", "conflated")
+
+    def __init__(self, slow_callback_ms: float = 50.0, rate_window_s: float = 5.0, warning_interval_s: float = 5.0):
+        self.slow_callback_ms = slow_callback_ms
+        self.rate_window_s = rate_window_s
+        self.warning_interval_s = warning_interval_s
+        self._lock = threading.Lock()
+        self._reset_locked()
+
+    def _reset_locked(self):
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._publish_times: Dict[str, Deque[float]] = {}
+        self._latencies: Dict[Tuple[str, str], LatencyHistogram] = {}
+        self._slow_calls: Dict[Tuple[str, str], int] = {}
+        self._last_warning: Dict[Tuple[str, str], float] = {}
+        self._queue_depths: Dict[Tuple[str, str], List[int]] = {}
+
+    def reset(self):
+        with self._lock:
+            self._reset_locked()
+
+    def count(self, event_name: str, key: str):
+        with self._lock:
+            counters = self._counters.setdefault(event_name, dict.fromkeys(self.COUNTER_KEYS, 0))
+            counters[key] += 1
+            if key == "published":
+                now = time.monotonic()
+                times = self._publish_times.setdefault(event_name, deque())
+                times.append(now)
+                while times and now - times[0] > self.rate_window_s:
+                    times.popleft()
+
+    def record_callback(self, event_name: str, subscriber_name: str, elapsed_ms: float):
+        key = (event_name, subscriber_name)
+        warn = False
+        with self._lock:
+            histogram = self._latencies.get(key)
+            if histogram is None:
+                histogram = self._latencies[key] = LatencyHistogram()
+            histogram.record(elapsed_ms)
+
+            if elapsed_ms > self.slow_callback_ms:
+                self._slow_calls[key] = self._slow_calls.get(key, 0) + 1
+                # 同じ購読者の警告は一定間隔に抑える
+                now = time.monotonic()
+                if now - self._last_warning.get(key, float("-inf")) >= self.warning_interval_s:
+                    self._last_warning[key] = now
+                    warn = True
+
+        if warn:
+            logger.warning(
+                f"Slow event subscriber: {subscriber_name} took {elapsed_ms:.1f} ms for {event_name} "
+                f"(budget {self.slow_callback_ms:.1f} ms)"
+            )
+
+    def record_queue_depth(self, event_name: str, subscriber_name: str, depth: int):
+        with self._lock:
+            depths = self._queue_depths.setdefault((event_name, subscriber_name), [0, 0])
+            depths[0] = depth
+            depths[1] = max(depths[1], depth)
+
+    def get_counters(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {event_name: dict(counters) for event_name, counters in self._counters.items()}
+
+    def snapshot(self) -> Dict[str, Any]:
+        """現在の計測値を辞書で取得する"""
+        now = time.monotonic()
+        with self._lock:
+            events = {}
+            for event_name, counters in self._counters.items():
+                times = self._publish_times.get(event_name, deque())
+                recent = sum(1 for t in times if now - t <= self.rate_window_s)
+                events[event_name] = {**counters, "publish_rate_hz": recent / self.rate_window_s}
+
+            subscribers = {}
+            for (event_name, subscriber_name), histogram in self._latencies.items():
+                subscribers.setdefault(subscriber_name, {})[event_name] = {
+                    **histogram.to_dict(),
+                    "slow_calls": self._slow_calls.get((event_name, subscriber_name), 0),
+                }
+            for (event_name, subscriber_name), (depth, max_depth) in self._queue_depths.items():
+                entry = subscribers.setdefault(subscriber_name, {}).setdefault(event_name, {})
+                entry["queue_depth"] = depth
+                entry["max_queue_depth"] = max_depth
+
+        return {"events": events, "subscribers": subscribers, "slow_callback_ms": self.slow_callback_ms}
+
+    def format_report(self, snapshot: Optional[Dict[str, Any]] = None) -> str:
+        snapshot = snapshot or self.snapshot()
+        lines = ["EventBus metrics:"]
+        for event_name, stats in sorted(snapshot["events"].items()):
+            lines.append(
+                f"  {event_name}: published={stats['published']} delivered={stats['delivered']} "
+                f"dropped={stats['dropped']} conflated={stats['conflated']} "
+                f"rate={stats['publish_rate_hz']:.1f}Hz"
+            )
+        for subscriber_name, per_event in sorted(snapshot["subscribers"].items()):
+            for event_name, stats in sorted(per_event.items()):
+                line = f"  {subscriber_name} <- {event_name}:"
+                if "count" in stats:
+                    line += (
+                        f" calls={stats['count']} mean={stats['mean_ms']:.1f}ms p95<={stats['p95_ms']:.0f}ms "
+                        f"max={stats['max_ms']:.1f}ms slow={stats['slow_calls']}"
+                    )
+                if "max_queue_depth" in stats:
+                    line += f" queue={stats['queue_depth']} (max {stats['max_queue_depth']})"
+                lines.append(line)
+        return "\n".join(lines)
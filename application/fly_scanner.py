@@ -0,0 +1,280 @@
+from typing import Any, Dict, List, Optional, Tuple
+import math
+import threading
+import time
+
+import numpy as np
+
+from application.event_bus import event_bus, StitchingProgressEvent
+from service.stage_kinematics import AxisProfile, StageKinematics
+from utils.frame import Frame
+from utils.logger import logger
+
+
+class FlyScanner:
+    """
+    連続移動 (on the fly) での撮影
+
+    - 各行をJOG (J:) で一定速度で移動しながらカメラのストリームを取り込み、撮影位置に最も近いフレームを使う
+    - 移動中は Q: で位置を繰り返し取得し、各フレームの位置はフレームの時刻から補間して求める
+    - 速度はフレームレート・タイルの間隔・露光中のぶれから決める
+      フレームの位置と撮影位置のずれは最大でフレーム間隔の半分 (速度 / フレームレート / 2) になる
+    - ステップ移動 (移動・整定・撮影の繰り返し) より速くならない場合は使わない
+    """
+
+    # ImageService.captureは撮影前にバッファのフレームを5枚読み捨てる
+    STEP_CAPTURE_FRAMES = 6
+
+    def __init__(self, config: Dict[str, Any], controller_service, image_service, kinematics: Optional[StageKinematics] = None):
+        fly_config = config.get("stitching", {}).get("on_the_fly", {}) or {}
+        self.enabled = fly_config.get("enabled", False)
+        self.magnifications = fly_config.get("magnifications", ["x5", "x10"])
+        self.exposure_ms = fly_config.get("exposure_ms", 1.0)
+        self.max_blur_px = fly_config.get("max_blur_px", 1.0)
+        self.max_offset_ratio = fly_config.get("max_offset_ratio", 0.1)
+        self.latency_ms = fly_config.get("latency_ms", 0.0)
+        self.lead_s = fly_config.get("lead_s", 0.2)
+        self.sample_interval_s = fly_config.get("sample_interval_s", 0.01)
+        self.position_latency_ms = fly_config.get("position_latency_ms", 5.0)
+
+        camera_config = config["camera"]
+        self.frame_rate = camera_config["frame_rate"]
+        self.resolution_width = camera_config["resolution_width"]
+        self.image_size = camera_config["image_size"]
+
+        stage_config = config["stage"]
+        speed_config = stage_config.get("speed", {})
+        self.pulses_per_mm = stage_config.get("pulses_per_mm", 1000)
+        self.accel_time = speed_config.get("acceleration_time", 200) / 1000.0
+        self.max_speed_pps = max(value for key, value in speed_config.items() if key != "acceleration_time")
+
+        self.controller_service = controller_service
+        self.image_service = image_service
+        self.kinematics = kinematics or StageKinematics(config)
+
+    def plan(self, magnitude: str, pitch_mm: float, num_tiles: int) -> Optional[Dict[str, float]]:
+        """
+        1行を連続移動で撮影する速度を決める
+        param magnitude: 倍率 ("x5"など)
+        param pitch_mm: 行内のタイルの間隔
+        param num_tiles: 1行のタイル数
+
+        return {"speed", "frames_per_tile", "row_time", "step_row_time"} (速度はmm/s、時間は秒)
+            無効な場合やステップ移動より速くならない場合はNone
+        """
+        if not self.enabled or magnitude not in self.magnifications or num_tiles < 2 or pitch_mm <= 0:
+            return None
+
+        # 露光中のぶれとステージの最高速度による上限
+        mm_per_px = self.image_size[magnitude][0] / self.resolution_width
+        speed_limit = min(
+            self.max_blur_px * mm_per_px / max(self.exposure_ms / 1000.0, 1e-6),
+            self.max_speed_pps / self.pulses_per_mm,
+        )
+        # タイルの間隔をフレーム間隔の整数倍にし、位置のずれがmax_offset_ratio以下になるようにする
+        frames_per_tile = max(
+            math.ceil(1 / (2 * self.max_offset_ratio) - 1e-9),
+            math.ceil(pitch_mm * self.frame_rate / speed_limit - 1e-9),
+        )
+        speed = pitch_mm * self.frame_rate / frames_per_tile
+
+        row_length = pitch_mm * (num_tiles - 1)
+        row_time = 2 * self.accel_time + self.lead_s + row_length / speed + self.kinematics.overhead_s
+        capture_s = self.STEP_CAPTURE_FRAMES / self.frame_rate
+        step_row_time = (num_tiles - 1) * float(self.kinematics.move_time(pitch_mm, 0.0)) + num_tiles * capture_s
+
+        plan = {
+            "speed": speed,
+            "frames_per_tile": frames_per_tile,
+            "row_time": row_time,
+            "step_row_time": step_row_time,
+        }
+        if row_time >= step_row_time:
+            logger.info(
+                f"On-the-fly scan not used for {magnitude}: {speed:.2f} mm/s, "
+                f"row {row_time:.1f}s vs step {step_row_time:.1f}s"
+            )
+            return None
+        return plan
+
+    def scan(
+        self, trajectory: List[Tuple[float, float]], grid_size_x: int, grid_size_y: int, plan: Dict[str, float]
+    ) -> Tuple[List[Frame], List[Tuple[float, float]]]:
+        """
+        ジグザグの軌跡 (StitchingController.generate_trajectory) の各行を連続移動で撮影する
+        1行目以外は前の行と逆向きに移動する
+
+        return (frames, positions): 軌跡の順のフレームと、補間で求めた各フレームの位置 (mm)
+            失敗した場合は例外を送出する (それまでに撮影したフレームは返却する)
+        """
+        if not self.within_limits(trajectory, grid_size_x, grid_size_y, plan):
+            raise RuntimeError("On-the-fly scan run-up exceeds movement limits")
+        speed = plan["speed"]
+        profile = self._profile(speed)
+        run_up = self._run_up(speed)
+        rows = [trajectory[row * grid_size_x:(row + 1) * grid_size_x] for row in range(grid_size_y)]
+
+        logger.info(
+            f"On-the-fly scan: {speed:.2f} mm/s, {plan['frames_per_tile']} frames per tile, "
+            f"estimated row {plan['row_time']:.1f}s (step {plan['step_row_time']:.1f}s)"
+        )
+        frames: List[Frame] = []
+        positions: List[Tuple[float, float]] = []
+        self.controller_service.set_jog_speed(speed)
+        try:
+            for targets in rows:
+                row_frames, row_positions = self._scan_row(targets, speed, profile, run_up, len(frames), len(trajectory))
+                frames.extend(row_frames)
+                positions.extend(row_positions)
+        except Exception:
+            for frame in frames:
+                frame.release()
+            raise
+        finally:
+            self.controller_service.restore_speed()
+        return frames, positions
+
+    def within_limits(
+        self, trajectory: List[Tuple[float, float]], grid_size_x: int, grid_size_y: int, plan: Dict[str, float]
+    ) -> bool:
+        """各行の前後の助走・減速の範囲が移動範囲内か"""
+        run_up = self._run_up(plan["speed"])
+        for row in range(grid_size_y):
+            targets = trajectory[row * grid_size_x:(row + 1) * grid_size_x]
+            direction = 1.0 if targets[-1][0] >= targets[0][0] else -1.0
+            for x in (targets[0][0] - direction * run_up, targets[-1][0] + direction * run_up):
+                if not self.controller_service.is_valid_movement(x, targets[0][1], is_relative=False):
+                    return False
+        return True
+
+    def _profile(self, speed: float) -> AxisProfile:
+        return AxisProfile.from_speed(speed * self.pulses_per_mm, self.accel_time, self.pulses_per_mm)
+
+    def _run_up(self, speed: float) -> float:
+        """最初の撮影位置の手前で一定速度になるまでの助走距離 (mm)"""
+        return self._profile(speed).ramp_distance_mm + speed * self.lead_s
+
+    def _scan_row(
+        self,
+        targets: List[Tuple[float, float]],
+        speed: float,
+        profile: AxisProfile,
+        run_up: float,
+        start_index: int,
+        total: int,
+    ) -> Tuple[List[Frame], List[Tuple[float, float]]]:
+        direction = 1.0 if targets[-1][0] >= targets[0][0] else -1.0
+        start_x, row_y = targets[0][0] - direction * run_up, targets[0][1]
+        self.controller_service.move_to(start_x, row_y, is_relative=False)
+
+        event_bus.publish(StitchingProgressEvent(progress_message=f"Scanning row from position {start_index + 1}/{total}..."))
+        samples: List[Tuple[float, float, float]] = []
+        stop = threading.Event()
+        frames: List[Frame] = []
+        times: List[float] = []
+
+        self.controller_service.start_move(speed, 0 if direction > 0 else 180)
+        start_time = time.perf_counter()
+        # JOG開始後はこのスレッド以外がシリアルを使わないため、位置の取得を並行して行える
+        sampler = threading.Thread(target=self._sample_positions, args=(samples, stop), daemon=True)
+        sampler.start()
+
+        # 各撮影位置に最も近いフレームを使う (次のフレームは撮影位置からより離れる)
+        half_step = speed / self.frame_rate / 2
+        row_length = abs(targets[-1][0] - targets[0][0])
+        deadline = start_time + 2 * (2 * self.accel_time + self.lead_s + row_length / speed) + 2.0
+        try:
+            index = 0
+            while index < len(targets):
+                grabbed_at = self.image_service.grab()
+                if grabbed_at is None:
+                    raise RuntimeError("Failed to grab frame during on-the-fly scan")
+                grabbed_at -= self.latency_ms / 1000.0
+
+                x = self._estimate_position(grabbed_at, samples, start_x, direction, start_time, profile)
+                if direction * (x - targets[index][0]) >= -half_step:
+                    # 購読者の処理で取り込みの時刻が遅れないように、イベントは行の撮影が終わってから発行する
+                    frame = self.image_service.retrieve(publish=False)
+                    if frame is None:
+                        raise RuntimeError(f"Failed to capture image at position {start_index + index + 1}")
+                    frames.append(frame)
+                    times.append(grabbed_at)
+                    index += 1
+                if time.perf_counter() > deadline:
+                    raise RuntimeError("On-the-fly scan timed out")
+        except Exception:
+            for frame in frames:
+                frame.release()
+            raise
+        finally:
+            stop.set()
+            sampler.join()
+            self.controller_service.stop_move()
+            while self.controller_service.is_moving():
+                time.sleep(0.05)
+
+        for frame in frames:
+            self.image_service.publish_frame(frame)
+
+        positions = self._interpolate_positions(times, samples, start_x, row_y, direction, start_time, profile)
+        errors = [direction * (x - target[0]) for (x, _), target in zip(positions, targets)]
+        logger.info(
+            f"On-the-fly row: {len(frames)} tiles, {len(samples)} position samples, "
+            f"offset from targets {min(errors) * 1000:.1f} to {max(errors) * 1000:.1f} um"
+        )
+        return frames, positions
+
+    def _sample_positions(self, samples: List[Tuple[float, float, float]], stop: threading.Event):
+        """
+        移動中の位置を繰り返し取得する
+        位置はコマンドが届いた時点で確定し、応答の受信はその後になるため、時刻は送信からposition_latency_ms後とする
+        """
+        while not stop.is_set():
+            sent_at = time.perf_counter()
+            x, y = self.controller_service.get_current_position()
+            samples.append((sent_at + self.position_latency_ms / 1000.0, x, y))
+            stop.wait(self.sample_interval_s)
+
+    def _estimate_position(
+        self,
+        timestamp: float,
+        samples: List[Tuple[float, float, float]],
+        start_x: float,
+        direction: float,
+        start_time: float,
+        profile: AxisProfile,
+    ) -> float:
+        """加減速のモデルによる位置を、直近の位置の取得結果とのずれで補正して外挿する"""
+        predicted = start_x + direction * profile.distance_at(timestamp - start_time)
+        recent = samples[-5:]
+        if not recent:
+            return float(predicted)
+        sample_times = np.array([sample[0] for sample in recent])
+        sample_x = np.array([sample[1] for sample in recent])
+        model_x = start_x + direction * profile.distance_at(sample_times - start_time)
+        return float(predicted + np.mean(sample_x - model_x))
+
+    def _interpolate_positions(
+        self,
+        times: List[float],
+        samples: List[Tuple[float, float, float]],
+        start_x: float,
+        row_y: float,
+        direction: float,
+        start_time: float,
+        profile: AxisProfile,
+    ) -> List[Tuple[float, float]]:
+        """フレームの時刻の位置を、前後の位置の取得結果から線形補間する (範囲外はモデルで外挿する)"""
+        if len(samples) < 2:
+            return [(self._estimate_position(t, samples, start_x, direction, start_time, profile), row_y) for t in times]
+        sample_times = np.array([sample[0] for sample in samples])
+        sample_x = np.array([sample[1] for sample in samples])
+        sample_y = float(np.mean([sample[2] for sample in samples]))
+        positions = []
+        for t in times:
+            if sample_times[0] <= t <= sample_times[-1]:
+                x = float(np.interp(t, sample_times, sample_x))
+            else:
+                x = self._estimate_position(t, samples, start_x, direction, start_time, profile)
+            positions.append((x, sample_y))
+        return positions
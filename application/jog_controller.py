@@ -0,0 +1,195 @@
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+import ctypes
+import sys
+import threading
+import time
+
+from application.event_bus import event_bus, ErrorEvent
+from application.event_bus_metrics import LatencyHistogram
+from enums.enums import JogState
+from utils.logger import logger
+
+
+class JogController:
+    """
+    キーボードのJOG操作のコマンドを、GUIのスレッドから切り離してすぐに送信する
+
+    - GUIのスレッドは jog/stop_jog で要求を積むだけで、シリアル通信を待たない
+    - 専用のスレッドが要求を順に送信する。停止の要求が来たら、まだ送信していないJOGの要求は捨てる
+    - JOGの前にReadyを確認しない。停止を送信した後に一度だけ、減速が終わるまで!:で確認する
+    - 状態 (停止/JOG中/減速中) はこのクラスで保持し、GUIの安全確認はシリアルに問い合わせずにこれを参照する
+    - 位置の更新 (Q:) はGUIのスレッドに任せ、このスレッドからはイベントを発行しない (エラーを除く)
+    - キーイベントからコマンドの送信までの時間を計測する (終了時にログへ出力)
+    """
+
+    def __init__(self, config: Dict[str, Any], controller_service):
+        jog_config = config.get("stage", {}).get("jog", {}) or {}
+        self.poll_interval_s = jog_config.get("poll_interval_s", 0.02)
+        self.slow_command_ms = jog_config.get("slow_command_ms", 50.0)
+        self.stop_timeout_s = jog_config.get("stop_timeout_s", 2.0)
+
+        self.controller_service = controller_service
+        self._condition = threading.Condition()
+        # (コマンド, 方向, 要求された時刻)
+        self._pending: Deque[Tuple[str, Optional[float], float]] = deque()
+        self._state = JogState.IDLE
+        self._direction: Optional[float] = None
+        # 取り出した要求を処理している間はTrue (wait_idle・is_movingで処理中の要求を見落とさないため)
+        self._busy = False
+        self._latencies = {"jog": LatencyHistogram(), "stop": LatencyHistogram()}
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def state(self) -> JogState:
+        return self._state
+
+    @property
+    def direction(self) -> Optional[float]:
+        return self._direction
+
+    @property
+    def is_moving(self) -> bool:
+        """JOG中・減速中、または送信待ちのJOGの要求がある (シリアルには問い合わせない)"""
+        with self._condition:
+            return self._state != JogState.IDLE or self._busy or any(item[0] == "jog" for item in self._pending)
+
+    def start(self):
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="JogController", daemon=True)
+        self._thread.start()
+
+    def shutdown(self):
+        """JOG中なら停止してからスレッドを終了し、計測値をログに出力する"""
+        if self._thread is None:
+            return
+        self.stop_jog()
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        self._thread.join(timeout=self.stop_timeout_s)
+        self._thread = None
+        logger.info(self.format_report())
+
+    def jog(self, degree: float, requested_at: Optional[float] = None):
+        """JOG移動を要求する (degree: 0/90/180/270、requested_at: キーイベントの時刻 time.perf_counter)"""
+        with self._condition:
+            self._pending.append(("jog", degree, requested_at or time.perf_counter()))
+            self._condition.notify_all()
+
+    def stop_jog(self, requested_at: Optional[float] = None):
+        """停止を要求する。送信していないJOGの要求は取り消す"""
+        with self._condition:
+            self._pending = deque(item for item in self._pending if item[0] != "jog")
+            self._pending.append(("stop", None, requested_at or time.perf_counter()))
+            self._condition.notify_all()
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """減速が終わって停止するまで待つ (撮影などでステージを動かす前に使う)。停止したか"""
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: self._state == JogState.IDLE and not self._busy and not self._pending,
+                timeout=self.stop_timeout_s if timeout is None else timeout,
+            )
+
+    def latency_stats(self) -> Dict[str, Dict[str, Any]]:
+        """コマンドごとのキーイベントから送信までの時間"""
+        return {command: histogram.to_dict() for command, histogram in self._latencies.items()}
+
+    def format_report(self) -> str:
+        lines = ["Jog command latency:"]
+        for command, stats in self.latency_stats().items():
+            lines.append(
+                f"  {command}: count={stats['count']} mean={stats['mean_ms']:.1f}ms "
+                f"p95<={stats['p95_ms']:.0f}ms max={stats['max_ms']:.1f}ms"
+            )
+        return "\n".join(lines)
+
+    def _run(self):
+        self._raise_thread_priority()
+        while True:
+            with self._condition:
+                if not self._pending:
+                    if not self._running:
+                        return
+                    # 減速中は停止したかを一定間隔で確認する
+                    self._condition.wait(self.poll_interval_s if self._state == JogState.STOPPING else None)
+                command = self._pending.popleft() if self._pending else None
+                self._busy = command is not None
+
+            try:
+                if self._state == JogState.STOPPING:
+                    self._poll_stopped()
+                if command is not None:
+                    self._execute(*command)
+            except Exception as e:
+                # 状態が分からなくなったので、停止を送信して減速中として扱う
+                event_bus.publish(ErrorEvent(error_message=f"Jog command failed: {str(e)}"))
+                self._set_state(JogState.STOPPING)
+                try:
+                    self.controller_service.stop_move()
+                except Exception:
+                    pass
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
+
+    def _execute(self, command: str, degree: Optional[float], requested_at: float):
+        if command == "stop":
+            if self._state == JogState.JOGGING:
+                self.controller_service.stop_move()
+                self._record(command, requested_at)
+                self._set_state(JogState.STOPPING)
+            return
+
+        if self._state == JogState.JOGGING and self._direction == degree:
+            return
+        if self._state == JogState.JOGGING:
+            self.controller_service.stop_move()
+            self._set_state(JogState.STOPPING)
+        # 減速中はJOGのコマンドを受け付けないため、停止するまで待つ (待っている間に停止を要求されたら送信しない)
+        while self._state == JogState.STOPPING:
+            time.sleep(self.poll_interval_s)
+            self._poll_stopped()
+            with self._condition:
+                if any(item[0] == "stop" for item in self._pending):
+                    return
+        self.controller_service.send_jog(degree)
+        self._record(command, requested_at)
+        self._direction = degree
+        self._set_state(JogState.JOGGING)
+
+    def _poll_stopped(self):
+        # 停止した位置はGUIが1秒ごとのcheck_statusで通知するため、ここでは!:だけを送る
+        # (このスレッドからPositionUpdateEventを発行しない)
+        if not self.controller_service.is_moving():
+            self._direction = None
+            self._set_state(JogState.IDLE)
+
+    def _set_state(self, state: JogState):
+        with self._condition:
+            self._state = state
+            self._condition.notify_all()
+
+    def _record(self, command: str, requested_at: float):
+        elapsed_ms = (time.perf_counter() - requested_at) * 1000.0
+        self._latencies[command].record(elapsed_ms)
+        if elapsed_ms > self.slow_command_ms:
+            logger.warning(f"Jog {command} command sent {elapsed_ms:.0f}ms after the key event")
+
+    @staticmethod
+    def _raise_thread_priority():
+        """Windowsではこのスレッドの優先度を上げる (他のOSではそのまま)"""
+        if sys.platform != "win32":
+            return
+        try:
+            kernel32 = ctypes.windll.kernel32
+            THREAD_PRIORITY_HIGHEST = 2
+            kernel32.SetThreadPriority(kernel32.GetCurrentThread(), THREAD_PRIORITY_HIGHEST)
+        except Exception as e:
+            logger.warning(f"Failed to raise jog thread priority: {e}")
@@ -1,5 +1,6 @@
 from typing import Dict, Any, Optional
 from .event_bus import event_bus, ErrorEvent
+from .jog_controller import JogController
 
 
 class ManualController:
@@ -8,16 +9,28 @@ class ManualController:
         self.controller_service = controller_service
         self.image_service = image_service
         self.is_active = False
+        # キーボードのJOG操作は専用のスレッドから送信する (GUIのスレッドでシリアル通信を待たない)
+        self.jog_controller = JogController(config, controller_service)
 
     def start(self):
         self.is_active = True
+        self.jog_controller.start()
 
     def stop(self):
+        """手動操作を止める。JOG中なら停止し、撮影などでステージを動かせるように減速が終わるまで待つ"""
         self.is_active = False
-        if self.controller_service.is_moving():
+        if self.jog_controller.is_moving:
             self.stop_move()
+            if not self.jog_controller.wait_idle():
+                error_event = ErrorEvent(error_message="Stage did not stop after jog")
+                event_bus.publish(error_event)
 
-    def start_move(self, speed: float, key: str):
+    def shutdown(self):
+        """終了時にJOGのスレッドを止める"""
+        self.stop()
+        self.jog_controller.shutdown()
+
+    def start_move(self, speed: float, key: str, requested_at: Optional[float] = None):
         if not self.is_active:
             return
 
@@ -28,12 +41,8 @@ class ManualController:
             event_bus.publish(error_event)
             return
 
-        try:
-            print(f"Starting move - Speed: {speed}, Direction: {direction}")
-            self.controller_service.start_move(speed, direction)
-        except Exception as e:
-            error_event = ErrorEvent(error_message=f"Failed to start move: {str(e)}")
-            event_bus.publish(error_event)
+        print(f"Starting move - Speed: {speed}, Direction: {direction}")
+        self.jog_controller.jog(direction, requested_at)
 
     def _key_to_direction(self, key: str) -> Optional[float]:
         """Convert keyboard character to direction in degrees"""
@@ -45,13 +54,9 @@ class ManualController:
         }
         return key_map.get(key.lower())
 
-    def stop_move(self):
-        try:
-            # Publish stop move event
-            self.controller_service.stop_move()
-        except Exception as e:
-            error_event = ErrorEvent(error_message=f"Failed to stop move: {str(e)}")
-            event_bus.publish(error_event)
+    def stop_move(self, requested_at: Optional[float] = None):
+        # 送信の失敗はJogControllerがErrorEventで通知する
+        self.jog_controller.stop_jog(requested_at)
 
     def move_to(self, x: float, y: float, is_relative: bool = True):
         if not self.is_active:
@@ -65,6 +70,7 @@ class ManualController:
             event_bus.publish(error_event)
 
     def capture_image(self):
+        """画像を撮影する (戻り値のFrameは呼び出し側が所有し、不要になったらrelease()する)"""
         if not self.is_active:
             return None
 
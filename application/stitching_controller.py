@@ -1,23 +1,58 @@
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 import os
+import threading
 import cv2
+import numpy as np
 
 
+from application.autofocus import Autofocus
 from application.event_bus import event_bus, ErrorEvent, StitchingProgressEvent, ImageCaptureEvent
+from application.fly_scanner import FlyScanner
 from enums.enums import CornerPosition, CameraMagnitude, ProgressStatus, StitchingType
+from service.focus_map import FocusMap
+from service.focus_stacker import FocusStacker
+from service.position_corrector import PositionCorrector
+from service.roi_planner import RoiPlanner
+from service.stage_calibrator import StageCalibrator
+from service.stage_kinematics import StageKinematics
+from service.trajectory_planner import TrajectoryPlanner
+from utils.frame import Frame, as_array
+from utils.logger import logger
 
 
 class StitchingController:
-    def __init__(self, config: Dict[str, Any], controller_service, image_service, image_process_service):
+    def __init__(self, config: Dict[str, Any], controller_service, image_service, image_process_service, z_axis_service=None):
         self.config = config
         self.controller_service = controller_service
         self.image_service = image_service
         self.image_process_service = image_process_service
+        self.z_axis_service = z_axis_service
         self.is_active = False
         self.captured_images = []
         self.last_grid_size_x = 0
         self.last_grid_size_y = 0
+        self.last_overlap_ratio = None
+        self.last_grid_indices = None
+        self.last_positions = None
+        self.last_magnitude = None
+        self.last_on_the_fly = False
+        self.roi_planner = RoiPlanner(config)
+        self.trajectory_planner = TrajectoryPlanner(config)
+        self.fly_scanner = FlyScanner(config, controller_service, image_service, self.trajectory_planner.kinematics)
+        # 撮影中に隣接タイルとの位置合わせで測定したずれを次の移動に反映する (stitching.closed_loop)
+        self.position_corrector = PositionCorrector(config)
+        # Z軸がない場合 (z_axis_serviceがNone) は使えない
+        self.autofocus = Autofocus(config, z_axis_service, image_service)
+        # 撮影範囲の疎な点で測定した合焦位置の面 (autofocus.focus_map)。各タイルのZはこの面から決める
+        self.focus_map = FocusMap(config)
+        # Zを変えて撮影した画像を1枚に合成する深度合成 (stitching.focus_stack)
+        self.focus_stacker = FocusStacker(config)
+        # 低倍率の全体像 (capture_overviewで撮影し、roi_stitchingで使う)
+        self.overview = None
+        # 撮影キュー (AcquisitionQueue) では撮影と結合が別スレッドで並行するため、画像処理を1つずつ実行する
+        # 特徴点検出器・窓関数・タイル端のキャッシュを共有しているので、撮影スレッドでの補正・位置合わせもこのロックの中で行う
+        self.process_lock = threading.Lock()
 
     def start(self):
         self.is_active = True
@@ -58,33 +93,41 @@ class StitchingController:
             )
             event_bus.publish(progress_event)
 
-            # 軌跡生成
-            trajectory = self.generate_trajectory(grid_size_x, grid_size_y, magnitude, corner)
-            print(f"Generated trajectory: {trajectory}")
-            if len(trajectory) == 0:
-                self._publish_error(
-                    "Failed to generate trajectory. It may exceed movement limits.",
-                    "Trajectory generation failed"
-                )
-                return False
-
-            # 移動と撮影
-            images = self.move_and_capture(trajectory)
-            if not images:
-                self._publish_error("Failed to capture images.", "Image capture failed")
+            # 軌跡生成・移動と撮影
+            acquisition = self.acquire(grid_size_x, grid_size_y, magnitude, corner, stitching_type)
+            if acquisition is None:
                 return False
+            images = acquisition["images"]
+            grid_indices = acquisition["grid_indices"]
+            grid_size_y = acquisition["grid_size_y"]
+            overlap_ratio = acquisition["overlap_ratio"]
+            positions = acquisition["positions"]
+            on_the_fly = acquisition["on_the_fly"]
 
             # Store captured images and grid size for potential re-stitching
+            # 前回の撮影画像は不要になるので参照を返す
+            self._release_images(self.captured_images)
             self.captured_images = images
             self.last_grid_size_x = grid_size_x
             self.last_grid_size_y = grid_size_y
+            self.last_overlap_ratio = overlap_ratio
+            self.last_grid_indices = grid_indices
+            self.last_positions = positions
+            self.last_magnitude = magnitude
+            self.last_on_the_fly = on_the_fly
 
             # 全画像保存（オプション）
             if save_all_images:
-                self._save_all_images(images, grid_size_x, grid_size_y)
+                self._save_all_images(
+                    images, grid_size_x, grid_size_y, grid_indices,
+                    positions=positions, commanded_positions=acquisition["commanded_positions"],
+                )
 
             # 画像結合
-            stitched_image = self.concatenate_images(images, grid_size_x, grid_size_y, stitching_type)
+            stitched_image = self.concatenate_images(
+                images, grid_size_x, grid_size_y, stitching_type, overlap_ratio, grid_indices, positions, magnitude,
+                use_stage_prior=on_the_fly,
+            )
 
             if stitched_image is None:
                 self._publish_error("Failed to stitch images.", "Image stitching failed")
@@ -110,6 +153,119 @@ class StitchingController:
             self._publish_error(f"Error occurred during stitching: {str(e)}", "Stitching failed")
             return False
 
+    def acquire(
+        self, grid_size_x: int, grid_size_y: int, magnitude: CameraMagnitude, corner: CornerPosition, stitching_type: StitchingType
+    ) -> Optional[Dict[str, Any]]:
+        """
+        現在位置を基準に軌跡を生成して撮影する (結合はしない)
+        撮影した画像の所有権は呼び出し側に移る (不要になったら_release_imagesで返す)
+
+        return {"images", "grid_size_x", "grid_size_y", "grid_indices", "overlap_ratio", "magnitude",
+                "positions", "commanded_positions", "on_the_fly"}
+            positionsは撮影後にステージから取得した各画像の位置 (mm、連続移動では撮影時刻から補間した位置)、
+            commanded_positionsは指令した位置 (閉ループの位置補正では補正後の位置)、
+            on_the_flyは連続移動で撮影したか (結合ではpositionsを必ず使う)
+            失敗した場合はエラーを発行してNone
+        """
+        trajectory = self.generate_trajectory(grid_size_x, grid_size_y, magnitude, corner)
+        print(f"Generated trajectory: {trajectory}")
+        if len(trajectory) == 0:
+            self._publish_error(
+                "Failed to generate trajectory. It may exceed movement limits.",
+                "Trajectory generation failed"
+            )
+            return None
+
+        # 合焦位置の面を使う場合は、撮影の前に疎な点で合焦位置を測定する
+        focus_map = self._measure_focus_map(trajectory)
+
+        # 適応的な重複率が有効な場合は、1行目の位置合わせ結果から2行目以降の行間隔を決める
+        # 低倍率で連続移動の方が速い場合は、各行を止まらずに撮影する
+        # (行の途中でZを変えられないため、合焦位置の面・深度合成を使う場合を除く)
+        overlap_ratio = None
+        stage_positions = []
+        fly_plan = None
+        if self._use_adaptive_overlap(grid_size_x, grid_size_y, stitching_type):
+            images, grid_indices, grid_size_y, overlap_ratio = self.adaptive_move_and_capture(
+                trajectory, grid_size_x, grid_size_y, magnitude, stitching_type, stage_positions, focus_map
+            )
+        else:
+            if not focus_map and not self._use_focus_stack(magnitude):
+                fly_plan = self._plan_fly_scan(trajectory, grid_size_x, grid_size_y, magnitude)
+            if fly_plan is not None:
+                grid_indices = self.zigzag_grid_indices(grid_size_x, grid_size_y)
+                images, positions = self.fly_move_and_capture(trajectory, grid_size_x, grid_size_y, magnitude, fly_plan)
+                stage_positions = list(zip(trajectory, positions))
+            else:
+                # 撮影順は移動時間が短くなるように並べ替え、各画像の格子上の位置は grid_indices で渡す
+                grid_indices, trajectory = self.plan_capture_order(
+                    self.zigzag_grid_indices(grid_size_x, grid_size_y), trajectory
+                )
+                images = self.move_and_capture(
+                    trajectory, magnitude, grid_indices=grid_indices, stitching_type=stitching_type,
+                    stage_positions=stage_positions, focus_map=focus_map,
+                )
+        if not images:
+            self._publish_error("Failed to capture images.", "Image capture failed")
+            return None
+
+        # 補正プロファイルがない場合は、撮影したタイルから推定して補正する (設定で有効な場合のみ)
+        images = self._estimate_flat_field(images, magnitude)
+        return {
+            "images": images,
+            "grid_size_x": grid_size_x,
+            "grid_size_y": grid_size_y,
+            "grid_indices": grid_indices,
+            "overlap_ratio": overlap_ratio,
+            "magnitude": magnitude,
+            "positions": [reported for _, reported in stage_positions],
+            "commanded_positions": [commanded for commanded, _ in stage_positions],
+            "on_the_fly": fly_plan is not None,
+        }
+
+    def stitch_acquisition(
+        self, acquisition: Dict[str, Any], stitching_type: StitchingType, folder_name: str, save_all_images: bool = True
+    ) -> Optional[str]:
+        """
+        acquireで撮影した画像を結合し、data/images/<folder_name>/stitched.png に保存する
+        撮影した画像の参照はここで返す (撮影キューでは結合スレッドから呼ばれ、次の領域の撮影と並行する)
+
+        return 結合画像の保存先。失敗した場合はエラーを発行してNone
+        """
+        images = acquisition["images"]
+        grid_size_x = acquisition["grid_size_x"]
+        grid_size_y = acquisition["grid_size_y"]
+        grid_indices = acquisition["grid_indices"]
+        try:
+            if save_all_images:
+                folder_path = self._save_all_images(
+                    images, grid_size_x, grid_size_y, grid_indices, folder_name,
+                    acquisition["positions"], acquisition["commanded_positions"],
+                )
+            else:
+                folder_path = os.path.join(self.config.get('data_directory', 'data'), "images", folder_name)
+                os.makedirs(folder_path, exist_ok=True)
+
+            stitched_image = self.concatenate_images(
+                images, grid_size_x, grid_size_y, stitching_type, acquisition["overlap_ratio"], grid_indices,
+                acquisition["positions"], acquisition["magnitude"], use_stage_prior=acquisition["on_the_fly"],
+            )
+            if stitched_image is None:
+                self._publish_error("Failed to stitch images.", "Image stitching failed")
+                return None
+
+            output_path = os.path.join(folder_path, "stitched.png")
+            if not cv2.imwrite(output_path, as_array(stitched_image)):
+                self._publish_error(f"Failed to save stitched image to {output_path}", "Image stitching failed")
+                return None
+            return output_path
+
+        except Exception as e:
+            self._publish_error(f"Error occurred during stitching: {str(e)}", "Stitching failed")
+            return None
+        finally:
+            self._release_images(images)
+
     def generate_trajectory(self, grid_size_x: int, grid_size_y: int, magnitude: CameraMagnitude, corner: CornerPosition) -> List[Tuple[float, float]]:
         """
         StageServiceから現在の座標を取得し、スティッチングするためのステージの軌跡を生成する
@@ -179,56 +335,467 @@ class StitchingController:
             )
             return []
 
-    def move_and_capture(self, trajectory: List[Tuple[float, float]]) -> List[Any]:
-        """移動された座標に移動し、撮影することを繰り返す"""
+    @staticmethod
+    def zigzag_grid_indices(grid_size_x: int, grid_size_y: int) -> List[Tuple[int, int]]:
+        """generate_trajectoryの軌跡の順に、各撮影位置の格子上の位置 (列, 行) を返す"""
+        grid_indices = []
+        for y in range(grid_size_y):
+            xs = range(grid_size_x) if y % 2 == 0 else range(grid_size_x - 1, -1, -1)
+            grid_indices.extend((x, y) for x in xs)
+        return grid_indices
+
+    def plan_capture_order(
+        self,
+        grid_indices: List[Tuple[int, int]],
+        trajectory: List[Tuple[float, float]],
+        start: Optional[Tuple[float, float]] = None,
+    ) -> Tuple[List[Tuple[int, int]], List[Tuple[float, float]]]:
+        """
+        ステージの移動時間が短くなるように撮影順を並べ替える
+        param grid_indices: 各撮影位置の格子上の位置 (列, 行)
+        param trajectory: 撮影位置 (この順番より遅くなることはない)
+        param start: 移動を始める位置 (Noneなら現在位置)
+
+        return (grid_indices, trajectory): 並べ替えた撮影順
+        """
+        if start is None:
+            start = self.controller_service.get_current_position()
+        order = self.trajectory_planner.order(trajectory, start=start)
+        return [grid_indices[i] for i in order], [trajectory[i] for i in order]
+
+    def move_and_capture(
+        self,
+        trajectory: List[Tuple[float, float]],
+        magnitude: Optional[CameraMagnitude] = None,
+        start_index: int = 0,
+        total: Optional[int] = None,
+        grid_indices: Optional[List[Tuple[int, int]]] = None,
+        stitching_type: Optional[StitchingType] = None,
+        placed: Optional[Dict[Tuple[int, int], Dict[str, Any]]] = None,
+        stage_positions: Optional[List[Tuple[Tuple[float, float], Tuple[float, float]]]] = None,
+        focus_map: bool = False,
+    ) -> List[Any]:
+        """
+        移動された座標に移動し、撮影することを繰り返す
+        magnitudeを指定した場合、その倍率の補正プロファイルがあれば撮影ごとにシェーディング補正する
+        start_index, totalは進捗表示用 (軌跡を分けて撮影する場合の通し番号と全体の枚数)
+        grid_indices, stitching_typeを指定した場合、閉ループの位置補正が有効なら撮影したタイルを撮影済みの隣接タイルと
+        位置合わせし、測定したずれを次の移動に反映する。placedは測定済みのタイル (軌跡を分けて撮影する場合に引き継ぐ)
+        stage_positionsを指定した場合、撮影ごとに (指令した位置, 撮影後にステージから取得した位置) を追加する
+        focus_mapがTrueの場合、各タイルのZを合焦位置の面 (_measure_focus_mapで測定) から決め、
+        撮影したタイルの合焦度が低ければその位置で合焦し直して面を当てはめ直す (_check_focus)
+        深度合成が有効な倍率では、各タイルをZを変えて撮影して合成する (_capture_focus_stack)
+        """
         images = []
+        focus_map = focus_map and self.focus_map.ready
+        focus_stack = self._use_focus_stack(magnitude)
+        refocus_count = 0
+        total = total or len(trajectory)
+        closed_loop = (
+            self.position_corrector.enabled
+            and grid_indices is not None
+            and magnitude is not None
+            and stitching_type not in (None, StitchingType.SIMPLE)
+        )
+        if closed_loop:
+            placed = {} if placed is None else placed
+            commanded = self.controller_service.get_current_position()
+            errors = []
+        # 失敗した場合は、このスキャンで追加した位置を取り除く
+        num_positions = len(stage_positions) if stage_positions is not None else 0
 
         try:
-            for i, (target_x, target_y) in enumerate(trajectory):
+            for i, (target_x, target_y) in enumerate(trajectory, start=start_index):
                 # Progress report
-                progress_msg = f"Moving to position {i + 1}/{len(trajectory)}..."
+                progress_msg = f"Moving to position {i + 1}/{total}..."
                 progress_event = StitchingProgressEvent(progress_message=progress_msg)
                 event_bus.publish(progress_event)
 
-                self.controller_service.move_to(target_x, target_y, is_relative=False)
+                if closed_loop:
+                    commanded, directions = self.position_corrector.command(commanded, (target_x, target_y))
+                else:
+                    commanded = (target_x, target_y)
+                self.controller_service.move_to(commanded[0], commanded[1], is_relative=False)
+                if stage_positions is not None:
+                    stage_positions.append((commanded, self.controller_service.get_current_position()))
+                if focus_map:
+                    self.autofocus.move_to(self.focus_map.predict(target_x, target_y))
 
                 # 画像撮影
-                progress_msg = f"Capturing image at position {i + 1}/{len(trajectory)}..."
+                progress_msg = f"Capturing image at position {i + 1}/{total}..."
                 progress_event = StitchingProgressEvent(progress_message=progress_msg)
                 event_bus.publish(progress_event)
 
-                image_data = self.image_service.capture(refresh=True)
+                # 撮影したFrameの参照はこのコントローラが持ち、再スティッチングまで保持する
+                if focus_stack:
+                    image_data = self._capture_focus_stack()
+                else:
+                    image_data = self.image_service.capture(refresh=True)
                 if image_data is None:
+                    self._release_images(images)
+                    if stage_positions is not None:
+                        del stage_positions[num_positions:]
                     self._publish_error(
                         f"Failed to capture image at position {i + 1}",
-                        f"Capture failed at position {i + 1}/{len(trajectory)}"
+                        f"Capture failed at position {i + 1}/{total}"
                     )
                     return []
 
-                images.append(image_data)
+                if focus_map and not focus_stack and refocus_count < self.focus_map.max_refocus:
+                    image_data, refocused = self._check_focus(image_data, (target_x, target_y))
+                    refocus_count += refocused
+
+                images.append(self._correct_flat_field(image_data, magnitude))
+                if closed_loop:
+                    error = self._observe_tile_position(
+                        placed, grid_indices[i - start_index], images[-1], (target_x, target_y),
+                        commanded, directions, magnitude, stitching_type,
+                    )
+                    if error is not None:
+                        errors.append(error)
 
+            if closed_loop:
+                self._log_closed_loop(errors, len(trajectory))
             return images
 
         except Exception as e:
+            self._release_images(images)
+            if stage_positions is not None:
+                del stage_positions[num_positions:]
             self._publish_error(
                 f"Error occurred during movement and capture: {str(e)}",
                 "Movement and capture failed"
             )
             return []
 
-    def concatenate_images(self, images: List[Any], grid_size_x: int, grid_size_y: int, stitching_type: StitchingType) -> Any:
-        """image_process_serviceを呼び出し、画像を結合する"""
+    def _observe_tile_position(
+        self,
+        placed: Dict[Tuple[int, int], Dict[str, Any]],
+        grid_index: Tuple[int, int],
+        image: Any,
+        target: Tuple[float, float],
+        commanded: Tuple[float, float],
+        directions: Tuple[int, int],
+        magnitude: CameraMagnitude,
+        stitching_type: StitchingType,
+    ) -> Optional[Tuple[float, float]]:
+        """
+        撮影済みの隣接タイルとの位置合わせからタイルの実際の位置を求め、指令位置とのずれをPositionCorrectorに学習させる
+        位置は最初のタイルが目標位置にあるとした相対位置。測定できなかったタイルは目標位置にあるとみなす
+
+        return 学習に使ったずれ (実際の位置 - 指令位置、mm)。測定できなかった場合はNone
+        """
+        col, row = grid_index
+        height, width = as_array(image).shape[:2]
+        img_size = self.config["camera"]["image_size"][magnitude.value]
+        mm_per_px = (img_size[0] / width, img_size[1] / height)
+
+        estimates = []
+        for neighbour_index, direction, is_ref in (
+            ((col - 1, row), "left", True),
+            ((col + 1, row), "left", False),
+            ((col, row - 1), "top", True),
+            ((col, row + 1), "top", False),
+        ):
+            neighbour = placed.get(neighbour_index)
+            if neighbour is None:
+                continue
+            # 重複幅は目標位置の間隔から求める (適応的な重複率で行間隔を変えた場合も正しい幅になる)
+            if direction == "left":
+                overlap = int(width - abs(target[0] - neighbour["target"][0]) / mm_per_px[0])
+            else:
+                overlap = int(height - abs(target[1] - neighbour["target"][1]) / mm_per_px[1])
+            ref, current = (neighbour["image"], image) if is_ref else (image, neighbour["image"])
+            with self.process_lock:
+                result = self.image_process_service.measure_relative_position(
+                    ref, current, direction, overlap, stitching_type.value
+                )
+            if result is None:
+                continue
+            sign = 1.0 if is_ref else -1.0
+            # 画像のxはステージの+x、画像のyはステージの-y方向
+            estimates.append((
+                neighbour["actual"][0] + sign * result[0] * mm_per_px[0],
+                neighbour["actual"][1] - sign * result[1] * mm_per_px[1],
+            ))
+
+        error = None
+        actual = target
+        if estimates:
+            measured = (float(np.mean([x for x, _ in estimates])), float(np.mean([y for _, y in estimates])))
+            measured_error = (measured[0] - commanded[0], measured[1] - commanded[1])
+            if self.position_corrector.update(directions, measured_error):
+                actual, error = measured, measured_error
+        placed[grid_index] = {"image": image, "target": target, "actual": actual}
+        return error
+
+    def _measure_focus_map(self, trajectory: List[Tuple[float, float]]) -> bool:
+        """
+        撮影範囲に疎に配置した点でオートフォーカスを行い、合焦位置の面 (FocusMap) を当てはめる
+        点は撮影範囲を points_x × points_y に分けた格子点に最も近い撮影位置とする (ROIの撮影では試料のあるタイル)
+
+        return 面を当てはめたか (無効な場合・Z軸がない場合・全ての点で失敗した場合はFalse)
+        """
+        self.focus_map.reset()
+        if not self.focus_map.enabled or not self.autofocus.available or not trajectory:
+            return False
+
+        xs = [x for x, _ in trajectory]
+        ys = [y for _, y in trajectory]
+        samples = []
+        for row, y in enumerate(np.linspace(max(ys), min(ys), self.focus_map.points_y)):
+            row_x = np.linspace(min(xs), max(xs), self.focus_map.points_x)
+            # 移動が短くなるように行ごとに向きを変える
+            for x in (row_x if row % 2 == 0 else row_x[::-1]):
+                nearest = min(trajectory, key=lambda position: (position[0] - x) ** 2 + (position[1] - y) ** 2)
+                if nearest not in samples:
+                    samples.append(nearest)
+
+        for k, (x, y) in enumerate(samples):
+            event_bus.publish(StitchingProgressEvent(progress_message=f"Measuring focus map {k + 1}/{len(samples)}..."))
+            self.controller_service.move_to(x, y, is_relative=False)
+            # 2点目以降はそれまでの点から予測した位置を中心に探す
+            result = self.autofocus.run(center=self.focus_map.predict(x, y))
+            if result is None:
+                logger.warning(f"Focus map: autofocus failed at ({x:.3f}, {y:.3f})")
+                continue
+            self.focus_map.add(x, y, result["z"], result["score"])
+            self.focus_map.fit()
+
+        if not self.focus_map.ready:
+            logger.warning("Focus map: no focus points measured, capturing at the current Z")
+            return False
+        z_values = [z for _, _, z, _ in self.focus_map.points]
+        logger.info(
+            f"Focus map: {len(self.focus_map.points)} points ({self.focus_map.surface.value}), "
+            f"Z {min(z_values):.4f} to {max(z_values):.4f} mm"
+        )
+        return True
+
+    def _check_focus(self, frame: Any, target: Tuple[float, float]) -> Tuple[Any, bool]:
+        """
+        撮影したタイルの合焦度が最も近い測定点の min_sharpness_ratio 倍を下回る場合、その位置で狭い範囲を合焦し直す
+        合焦度が min_refocus_gain 倍以上に上がれば (焦点がずれていた)、その点を加えて面を当てはめ直し、撮影し直す
+        上がらなければ試料が少ないために合焦度が低いとみなし、撮影した画像を使う
+
+        return (frame, refocused): 使う画像と、合焦し直したか
+        """
+        score = self.autofocus.measure.measure(frame)
+        reference = self.focus_map.reference_score(*target)
+        if reference is None or score >= self.focus_map.min_sharpness_ratio * reference:
+            return frame, False
+
+        result = self.autofocus.run(search_range_mm=self.focus_map.refocus_range_mm)
+        if result is None or result["score"] < score * self.focus_map.min_refocus_gain:
+            logger.info(f"Focus map: low sharpness at ({target[0]:.3f}, {target[1]:.3f}) is not due to defocus")
+            return frame, True
+
+        predicted = self.focus_map.predict(*target)
+        self.focus_map.add(target[0], target[1], result["z"], result["score"])
+        self.focus_map.fit()
+        logger.info(
+            f"Focus map refit at ({target[0]:.3f}, {target[1]:.3f}): Z {predicted:.4f} -> {result['z']:.4f} mm, "
+            f"sharpness {score:.1f} -> {result['score']:.1f}"
+        )
+        recaptured = self.image_service.capture(refresh=True)
+        if recaptured is None:
+            return frame, True
+        frame.release()
+        return recaptured, True
+
+    def _use_focus_stack(self, magnitude: Optional[CameraMagnitude]) -> bool:
+        return (
+            self.focus_stacker.enabled
+            and self.autofocus.available
+            and magnitude is not None
+            and magnitude.value in self.focus_stacker.magnifications
+        )
+
+    def _capture_focus_stack(self) -> Optional[np.ndarray]:
+        """
+        現在のZを中心に planes 枚を step_mm 間隔で下から撮影し、撮影するたびに合成する
+        撮影した画像はすぐに返却するため、全ての面を同時に保持しない。撮影後はZを中心に戻す
+
+        return 合成した画像。撮影に失敗した場合はNone
+        """
+        center = self.z_axis_service.get_current_position()
+        stacker = self.focus_stacker
+        stacker.reset()
+        try:
+            for k in range(stacker.planes):
+                self.autofocus.move_to(center + (k - (stacker.planes - 1) / 2) * stacker.step_mm)
+                frame = self.image_service.capture(refresh=True)
+                if frame is None:
+                    stacker.reset()
+                    return None
+                try:
+                    stacker.add(frame)
+                finally:
+                    frame.release()
+            return stacker.result()
+        finally:
+            self.autofocus.move_to(center)
+
+    def _log_closed_loop(self, errors: List[Tuple[float, float]], num_tiles: int):
+        backlash = self.position_corrector.backlash()
+        backlash_text = ", ".join(
+            f"{axis} {value * 1000:.1f} um" if value is not None else f"{axis} -" for axis, value in backlash.items()
+        )
+        if errors:
+            magnitude_um = np.hypot(*np.array(errors).T) * 1000
+            logger.info(
+                f"Closed-loop correction: {len(errors)}/{num_tiles} tiles measured, "
+                f"stage error mean {magnitude_um.mean():.1f} um, max {magnitude_um.max():.1f} um; backlash {backlash_text}"
+            )
+        else:
+            logger.info(f"Closed-loop correction: no tiles measured out of {num_tiles}")
+
+    def adaptive_move_and_capture(
+        self,
+        trajectory: List[Tuple[float, float]],
+        grid_size_x: int,
+        grid_size_y: int,
+        magnitude: CameraMagnitude,
+        stitching_type: StitchingType,
+        stage_positions: Optional[List[Tuple[Tuple[float, float], Tuple[float, float]]]] = None,
+        focus_map: bool = False,
+    ) -> Tuple[List[Any], List[Tuple[int, int]], int, Optional[Tuple[float, float]]]:
+        """
+        1行目を設定の重複率で撮影し、その位置合わせの信頼度から2行目以降の行間隔を決めて撮影する
+        撮影範囲 (generate_trajectoryの範囲) は変えずに行数を増減させる。列は位置合わせの格子を保つため変えない
+        param trajectory: generate_trajectoryで生成した軌跡 (1行目と撮影範囲の基準に使う)
+        param stage_positions: 撮影ごとに (指令した位置, ステージから取得した位置) を追加するリスト (move_and_capture)
+        param focus_map: 各タイルのZを合焦位置の面から決めるか (move_and_capture)
+
+        return (images, grid_indices, grid_size_y, overlap_ratio):
+            撮影した画像、各画像の格子上の位置 (列, 行)、実際の行数、(x, y)の重複率
+        """
+        row_indices = [(x, 0) for x in range(grid_size_x)]
+        placed = {}
+        row_images = self.move_and_capture(
+            trajectory[:grid_size_x], magnitude, total=len(trajectory),
+            grid_indices=row_indices, stitching_type=stitching_type, placed=placed, stage_positions=stage_positions,
+            focus_map=focus_map,
+        )
+        if not row_images:
+            return [], [], grid_size_y, None
+
+        event_bus.publish(StitchingProgressEvent(progress_message="Measuring alignment on the first row..."))
+        overlap_ratio = self.config["stitching"].get("overlap_ratio", 0.1)
+        with self.process_lock:
+            overlap_ratio_y = self.image_process_service.select_overlap_ratio(row_images, stitching_type.value)
+
+        # 撮影範囲の縦の長さを変えずに、新しい行間隔で必要な行数を求める
+        img_size = self.config["camera"]["image_size"][magnitude.value]
+        total_move_y = img_size[1] * (1 - overlap_ratio) * (grid_size_y - 1)
+        step_size_y = img_size[1] * (1 - overlap_ratio_y)
+        num_rows = int(np.ceil(total_move_y / step_size_y - 1e-9)) + 1
+
+        start_y = trajectory[0][1]
+        row_x = [x for x, _ in trajectory[:grid_size_x]]
+        last_y = start_y - (num_rows - 1) * step_size_y
+        if not all(self.controller_service.is_valid_movement(x, last_y, is_relative=False) for x in (row_x[0], row_x[-1])):
+            # 行数を切り上げた分で移動範囲を超える場合は、設定の重複率のまま撮影する
+            logger.warning("Adapted scan exceeds movement limits, keeping the configured overlap ratio")
+            overlap_ratio_y, num_rows = overlap_ratio, grid_size_y
+            step_size_y = img_size[1] * (1 - overlap_ratio)
+
+        # 2行目以降は1行目の最後の位置から移動時間が短くなる順に撮影する
+        remaining_indices = [(x, y) for y in range(1, num_rows) for x in range(grid_size_x)]
+        remaining = [(row_x[x], start_y - y * step_size_y) for x, y in remaining_indices]
+        remaining_indices, remaining = self.plan_capture_order(remaining_indices, remaining, start=trajectory[grid_size_x - 1])
+
+        logger.info(
+            f"Adaptive overlap: y overlap ratio {overlap_ratio:.3f} -> {overlap_ratio_y:.3f}, "
+            f"rows {grid_size_y} -> {num_rows}"
+        )
+        images = self.move_and_capture(
+            remaining, magnitude, start_index=len(row_images), total=len(row_images) + len(remaining),
+            grid_indices=remaining_indices, stitching_type=stitching_type, placed=placed, stage_positions=stage_positions,
+            focus_map=focus_map,
+        )
+        if remaining and not images:
+            self._release_images(row_images)
+            return [], [], grid_size_y, None
+
+        return row_images + images, row_indices + remaining_indices, num_rows, (overlap_ratio, overlap_ratio_y)
+
+    def fly_move_and_capture(
+        self,
+        trajectory: List[Tuple[float, float]],
+        grid_size_x: int,
+        grid_size_y: int,
+        magnitude: CameraMagnitude,
+        fly_plan: Dict[str, float],
+    ) -> Tuple[List[Any], List[Tuple[float, float]]]:
+        """
+        各行を止まらずに連続移動で撮影する (FlyScanner)
+        return (images, positions): 軌跡の順の画像と、各画像の撮影時刻から補間した位置 (mm)。失敗した場合は空のリスト
+        """
+        try:
+            frames, positions = self.fly_scanner.scan(trajectory, grid_size_x, grid_size_y, fly_plan)
+        except Exception as e:
+            self._publish_error(f"Error occurred during on-the-fly scan: {str(e)}", "On-the-fly scan failed")
+            return [], []
+        return [self._correct_flat_field(frame, magnitude) for frame in frames], positions
+
+    def _plan_fly_scan(
+        self, trajectory: List[Tuple[float, float]], grid_size_x: int, grid_size_y: int, magnitude: CameraMagnitude
+    ) -> Optional[Dict[str, float]]:
+        """連続移動で撮影する速度を決める。無効な場合・ステップ移動の方が速い場合・助走が移動範囲を超える場合はNone"""
+        overlap_ratio = self.config["stitching"].get("overlap_ratio", 0.1)
+        pitch = self.config["camera"]["image_size"][magnitude.value][0] * (1 - overlap_ratio)
+        fly_plan = self.fly_scanner.plan(magnitude.value, pitch, grid_size_x)
+        if fly_plan is not None and not self.fly_scanner.within_limits(trajectory, grid_size_x, grid_size_y, fly_plan):
+            logger.warning("On-the-fly scan run-up exceeds movement limits, capturing tile by tile")
+            return None
+        return fly_plan
+
+    def _use_adaptive_overlap(self, grid_size_x: int, grid_size_y: int, stitching_type: StitchingType) -> bool:
+        adaptive_config = self.config["stitching"].get("adaptive_overlap", {}) or {}
+        return (
+            adaptive_config.get("enabled", False)
+            and stitching_type != StitchingType.SIMPLE
+            and grid_size_x > 1
+            and grid_size_y > 1
+        )
+
+    def concatenate_images(
+        self,
+        images: List[Any],
+        grid_size_x: int,
+        grid_size_y: int,
+        stitching_type: StitchingType,
+        overlap_ratio: Optional[Tuple[float, float]] = None,
+        grid_indices: Optional[List[Tuple[int, int]]] = None,
+        positions: Optional[List[Tuple[float, float]]] = None,
+        magnitude: Optional[CameraMagnitude] = None,
+        use_stage_prior: bool = False,
+    ) -> Any:
+        """
+        image_process_serviceを呼び出し、画像を結合する
+        stitching.stage_prior が有効 (またはuse_stage_prior) で各画像のステージの位置 (mm) と倍率がある場合、
+        その位置関係を位置合わせの予測位置とし、予測したずれの周りの search_window_mm の範囲だけを探索する (simpleではその位置に並べる)
+        連続移動で撮影した画像は撮影位置から最大でフレーム間隔の半分ずれ、その向きが行ごとに逆になるため、use_stage_priorで必ず使う
+        """
         try:
             progress_event = StitchingProgressEvent(progress_message="Stitching images...")
             event_bus.publish(progress_event)
 
+            stage_offsets, search_window_px = self._stage_offsets(images, positions, magnitude, use_stage_prior)
+
             # image_process_serviceで画像結合
-            stitched_image = self.image_process_service.concatenate(
-                stitching_type=stitching_type.value,
-                images=images,
-                grid_size_x=grid_size_x,
-                grid_size_y=grid_size_y
-            )
+            with self.process_lock:
+                stitched_image = self.image_process_service.concatenate(
+                    stitching_type=stitching_type.value,
+                    images=images,
+                    grid_size_x=grid_size_x,
+                    grid_size_y=grid_size_y,
+                    overlap_ratio=overlap_ratio,
+                    grid_indices=grid_indices,
+                    stage_offsets=stage_offsets,
+                    search_window_px=search_window_px,
+                )
 
             return stitched_image
 
@@ -236,6 +803,212 @@ class StitchingController:
             self._publish_error(f"Error occurred during stitching: {str(e)}", "Image stitching failed")
             return None
 
+    def _stage_offsets(
+        self,
+        images: List[Any],
+        positions: Optional[List[Tuple[float, float]]],
+        magnitude: Optional[CameraMagnitude],
+        force: bool = False,
+    ) -> Tuple[Optional[List[Tuple[float, float]]], Optional[float]]:
+        """
+        ステージの位置 (mm) を画像の座標 (ピクセル、右が+x・下が+y) に変換する。使わない場合は (None, None)
+        force: stitching.stage_prior が無効でも使う (連続移動で撮影した画像)
+        """
+        prior_config = self.config["stitching"].get("stage_prior", {}) or {}
+        if not (prior_config.get("enabled", False) or force) or not positions or magnitude is None or len(positions) != len(images):
+            return None, None
+        height, width = as_array(images[0]).shape[:2]
+        img_size = self.config["camera"]["image_size"][magnitude.value]
+        mm_per_px = (img_size[0] / width, img_size[1] / height)
+        # ステージの+yは画像の上方向 (generate_trajectoryでは行が進むとyが減る)
+        offsets = [(x / mm_per_px[0], -y / mm_per_px[1]) for x, y in positions]
+        return offsets, prior_config.get("search_window_mm", 0.05) / min(mm_per_px)
+
+    def capture_overview(
+        self, grid_size_x: int, grid_size_y: int, magnitude: CameraMagnitude, corner: CornerPosition
+    ) -> bool:
+        """
+        試料全体を低倍率で撮影して全体像を作る (roi_stitchingで撮影するタイルを決めるために使う)
+        位置合わせはせずに単純に並べる
+        param grid_size_x: x方向の撮影枚数
+        param grid_size_y: y方向の撮影枚数
+        param magnitude: 全体像を撮影する倍率 (通常は最も低い倍率)
+        param corner: スティッチングの開始位置
+
+        return success_flag: bool
+        """
+        if not self.is_active:
+            return False
+
+        images = []
+        try:
+            event_bus.publish(StitchingProgressEvent(
+                progress_message="Overview started",
+                status=ProgressStatus.IN_PROGRESS
+            ))
+
+            trajectory = self.generate_trajectory(grid_size_x, grid_size_y, magnitude, corner)
+            if len(trajectory) == 0:
+                self._publish_error(
+                    "Failed to generate trajectory. It may exceed movement limits.",
+                    "Trajectory generation failed"
+                )
+                return False
+
+            grid_indices, trajectory = self.plan_capture_order(
+                self.zigzag_grid_indices(grid_size_x, grid_size_y), trajectory
+            )
+            images = self.move_and_capture(trajectory, magnitude)
+            if not images:
+                self._publish_error("Failed to capture images.", "Image capture failed")
+                return False
+
+            overview_image = self.concatenate_images(
+                images, grid_size_x, grid_size_y, StitchingType.SIMPLE, grid_indices=grid_indices
+            )
+            if overview_image is None:
+                self._publish_error("Failed to stitch overview.", "Overview failed")
+                return False
+
+            # 全体像の左上の画素は格子の左上 (0, 0) のタイルの撮影位置に対応する
+            img_size = self.config["camera"]["image_size"][magnitude.value]
+            self.overview = {
+                "image": overview_image,
+                "origin": trajectory[grid_indices.index((0, 0))],
+                "mm_per_px": img_size[0] / as_array(images[0]).shape[1],
+                "magnitude": magnitude,
+            }
+
+            event_bus.publish(ImageCaptureEvent(
+                image_data=overview_image,
+                timestamp=datetime.now(),
+                is_stitched_image=True,
+            ))
+            event_bus.publish(StitchingProgressEvent(
+                progress_message="Overview completed",
+                status=ProgressStatus.COMPLETED,
+            ))
+            return True
+
+        except Exception as e:
+            self._publish_error(f"Error occurred during overview: {str(e)}", "Overview failed")
+            return False
+        finally:
+            self._release_images(images)
+
+    def plan_roi_tiles(self, magnitude: CameraMagnitude) -> Tuple[int, int, List[Tuple[int, int]], List[Tuple[float, float]]]:
+        """
+        全体像から試料のあるセルだけを撮影する軌跡を作る
+        param magnitude: 撮影する倍率
+
+        return (grid_size_x, grid_size_y, grid_indices, trajectory):
+            全体像の範囲に敷いた格子の大きさ、撮影するセル (列, 行)、各セルの撮影位置 (撮影順)
+        """
+        overview = self.overview
+        img_size = self.config["camera"]["image_size"][magnitude.value]
+        overlap_ratio = self.config["stitching"].get("overlap_ratio", 0.1)
+        step_size_x = img_size[0] * (1 - overlap_ratio)
+        step_size_y = img_size[1] * (1 - overlap_ratio)
+
+        mask = self.roi_planner.segment(overview["image"])
+        occupied = self.roi_planner.occupied_cells(mask, overview["mm_per_px"], img_size, overlap_ratio)
+        grid_size_y, grid_size_x = occupied.shape
+
+        # 試料のあるセルだけを、移動時間が短くなる順に撮影する
+        start_x, start_y = overview["origin"]
+        grid_indices = []
+        trajectory = []
+        for col, row in self.roi_planner.serpentine_order(occupied):
+            position = (start_x + col * step_size_x, start_y - row * step_size_y)
+            if not self.controller_service.is_valid_movement(position[0], position[1], is_relative=False):
+                logger.warning(f"Skipping tile ({col}, {row}) outside the movement limits")
+                continue
+            grid_indices.append((col, row))
+            trajectory.append(position)
+        if trajectory:
+            grid_indices, trajectory = self.plan_capture_order(grid_indices, trajectory)
+
+        logger.info(
+            f"ROI plan: {len(trajectory)}/{occupied.size} tiles of a {grid_size_x}x{grid_size_y} grid contain specimen"
+        )
+        return grid_size_x, grid_size_y, grid_indices, trajectory
+
+    def roi_stitching(self, magnitude: CameraMagnitude, stitching_type: StitchingType, save_all_images: bool = True) -> bool:
+        """
+        全体像 (capture_overview) のうち試料のある範囲だけを撮影してスティッチングする
+        対物レンズを撮影する倍率に切り替えてから実行する
+        param magnitude: 顕微鏡の倍率
+        param stitching_type: スティッチングのタイプ (simple/phase_match/feature_based)
+
+        return success_flag: bool
+        """
+        if not self.is_active:
+            return False
+        if self.overview is None:
+            self._publish_error("No overview available. Please capture an overview first.", "ROI stitching failed")
+            return False
+
+        try:
+            event_bus.publish(StitchingProgressEvent(
+                progress_message="ROI stitching started",
+                status=ProgressStatus.IN_PROGRESS
+            ))
+
+            grid_size_x, grid_size_y, grid_indices, trajectory = self.plan_roi_tiles(magnitude)
+            if len(trajectory) == 0:
+                self._publish_error("No specimen found in the overview.", "ROI planning failed")
+                return False
+
+            stage_positions = []
+            focus_map = self._measure_focus_map(trajectory)
+            images = self.move_and_capture(
+                trajectory, magnitude, grid_indices=grid_indices, stitching_type=stitching_type,
+                stage_positions=stage_positions, focus_map=focus_map,
+            )
+            if not images:
+                self._publish_error("Failed to capture images.", "Image capture failed")
+                return False
+            images = self._estimate_flat_field(images, magnitude)
+
+            self._release_images(self.captured_images)
+            self.captured_images = images
+            self.last_grid_size_x = grid_size_x
+            self.last_grid_size_y = grid_size_y
+            self.last_overlap_ratio = None
+            self.last_grid_indices = grid_indices
+            self.last_positions = [reported for _, reported in stage_positions]
+            self.last_magnitude = magnitude
+            self.last_on_the_fly = False
+
+            if save_all_images:
+                self._save_all_images(
+                    images, grid_size_x, grid_size_y, grid_indices,
+                    positions=self.last_positions, commanded_positions=[commanded for commanded, _ in stage_positions],
+                )
+
+            stitched_image = self.concatenate_images(
+                images, grid_size_x, grid_size_y, stitching_type, grid_indices=grid_indices,
+                positions=self.last_positions, magnitude=magnitude,
+            )
+            if stitched_image is None:
+                self._publish_error("Failed to stitch images.", "Image stitching failed")
+                return False
+
+            event_bus.publish(ImageCaptureEvent(
+                image_data=stitched_image,
+                timestamp=datetime.now(),
+                is_stitched_image=True,
+            ))
+            event_bus.publish(StitchingProgressEvent(
+                progress_message="ROI stitching completed",
+                status=ProgressStatus.COMPLETED,
+            ))
+            return True
+
+        except Exception as e:
+            self._publish_error(f"Error occurred during ROI stitching: {str(e)}", "ROI stitching failed")
+            return False
+
     def has_captured_images(self) -> bool:
         """Check if there are captured images available for re-stitching"""
         return len(self.captured_images) > 0 and self.last_grid_size_x > 0 and self.last_grid_size_y > 0
@@ -267,7 +1040,12 @@ class StitchingController:
                 self.captured_images,
                 self.last_grid_size_x,
                 self.last_grid_size_y,
-                stitching_type
+                stitching_type,
+                self.last_overlap_ratio,
+                self.last_grid_indices,
+                self.last_positions,
+                self.last_magnitude,
+                use_stage_prior=self.last_on_the_fly,
             )
 
             if stitched_image is None:
@@ -295,8 +1073,144 @@ class StitchingController:
             self._publish_error(f"Error occurred during re-stitching: {str(e)}", "Re-stitching failed")
             return False
 
-    def _save_all_images(self, images: List[Any], grid_size_x: int, grid_size_y: int) -> None:
-        """Save all captured images to a timestamped folder"""
+    def calibrate_flat_field(self, magnitude: CameraMagnitude, num_frames: int = 10) -> bool:
+        """
+        現在の視野を撮影してシェーディング補正のプロファイルを作成する
+        何も写っていない (スライドガラスのみの) 場所で実行すること
+        param magnitude: 顕微鏡の倍率
+        param num_frames: 平均する撮影枚数
+        """
+        frames = []
+        try:
+            event_bus.publish(StitchingProgressEvent(
+                progress_message="Calibrating flat field...",
+                status=ProgressStatus.IN_PROGRESS
+            ))
+            for i in range(num_frames):
+                frame = self.image_service.capture(refresh=True)
+                if frame is None:
+                    self._publish_error(
+                        f"Failed to capture flat field frame {i + 1}",
+                        "Flat field calibration failed"
+                    )
+                    return False
+                frames.append(frame)
+
+            with self.process_lock:
+                calibrated = self.image_process_service.calibrate_flat_field(magnitude.value, frames)
+            if not calibrated:
+                self._publish_error("Failed to create flat field profile.", "Flat field calibration failed")
+                return False
+
+            event_bus.publish(StitchingProgressEvent(
+                progress_message=f"Flat field calibrated for {magnitude.value}",
+                status=ProgressStatus.COMPLETED
+            ))
+            return True
+
+        except Exception as e:
+            self._publish_error(f"Error occurred during flat field calibration: {str(e)}", "Flat field calibration failed")
+            return False
+        finally:
+            self._release_images(frames)
+
+    def calibrate_stage(self) -> bool:
+        """
+        現在位置の周りでステージの移動時間を測定し、撮影順の計画・連続移動撮影の見積もりに反映する
+        各軸で stage.calibration.distances_mm の最大値まで往復する
+        """
+        try:
+            event_bus.publish(StitchingProgressEvent(
+                progress_message="Calibrating stage motion...",
+                status=ProgressStatus.IN_PROGRESS
+            ))
+            result = StageCalibrator(self.config, self.controller_service).run()
+            if result is None:
+                self._publish_error("Failed to fit stage motion model.", "Stage calibration failed")
+                return False
+
+            kinematics = StageKinematics(self.config)
+            self.trajectory_planner.kinematics = kinematics
+            self.fly_scanner.kinematics = kinematics
+            event_bus.publish(StitchingProgressEvent(
+                progress_message=f"Stage calibrated ({', '.join(result['speed_levels'])})",
+                status=ProgressStatus.COMPLETED
+            ))
+            return True
+
+        except Exception as e:
+            self._publish_error(f"Error occurred during stage calibration: {str(e)}", "Stage calibration failed")
+            return False
+
+    def run_autofocus(self) -> bool:
+        """現在のXY位置で合焦位置を探し、そこへZ軸を移動する"""
+        if not self.autofocus.available:
+            self._publish_error("Autofocus requires a Z axis (z_axis.enabled).", "Autofocus failed")
+            return False
+        try:
+            event_bus.publish(StitchingProgressEvent(
+                progress_message="Autofocusing...",
+                status=ProgressStatus.IN_PROGRESS
+            ))
+            result = self.autofocus.run()
+            if result is None:
+                self._publish_error("Failed to capture image during autofocus.", "Autofocus failed")
+                return False
+
+            message = f"Focused at Z={result['z']:.4f} mm ({result['evaluations']} images, {result['elapsed_s']:.1f}s)"
+            if result["at_edge"]:
+                message += " - best focus at the edge of the search range"
+            event_bus.publish(StitchingProgressEvent(progress_message=message, status=ProgressStatus.COMPLETED))
+            return True
+
+        except Exception as e:
+            self._publish_error(f"Error occurred during autofocus: {str(e)}", "Autofocus failed")
+            return False
+
+    def _correct_flat_field(self, image: Any, magnitude: Optional[CameraMagnitude]) -> Any:
+        """
+        撮影したタイルをシェーディング補正する
+        Frameは読み取り専用で共有されているため、補正結果は新しい配列に書き込み、元のFrameは返却する
+        """
+        if magnitude is None:
+            return image
+        with self.process_lock:
+            corrected = self.image_process_service.correct_flat_field(image, magnitude.value)
+        if corrected is None:
+            return image
+        if isinstance(image, Frame):
+            image.release()
+        return corrected
+
+    def _estimate_flat_field(self, images: List[Any], magnitude: CameraMagnitude) -> List[Any]:
+        """補正プロファイルがなければ撮影したタイルの中央値から推定し、全タイルを補正する"""
+        flat_field = self.image_process_service.flat_field
+        with self.process_lock:
+            if not flat_field.enabled or not flat_field.estimate_from_tiles or flat_field.has_profile(magnitude.value):
+                return images
+            if not self.image_process_service.estimate_flat_field(magnitude.value, images):
+                return images
+
+        event_bus.publish(StitchingProgressEvent(progress_message="Correcting flat field..."))
+        return [self._correct_flat_field(image, magnitude) for image in images]
+
+    def _release_images(self, images: List[Any]) -> None:
+        """保持しているFrameの参照を返す"""
+        for image in images:
+            if isinstance(image, Frame):
+                image.release()
+
+    def _save_all_images(
+        self,
+        images: List[Any],
+        grid_size_x: int,
+        grid_size_y: int,
+        grid_indices: Optional[List[Tuple[int, int]]] = None,
+        folder_name: Optional[str] = None,
+        positions: Optional[List[Tuple[float, float]]] = None,
+        commanded_positions: Optional[List[Tuple[float, float]]] = None,
+    ) -> str:
+        """Save all captured images to a timestamped folder (or data/images/<folder_name>) and return its path"""
         # Create timestamp-based folder name
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 
@@ -305,14 +1219,14 @@ class StitchingController:
         images_dir = os.path.join(data_dir, "images")
 
         # Create folder path
-        folder_path = os.path.join(images_dir, f"stitching_{timestamp}")
+        folder_path = os.path.join(images_dir, folder_name or f"stitching_{timestamp}")
         os.makedirs(folder_path, exist_ok=True)
 
         # Save each image
         for i, image in enumerate(images):
             filename = f"image_{i:03d}.png"
             filepath = os.path.join(folder_path, filename)
-            cv2.imwrite(filepath, image)
+            cv2.imwrite(filepath, as_array(image))
 
         print(f"Saved {len(images)} images to {folder_path}")
 
@@ -321,3 +1235,16 @@ class StitchingController:
         with open(info_filepath, 'w') as f:
             f.write(f"Grid Size X: {grid_size_x}\n")
             f.write(f"Grid Size Y: {grid_size_y}\n")
+            # 一部のセルだけを撮影した場合は、各画像のセル (列, 行) を撮影順に保存する
+            if grid_indices is not None:
+                for i, (x, y) in enumerate(grid_indices):
+                    f.write(f"Image {i:03d}: {x}, {y}\n")
+            # 各画像のステージの位置 (mm): 撮影後にステージから取得した位置 (連続移動では撮影時刻から補間した位置) と指令した位置
+            if positions:
+                for i, (x, y) in enumerate(positions):
+                    f.write(f"Position {i:03d}: {x:.4f}, {y:.4f}\n")
+            if commanded_positions:
+                for i, (x, y) in enumerate(commanded_positions):
+                    f.write(f"Commanded {i:03d}: {x:.4f}, {y:.4f}\n")
+
+        return folder_path
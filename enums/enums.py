@@ -24,6 +24,16 @@ class ProgressStatus(Enum):
     CANCELLED = "cancelled"
 
 
+class JobStatus(Enum):
+    QUEUED = "queued"
+    WAITING = "waiting"  # 対物レンズの切り替え待ち
+    ACQUIRING = "acquiring"
+    STITCHING = "stitching"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
 class StitchingType(Enum):
     SIMPLE = "simple"
     ADVANCED = "phase_match"
@@ -37,3 +47,36 @@ class SpeedLevel(Enum):
     S4 = "s4"
     S5 = "s5"
     S6 = "s6"
+
+
+class DeliveryPolicy(Enum):
+    DELIVER_ALL = "deliver_all"
+    LATEST_ONLY = "latest_only"
+    RATE_LIMITED = "rate_limited"
+
+
+class DispatchMode(Enum):
+    SYNC = "sync"
+    ASYNC = "async"
+
+
+class OverflowPolicy(Enum):
+    BLOCK = "block"
+    DROP_OLDEST = "drop_oldest"
+    DROP_NEWEST = "drop_newest"
+
+
+class FocusMetric(Enum):
+    LAPLACIAN = "laplacian"
+    TENENGRAD = "tenengrad"
+
+
+class FocusSurface(Enum):
+    PLANE = "plane"
+    TPS = "tps"
+
+
+class JogState(Enum):
+    IDLE = "idle"
+    JOGGING = "jogging"
+    STOPPING = "stopping"  # 停止のコマンドを送信し、減速が終わるのを待っている
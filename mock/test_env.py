@@ -1,6 +1,6 @@
 """
 簡易テスト環境管理モジュール
-XY平面のみのステージ移動をシミュレート（簡易版）
+XY平面のステージ移動と、Z軸 (フォーカス) の位置に応じた画像のぼけをシミュレート（簡易版）
 """
 
 import time
@@ -23,6 +23,17 @@ class TestEnv():
 
         self.start_time = time.time()
         self.is_moving = False
+
+        # Z軸 (フォーカス)
+        self.z = 0.0
+        self.min_z = -1.0  # Z軸の最小座標 [mm]
+        self.max_z = 1.0   # Z軸の最大座標 [mm]
+        # 焦点が合うZ: focus_z + focus_tilt_x * x + focus_tilt_y * y (試料の傾き)
+        self.focus_z = 0.0
+        self.focus_tilt_x = 0.0
+        self.focus_tilt_y = 0.0
+        self.blur_px_per_mm = 200.0  # 焦点からのずれ1mmあたりのぼけ (ガウシアンのσ) [px]
+
         self.mock_image = cv2.imread("mock/img/mock_image2.jpg")
 
     def connect(self) -> bool:
@@ -56,6 +67,24 @@ class TestEnv():
             print(f"Error: Target position ({x}, {y}) out of bounds.")
             return False
     
+    def move_z(self, z: float, is_relative: bool = False) -> bool:
+        """
+        Z軸を指定座標に移動する
+        """
+        nz = self.z + z if is_relative else z
+        if not self.min_z <= nz <= self.max_z:
+            print(f"Error: Target Z position ({z}) out of bounds.")
+            return False
+        self.z = nz
+        return True
+
+    def get_z(self) -> float:
+        return self.z
+
+    def focus_z_at(self, x: float, y: float) -> float:
+        """(x, y) で焦点が合うZ"""
+        return self.focus_z + self.focus_tilt_x * x + self.focus_tilt_y * y
+
     def start_move(self, degree: float):
 
         # stopが押されたときに、まとめて移動する
@@ -87,17 +116,23 @@ class TestEnv():
         scale_x = w / (self.max_x - self.min_x)
         scale_y = h / (self.max_y - self.min_y)
 
-        x1 = int(self.x * scale_x)
-        y1 = int(self.y * scale_y)
+        x, y = self.get_current_position()
+        x1 = int(x * scale_x)
+        y1 = int(y * scale_y)
         x1 = max(0, min(x1, w - clip_size))
         y1 = max(0, min(y1, h - clip_size))
         x2 = x1 + clip_size
         y2 = y1 + clip_size
 
-        return self.mock_image[y1:y2, x1:x2]
+        image = self.mock_image[y1:y2, x1:x2]
+        # 焦点からのずれに応じてぼかす
+        sigma = abs(self.z - self.focus_z_at(x, y)) * self.blur_px_per_mm
+        if sigma >= 0.3:
+            image = cv2.GaussianBlur(image, (0, 0), sigma)
+        return image
     
     def display_status(self):
-        print(f"Position: ({self.x:.2f}, {self.y:.2f}), Moving: {self.is_moving}")
+        print(f"Position: ({self.x:.2f}, {self.y:.2f}, {self.z:.4f}), Moving: {self.is_moving}")
 
     def update(self):
         if self.is_moving:
@@ -114,7 +149,13 @@ class TestEnv():
             self.start_time = time.time()  # Reset start time for next update
 
     def get_current_position(self):
-        return (self.x, self.y)
+        """JOG移動中は、最後にupdateしてから進んだ分を加えた位置を返す"""
+        if not self.is_moving:
+            return (self.x, self.y)
+        distance = self.speed * (time.time() - self.start_time)
+        x = self.x + distance * np.cos(np.radians(self.degree))
+        y = self.y + distance * np.sin(np.radians(self.degree))
+        return (min(max(x, self.min_x), self.max_x), min(max(y, self.min_y), self.max_y))
 
     def change_speed(self, speed: float):
         self.speed = speed
@@ -3,6 +3,10 @@ from tkinter import ttk, messagebox, filedialog
 import os
 from PIL import Image, ImageTk, ImageDraw, ImageFont  # noqa: F401
 import io
+import functools
+import queue
+import threading
+import time
 import cv2
 import numpy as np
 
@@ -15,14 +19,24 @@ from application.event_bus import (
     MoveToEvent,
     StitchingProgressEvent,
     PositionUpdateEvent,
+    AcquisitionJobEvent,
 )
-from enums.enums import CameraMagnitude, CornerPosition, ProgressStatus, SpeedLevel, StitchingType
+from application.acquisition_queue import AcquisitionJob
+from enums.enums import CameraMagnitude, CornerPosition, JobStatus, ProgressStatus, SpeedLevel, StitchingType
 from utils.settings_manager import SettingsManager
 
 
 class MicroscopeGUI:
     def __init__(
-        self, root, config, controller_service, image_service, file_service, manual_controller, stitching_controller
+        self,
+        root,
+        config,
+        controller_service,
+        image_service,
+        file_service,
+        manual_controller,
+        stitching_controller,
+        acquisition_queue=None,
     ):
         self.root = root
         self.root.title("Microscope Controller")
@@ -39,6 +53,8 @@ class MicroscopeGUI:
 
         self.manual_controller = manual_controller
         self.stitching_controller = stitching_controller
+        self.acquisition_queue = acquisition_queue
+        self.queue_active = False
 
         # Initialize settings manager
         self.settings_manager = SettingsManager()
@@ -53,6 +69,11 @@ class MicroscopeGUI:
         # Set up keyboard bindings
         self.setup_keyboard_bindings()
 
+        # ワーカースレッドからTkを呼び出さないように、GUIスレッドで行う処理はキューに積み、Tkのスレッドで取り出す
+        self.gui_tasks = queue.Queue()
+        self.gui_task_poll_ms = 20
+        self.poll_gui_tasks()
+
         # Set up event subscriptions
         self.setup_event_subscriptions()
 
@@ -102,6 +123,11 @@ class MicroscopeGUI:
 
         self.displayed_image = None
 
+        # Display buffers reused across live-view frames (resized BGR, RGB for PIL)
+        self.display_buffer_size = None
+        self.display_resize_buffer = None
+        self.display_rgb_buffer = None
+
         # Scale bar image cache
         self.scale_bar_image = None
 
@@ -276,6 +302,37 @@ class MicroscopeGUI:
         self.stitching_status = ttk.Label(stitching_frame, text="Ready", font=("Arial", 8))
         self.stitching_status.grid(row=2, column=3, columnspan=3, pady=(5, 0), sticky=tk.W)
 
+        # Flat-field calibration button (captures the current, empty field of view)
+        self.flat_field_button = ttk.Button(stitching_frame, text="Calibrate Flat-field", command=self.calibrate_flat_field)
+        self.flat_field_button.grid(row=3, column=0, columnspan=2, pady=(5, 0), sticky=tk.W)
+
+        # Overview (low magnification) and ROI scan buttons
+        self.overview_button = ttk.Button(stitching_frame, text="Overview", command=self.capture_overview)
+        self.overview_button.grid(row=3, column=2, pady=(5, 0), sticky=tk.W, padx=(5, 0))
+        self.roi_scan_button = ttk.Button(stitching_frame, text="Scan ROI", command=self.start_roi_stitching)
+        self.roi_scan_button.grid(row=3, column=3, columnspan=2, pady=(5, 0), sticky=tk.W, padx=(5, 0))
+
+        # Acquisition queue: add the grid at the current position, then run all queued regions unattended
+        self.add_queue_button = ttk.Button(stitching_frame, text="Add to Queue", command=self.add_to_queue)
+        self.add_queue_button.grid(row=4, column=0, columnspan=2, pady=(5, 0), sticky=tk.W)
+        self.run_queue_button = ttk.Button(stitching_frame, text="Run Queue", command=self.toggle_queue)
+        self.run_queue_button.grid(row=4, column=2, pady=(5, 0), sticky=tk.W, padx=(5, 0))
+        self.queue_status = ttk.Label(stitching_frame, text="Queue: empty", font=("Arial", 8))
+        self.queue_status.grid(row=4, column=3, columnspan=3, pady=(5, 0), sticky=tk.W)
+        if self.acquisition_queue is None:
+            self.add_queue_button.configure(state="disabled")
+            self.run_queue_button.configure(state="disabled")
+
+        # Stage motion calibration (timed moves around the current position, used for planning scans)
+        self.stage_calibration_button = ttk.Button(stitching_frame, text="Calibrate Stage", command=self.calibrate_stage)
+        self.stage_calibration_button.grid(row=5, column=0, columnspan=2, pady=(5, 0), sticky=tk.W)
+
+        # Autofocus at the current position (needs a Z axis)
+        self.autofocus_button = ttk.Button(stitching_frame, text="Autofocus", command=self.run_autofocus)
+        self.autofocus_button.grid(row=5, column=2, pady=(5, 0), sticky=tk.W, padx=(5, 0))
+        if not self.stitching_controller.autofocus.available:
+            self.autofocus_button.configure(state="disabled")
+
         # Image controls in left panel
         image_frame = ttk.LabelFrame(left_panel, text="Image Controls", padding="5")
         image_frame.grid(row=4, column=0, sticky=(tk.W, tk.E), pady=(0, 5))
@@ -366,13 +423,62 @@ class MicroscopeGUI:
 
     def setup_event_subscriptions(self):
         """Subscribe to events for logging and UI updates"""
-        event_bus.subscribe(ImageCaptureEvent, self.on_image_capture)
-        event_bus.subscribe(ErrorEvent, self.on_error)
-        event_bus.subscribe(StartMoveEvent, self.on_start_move)
-        event_bus.subscribe(StopMoveEvent, self.on_stop_move)
-        event_bus.subscribe(MoveToEvent, self.on_move_to)
-        event_bus.subscribe(StitchingProgressEvent, self.on_stitching_progress)
-        event_bus.subscribe(PositionUpdateEvent, self.on_position_update)
+        # 撮影キューのスレッドからも発行されるイベントは、Tkのスレッドで処理する
+        event_bus.subscribe(ImageCaptureEvent, self._on_gui_thread(self.on_image_capture))
+        event_bus.subscribe(ErrorEvent, self._on_gui_thread(self.on_error))
+        event_bus.subscribe(StartMoveEvent, self._on_gui_thread(self.on_start_move))
+        event_bus.subscribe(StopMoveEvent, self._on_gui_thread(self.on_stop_move))
+        event_bus.subscribe(MoveToEvent, self._on_gui_thread(self.on_move_to))
+        event_bus.subscribe(StitchingProgressEvent, self._on_gui_thread(self.on_stitching_progress))
+        event_bus.subscribe(PositionUpdateEvent, self._on_gui_thread(self.on_position_update))
+        event_bus.subscribe(AcquisitionJobEvent, self._on_gui_thread(self.on_acquisition_job))
+
+    def _on_gui_thread(self, callback):
+        """Wrap an event callback so that events published from worker threads are handled on the Tk thread"""
+
+        @functools.wraps(callback)
+        def handler(event):
+            if threading.current_thread() is threading.main_thread():
+                callback(event)
+                return
+
+            # 発行元はpublishから戻るとフレームを解放するため、Tkのスレッドで処理するまで参照を保持する
+            frame = getattr(event, "frame", None)
+            if frame is not None:
+                try:
+                    frame.acquire()
+                except RuntimeError:
+                    # 既に解放されたフレームは表示できない
+                    return
+
+            def deferred():
+                try:
+                    callback(event)
+                finally:
+                    if frame is not None:
+                        frame.release()
+
+            self.gui_tasks.put((deferred, ()))
+
+        return handler
+
+    def run_on_gui_thread(self, task, *args):
+        """Run task on the Tk thread; called from worker threads instead of root.after, which is not thread-safe"""
+        if threading.current_thread() is threading.main_thread():
+            task(*args)
+        else:
+            self.gui_tasks.put((task, args))
+
+    def poll_gui_tasks(self):
+        """Run the tasks queued by worker threads (periodically on the Tk thread)"""
+        # 処理中に例外が出てもポーリングが止まらないように、先に次回を予約する
+        self.root.after(self.gui_task_poll_ms, self.poll_gui_tasks)
+        while True:
+            try:
+                task, args = self.gui_tasks.get_nowait()
+            except queue.Empty:
+                return
+            task(*args)
 
     def load_default_image(self):
         """Load and display the default no-image placeholder"""
@@ -390,14 +496,14 @@ class MicroscopeGUI:
         except Exception as e:
             self.log_event(f"Failed to load default image: {str(e)}")
 
-    def move_key(self, key):
+    def move_key(self, key, requested_at=None):
         """Handle keyboard movement"""
         speed_name = self.speed_var.get()
         speed = SpeedLevel[speed_name].value
-        self.manual_controller.start_move(speed, key)
+        self.manual_controller.start_move(speed, key, requested_at)
         self.log_event(f"Movement started: {key} at speed {speed_name} ({speed})")
 
-    def stop_move(self):
+    def stop_move(self, requested_at=None):
         """Stop movement"""
         # すべてのキーボタンをunpress状態にする
         self.current_movement_key = None
@@ -413,7 +519,7 @@ class MicroscopeGUI:
         # Clear all key press states
         self.key_is_pressed.clear()
 
-        self.manual_controller.stop_move()
+        self.manual_controller.stop_move(requested_at)
         self.log_event("Movement stopped")
 
     def move_to(self):
@@ -486,6 +592,8 @@ class MicroscopeGUI:
 
     def on_key_press(self, event):
         """Handle key press events for movement and speed control"""
+        # キーイベントからJOGのコマンド送信までの時間を計測するための時刻
+        pressed_at = time.perf_counter()
         key = event.keysym.lower()
 
         # Handle speed change keys (only when not moving to avoid conflicts)
@@ -512,7 +620,7 @@ class MicroscopeGUI:
             if self.current_movement_key is None:
                 self.current_movement_key = key
                 self.movement_start_time = self.root.tk.call("clock", "milliseconds")
-                self.move_key(key)
+                self.move_key(key, pressed_at)
                 if key == "w":
                     self.button_move_up.state(["pressed"])
                 elif key == "a":
@@ -544,12 +652,14 @@ class MicroscopeGUI:
                     self.root.after_cancel(self.key_release_timer)
 
                 # Delay the actual stop by 50ms to filter out key repeat
-                self.key_release_timer = self.root.after(50, lambda: self._actual_key_release(key))
+                # (停止の遅れの計測にはこの50msも含める)
+                released_at = time.perf_counter()
+                self.key_release_timer = self.root.after(50, lambda: self._actual_key_release(key, released_at))
 
-    def _actual_key_release(self, key):
+    def _actual_key_release(self, key, released_at=None):
         """Actually handle key release after confirming it's not key repeat"""
         if key == self.current_movement_key:
-            self.stop_move()
+            self.stop_move(released_at)
             self.stop_movement_safety_check()
             self.current_movement_key = None
             self.key_release_timer = None
@@ -583,7 +693,17 @@ class MicroscopeGUI:
             self.movement_start_time = None
             return
 
-        # Check 2: Verify maximum continuous movement time not exceeded
+        # Check 2: Verify the jog controller still reports the stage as moving (local state, no serial query)
+        # JOGのコマンドの送信に失敗した場合はここで停止状態になる
+        if not self.manual_controller.jog_controller.is_moving:
+            self.log_event(f"SAFETY: Jog {self.current_movement_key.upper()} is not active - resetting keyboard state")
+            self.stop_move()
+            self.stop_movement_safety_check()
+            self.current_movement_key = None
+            self.movement_start_time = None
+            return
+
+        # Check 3: Verify maximum continuous movement time not exceeded
         if self.movement_start_time is not None:
             current_time = self.root.tk.call("clock", "milliseconds")
             elapsed_ms = current_time - self.movement_start_time
@@ -636,7 +756,8 @@ class MicroscopeGUI:
         if self.displayed_image is not None:
             try:
                 # Save image using image service
-                self.file_service.save_image(self.displayed_image, file_path)
+                # (copy because the display buffer is overwritten by the next live-view frame)
+                self.file_service.save_image(self.displayed_image.copy(), file_path)
                 # Remember the directory for next time
                 self.last_save_directory = os.path.dirname(file_path)
                 self.log_event(f"Image captured and saved to: {file_path}")
@@ -688,7 +809,8 @@ class MicroscopeGUI:
                 # Success - reset error counter
                 self.consecutive_capture_errors = 0
                 # Note: We don't save to file during auto capture, just display
-                pass  # The image will be displayed via the event system
+                # The image will be displayed via the event system, so the frame is not kept here
+                result.release()
             else:
                 # Capture failed
                 self.consecutive_capture_errors += 1
@@ -783,13 +905,20 @@ class MicroscopeGUI:
             new_width = int(width * scale)
             new_height = int(height * scale)
 
+            # Reuse display buffers while the display size and image format stay the same
+            resize_buffer, rgb_buffer = self._get_display_buffers(new_width, new_height, cv_image)
+
             # Resize image using cv2 with high-quality interpolation
             if scale > 1:
                 # Use INTER_CUBIC for upscaling (enlarging)
-                resized_image = cv2.resize(cv_image, (new_width, new_height), interpolation=cv2.INTER_CUBIC)
+                resized_image = cv2.resize(
+                    cv_image, (new_width, new_height), dst=resize_buffer, interpolation=cv2.INTER_CUBIC
+                )
             else:
                 # Use INTER_AREA for downscaling
-                resized_image = cv2.resize(cv_image, (new_width, new_height), interpolation=cv2.INTER_AREA)
+                resized_image = cv2.resize(
+                    cv_image, (new_width, new_height), dst=resize_buffer, interpolation=cv2.INTER_AREA
+                )
 
             self.displayed_image = resized_image
 
@@ -798,7 +927,10 @@ class MicroscopeGUI:
                 resized_image = self.add_scale_bar_overlay(resized_image)
 
             # Convert back to PIL Image for tkinter
-            rgb_image = cv2.cvtColor(resized_image, cv2.COLOR_BGR2RGB)
+            if resized_image.ndim == 3 and resized_image.shape[2] == 3:
+                rgb_image = cv2.cvtColor(resized_image, cv2.COLOR_BGR2RGB, dst=rgb_buffer)
+            else:
+                rgb_image = cv2.cvtColor(resized_image, cv2.COLOR_BGR2RGB)
             pil_image = Image.fromarray(rgb_image)
 
             # Convert to PhotoImage for tkinter
@@ -826,6 +958,18 @@ class MicroscopeGUI:
             self.log_event(f"Failed to display image: {str(e)}")
             self.image_label.configure(image="", text=f"Failed to display image: {str(e)}")
 
+    def _get_display_buffers(self, width, height, image):
+        """Return resize/RGB buffers for the display size, reallocating only when the size changes"""
+        channels = image.shape[2] if image.ndim == 3 else 1
+        if channels != 3 or image.dtype != np.uint8:
+            return None, None
+
+        if self.display_buffer_size != (width, height):
+            self.display_buffer_size = (width, height)
+            self.display_resize_buffer = np.empty((height, width, 3), dtype=np.uint8)
+            self.display_rgb_buffer = np.empty((height, width, 3), dtype=np.uint8)
+        return self.display_resize_buffer, self.display_rgb_buffer
+
     def add_scale_bar_overlay(self, image):
         """Add scale bar overlay at the bottom-left corner of the image"""
         try:
@@ -1140,6 +1284,294 @@ class MicroscopeGUI:
             self.stitching_button.configure(state="normal")
             self.stitching_status.configure(text="Error")
 
+    def capture_overview(self):
+        """Capture a low-magnification overview of the grid area for ROI scanning"""
+        try:
+            grid_x = self.grid_x_var.get()
+            grid_y = self.grid_y_var.get()
+            overview_str = self.config.get("stitching", {}).get("roi", {}).get("overview_magnitude", CameraMagnitude.MAG_5X.value)
+            magnitude = None
+            for mag in CameraMagnitude:
+                if mag.value == overview_str:
+                    magnitude = mag
+                    break
+
+            if magnitude is None or grid_x < 1 or grid_y < 1:
+                self.log_event("ERROR: Invalid overview settings")
+                return
+
+            if not messagebox.askokcancel("Overview", f"Switch the objective to {overview_str}.\nCapture a {grid_x}x{grid_y} overview?"):
+                return
+
+            self.stitching_button.configure(state="disabled")
+            self.stitching_status.configure(text="Capturing overview...")
+            self.manual_controller.stop()
+
+            self.stitching_controller.start()
+            if self.stitching_controller.capture_overview(grid_x, grid_y, magnitude, CornerPosition.TOP_LEFT):
+                self.log_event(f"Overview captured: {grid_x}x{grid_y} grid, {overview_str} magnitude")
+            else:
+                self.end_stitching()
+                self.log_event("ERROR: Overview failed")
+
+        except Exception as e:
+            self.log_event(f"ERROR: Failed to capture overview: {str(e)}")
+            self.end_stitching()
+            self.stitching_status.configure(text="Error")
+
+    def start_roi_stitching(self):
+        """Stitch only the tiles of the last overview that contain specimen"""
+        try:
+            if self.stitching_controller.overview is None:
+                messagebox.showwarning("Scan ROI", "No overview available. Please capture an overview first.")
+                return
+
+            magnitude_str = self.magnitude_var.get()
+            stitching_type_str = self.stitching_type_var.get()
+            magnitude = None
+            for mag in CameraMagnitude:
+                if mag.value == magnitude_str:
+                    magnitude = mag
+                    break
+
+            stitching_type = None
+            for st in StitchingType:
+                if st.value == stitching_type_str:
+                    stitching_type = st
+                    break
+
+            if magnitude is None or stitching_type is None:
+                self.log_event("ERROR: Invalid magnitude or stitching type selection")
+                return
+
+            if not messagebox.askokcancel("Scan ROI", f"Switch the objective to {magnitude_str}.\nScan the specimen area?"):
+                return
+
+            self.stitching_button.configure(state="disabled")
+            self.stitching_status.configure(text="Starting...")
+            self.manual_controller.stop()
+
+            self.stitching_controller.start()
+            if self.stitching_controller.roi_stitching(magnitude, stitching_type):
+                self.log_event(f"ROI stitching: {magnitude_str} magnitude, {stitching_type_str} type")
+            else:
+                self.end_stitching()
+                self.log_event("ERROR: ROI stitching failed")
+
+        except Exception as e:
+            self.log_event(f"ERROR: Failed to start ROI stitching: {str(e)}")
+            self.end_stitching()
+            self.stitching_status.configure(text="Error")
+
+    def add_to_queue(self):
+        """Queue the current grid settings with the current stage position as the top-left corner"""
+        try:
+            grid_x = self.grid_x_var.get()
+            grid_y = self.grid_y_var.get()
+            magnitude_str = self.magnitude_var.get()
+            stitching_type_str = self.stitching_type_var.get()
+            magnitude = None
+            for mag in CameraMagnitude:
+                if mag.value == magnitude_str:
+                    magnitude = mag
+                    break
+
+            stitching_type = None
+            for st in StitchingType:
+                if st.value == stitching_type_str:
+                    stitching_type = st
+                    break
+
+            if magnitude is None or stitching_type is None:
+                self.log_event("ERROR: Invalid magnitude or stitching type selection")
+                return
+            if grid_x < 1 or grid_y < 1:
+                self.log_event("ERROR: Grid size must be at least 1x1")
+                return
+
+            start_position = tuple(self.controller_service.get_current_position())
+            self.acquisition_queue.submit(AcquisitionJob(
+                start_position=start_position,
+                grid_size_x=grid_x,
+                grid_size_y=grid_y,
+                magnitude=magnitude,
+                stitching_type=stitching_type,
+            ))
+
+        except Exception as e:
+            self.log_event(f"ERROR: Failed to add to queue: {str(e)}")
+
+    def toggle_queue(self):
+        if self.queue_active:
+            self.acquisition_queue.stop()
+            self.log_event("QUEUE: Stopping after the current region...")
+            self.run_queue_button.configure(state="disabled")
+        else:
+            self.start_queue()
+
+    def start_queue(self):
+        """Run the queued regions on the acquisition queue's worker threads"""
+        if self.acquisition_queue.remaining() == 0:
+            messagebox.showwarning("Acquisition Queue", "No regions in the queue. Please add a region first.")
+            return
+
+        magnitude_str = self.magnitude_var.get()
+        if not messagebox.askokcancel(
+            "Acquisition Queue",
+            f"The objective is {magnitude_str}.\nRun {self.acquisition_queue.remaining()} queued region(s)?",
+        ):
+            return
+
+        magnitude = None
+        for mag in CameraMagnitude:
+            if mag.value == magnitude_str:
+                magnitude = mag
+                break
+
+        # 撮影スレッドとカメラ・ステージを取り合わないように、ライブ表示と位置の更新を止める
+        self.queue_active = True
+        self.stop_auto_capture()
+        self.stop_position_updates()
+        self.manual_controller.stop()
+        for button in (self.stitching_button, self.restitch_button, self.overview_button, self.roi_scan_button,
+                       self.flat_field_button, self.add_queue_button, self.stage_calibration_button,
+                       self.autofocus_button):
+            button.configure(state="disabled")
+        self.run_queue_button.configure(text="Stop Queue")
+
+        self.acquisition_queue.start(magnitude)
+        self.log_event(f"QUEUE: Started with {self.acquisition_queue.remaining()} region(s)")
+
+    def end_queue(self):
+        self.acquisition_queue.stop(cancel_pending=False)
+        self.queue_active = False
+        for button in (self.stitching_button, self.restitch_button, self.overview_button, self.roi_scan_button,
+                       self.flat_field_button, self.add_queue_button, self.stage_calibration_button):
+            button.configure(state="normal")
+        if self.stitching_controller.autofocus.available:
+            self.autofocus_button.configure(state="normal")
+        self.run_queue_button.configure(text="Run Queue", state="normal")
+        self.manual_controller.start()
+        self.start_position_updates()
+        self.start_auto_capture()
+        self.log_event("QUEUE: Finished")
+
+    def on_acquisition_job(self, event: AcquisitionJobEvent):
+        """Handle acquisition job status event"""
+        self.log_event(f"JOB {event.job_id}: {event.status.value} - {event.message}")
+        self.queue_status.configure(text=f"Queue: {event.remaining} remaining" if event.remaining else "Queue: empty")
+
+        if event.status == JobStatus.WAITING:
+            job = next((job for job in self.acquisition_queue.jobs() if job.job_id == event.job_id), None)
+            if job is not None and messagebox.askokcancel(
+                "Acquisition Queue", f"Switch the objective to {job.magnitude.value}.\nContinue the queue?"
+            ):
+                self.acquisition_queue.confirm_objective(job.magnitude)
+            else:
+                self.acquisition_queue.stop(cancel_pending=False)
+                self.end_queue()
+        elif self.queue_active and event.remaining == 0:
+            self.end_queue()
+
+    def calibrate_flat_field(self):
+        """Create the flat-field profile for the selected magnitude from the current field of view"""
+        try:
+            magnitude_str = self.magnitude_var.get()
+            magnitude = None
+            for mag in CameraMagnitude:
+                if mag.value == magnitude_str:
+                    magnitude = mag
+                    break
+
+            if magnitude is None:
+                self.log_event("ERROR: Invalid magnitude selection")
+                return
+
+            if not messagebox.askokcancel(
+                "Flat-field Calibration",
+                f"Move the stage to an empty area of the slide.\nCalibrate flat-field for {magnitude_str}?",
+            ):
+                return
+
+            self.stitching_button.configure(state="disabled")
+            self.flat_field_button.configure(state="disabled")
+            self.stitching_status.configure(text="Calibrating...")
+            self.manual_controller.stop()
+
+            success_flag = self.stitching_controller.calibrate_flat_field(magnitude)
+            if success_flag:
+                self.log_event(f"Flat-field calibrated for {magnitude_str}")
+            else:
+                self.log_event("ERROR: Flat-field calibration failed")
+                self.end_stitching()
+
+            self.flat_field_button.configure(state="normal")
+
+        except Exception as e:
+            self.log_event(f"ERROR: Failed to calibrate flat-field: {str(e)}")
+            self.flat_field_button.configure(state="normal")
+            self.end_stitching()
+            self.stitching_status.configure(text="Error")
+
+    def calibrate_stage(self):
+        """Measure stage move times on a worker thread and refit the motion model used for planning scans"""
+        distances = self.config["stage"].get("calibration", {}).get("distances_mm") or [10.0]
+        if not messagebox.askokcancel(
+            "Stage Calibration",
+            f"The stage will move up to {max(distances)} mm on each axis from the current position.\nCalibrate stage motion?",
+        ):
+            return
+
+        # 測定中の移動時間に影響しないように、位置の更新と手動操作を止める
+        self.stop_position_updates()
+        self.manual_controller.stop()
+        for button in (self.stitching_button, self.stage_calibration_button):
+            button.configure(state="disabled")
+        self.stitching_status.configure(text="Calibrating stage...")
+
+        def run():
+            success_flag = self.stitching_controller.calibrate_stage()
+            self.run_on_gui_thread(self.end_stage_calibration, success_flag)
+
+        threading.Thread(target=run, name="StageCalibration", daemon=True).start()
+
+    def end_stage_calibration(self, success_flag: bool):
+        if success_flag:
+            self.log_event("Stage motion calibrated")
+        else:
+            self.log_event("ERROR: Stage calibration failed")
+            self.stitching_status.configure(text="Ready")
+        for button in (self.stitching_button, self.stage_calibration_button):
+            button.configure(state="normal")
+        self.manual_controller.start()
+        self.start_position_updates()
+
+    def run_autofocus(self):
+        """Search for best focus at the current position on a worker thread"""
+        # 探索中の撮影とカメラを取り合わないように、ライブ表示・位置の更新・手動操作を止める
+        self.stop_auto_capture()
+        self.stop_position_updates()
+        self.manual_controller.stop()
+        for button in (self.stitching_button, self.autofocus_button):
+            button.configure(state="disabled")
+        self.stitching_status.configure(text="Autofocusing...")
+
+        def run():
+            success_flag = self.stitching_controller.run_autofocus()
+            self.run_on_gui_thread(self.end_autofocus, success_flag)
+
+        threading.Thread(target=run, name="Autofocus", daemon=True).start()
+
+    def end_autofocus(self, success_flag: bool):
+        if not success_flag:
+            self.log_event("ERROR: Autofocus failed")
+            self.stitching_status.configure(text="Ready")
+        for button in (self.stitching_button, self.autofocus_button):
+            button.configure(state="normal")
+        self.manual_controller.start()
+        self.start_position_updates()
+        self.start_auto_capture()
+
     def log_event(self, message):
         """Add event to log"""
         import datetime
@@ -7,10 +7,12 @@ from utils import config_loader
 from service.file_service import FileService
 from service.image_service import create_image_service
 from service.controller_service import create_controller_service
+from service.z_axis_service import create_z_axis_service
 from service.image_process_service import ImageProcessService
 from presentation.gui import MicroscopeGUI
 from application.manual_controller import ManualController
 from application.stitching_controller import StitchingController
+from application.acquisition_queue import AcquisitionQueue
 from application.event_bus import event_bus
 from mock.test_env import test_env
 from enums.enums import CameraMagnitude, CornerPosition
@@ -18,6 +20,7 @@ from enums.enums import CameraMagnitude, CornerPosition
 
 def stitching_test():
     config = config_loader.load_config("settings/config.yaml")
+    event_bus.configure(config)
     controller_service = create_controller_service(config)
     image_service = create_image_service(config)
     image_process_service = ImageProcessService(config)
@@ -46,12 +49,14 @@ def main():
 
     # Load config with mock override from command line
     config = config_loader.load_config("settings/config.yaml", mock_override=args.mock)
+    event_bus.configure(config)
 
     # Display current mode
     mode = "MOCK" if config.get('mock', False) else "REAL"
     print(f"Starting Microscope Controller in {mode} mode")
 
     controller_service = create_controller_service(config)
+    z_axis_service = create_z_axis_service(config)
     image_service = create_image_service(config)
     image_process_service = ImageProcessService(config)
     file_service = FileService(config)
@@ -68,11 +73,21 @@ def main():
         controller_service,
         image_service,
         image_process_service,
+        z_axis_service,
     )
 
+    acquisition_queue = AcquisitionQueue(config, controller_service, stitching_controller)
+
     root = tk.Tk()
     app = MicroscopeGUI(
-        root, config, controller_service, image_service, file_service, manual_controller, stitching_controller
+        root,
+        config,
+        controller_service,
+        image_service,
+        file_service,
+        manual_controller,
+        stitching_controller,
+        acquisition_queue,
     )
 
     stop_event = threading.Event()
@@ -96,8 +111,10 @@ def main():
         app.save_settings()  # Save GUI settings before closing
         app.stop_auto_capture()  # Stop auto capture timer
         app.stop_position_updates()  # Stop position update timer
-        app.manual_controller.stop()
+        app.manual_controller.shutdown()  # Stop jogging and the jog thread
         app.stitching_controller.stop()  # Stop stitching controller
+        acquisition_queue.stop()  # Stop after the region being captured
+        event_bus.dump_metrics()
         event_bus.clear_all_subscribers()
         root.destroy()
 
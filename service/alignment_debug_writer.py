@@ -0,0 +1,160 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import json
+import math
+import os
+import queue
+import threading
+
+import cv2
+import numpy as np
+
+from utils.logger import logger
+
+
+class AlignmentDebugWriter:
+    """
+    位置合わせのデバッグ用データを書き出す (デフォルトは無効)
+
+    - スティッチングごとにセッションフォルダ (directory/alignment_YYYYmmdd_HHMMSS) を作る
+    - 抽出したペアについて、重複領域の画像と二値化画像をPNGで保存する
+    - 全ペアの測定値 (タイル番号・方向・ずれ・信頼度・外れ値判定) と最終位置を session.json に保存する
+    - 書き込みは専用スレッドで行い、キューがあふれた場合は破棄する (位置合わせを待たせないため)
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        debug_config = config.get("stitching", {}).get("debug_artifacts", {}) or {}
+        self.enabled = debug_config.get("enabled", False)
+        self.directory = debug_config.get("directory", "output/alignment_debug")
+        self.sample_rate = min(max(debug_config.get("sample_rate", 0.1), 0.0), 1.0)
+        self.save_images = debug_config.get("save_images", True)
+        self.max_queue = debug_config.get("max_queue", 32)
+
+        self._queue: Optional[queue.Queue] = None
+        self._worker: Optional[threading.Thread] = None
+        self._session_dir: Optional[str] = None
+        self._session: Dict[str, Any] = {}
+        self._pairs: List[Dict[str, Any]] = []
+        self.dropped = 0
+
+    def start_session(self, stitching_type: str, grid_x: int, grid_y: int, overlap_x: int, overlap_y: int):
+        """スティッチング1回分のセッションを開始する"""
+        if not self.enabled:
+            return
+        self._start_worker()
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        self._session_dir = os.path.join(self.directory, f"alignment_{timestamp}")
+        self._session = {
+            "stitching_type": stitching_type,
+            "grid_size": [grid_x, grid_y],
+            "overlap_px": [overlap_x, overlap_y],
+            "sample_rate": self.sample_rate,
+        }
+        self._pairs = []
+
+    def record_pair(
+        self,
+        ref_idx: int,
+        current_idx: int,
+        direction: str,
+        ref_strip: np.ndarray,
+        current_strip: np.ndarray,
+        result: Optional[tuple],
+    ):
+        """
+        1ペアの測定結果を記録する
+
+        Args:
+            ref_idx, current_idx: タイル番号 (格子順)
+            direction: "left" または "top"
+            ref_strip, current_strip: 測定に使った重複領域
+            result: _find_alignmentの結果 (shift_x, shift_y, confidence)。失敗時はNone
+        """
+        if not self.enabled or self._session_dir is None:
+            return
+
+        pair_number = len(self._pairs)
+        entry = {
+            "pair": pair_number,
+            "ref_index": ref_idx,
+            "index": current_idx,
+            "direction": direction,
+            "shift": [result[0], result[1]] if result is not None else None,
+            "confidence": result[2] if result is not None else None,
+        }
+
+        # sample_rateの割合で等間隔にペアを抽出する (同じ入力なら同じペアが選ばれる)
+        sampled = math.floor((pair_number + 1) * self.sample_rate) > math.floor(pair_number * self.sample_rate)
+        if sampled and self.save_images:
+            prefix = f"pair_{pair_number:04d}_{ref_idx:04d}_{current_idx:04d}_{direction}"
+            entry["images"] = f"{prefix}_*.png"
+            # タイルのバッファは後で再利用されるため、抽出したペアだけ複製して渡す
+            self._submit(self._write_strips, self._session_dir, prefix, ref_strip.copy(), current_strip.copy())
+        self._pairs.append(entry)
+
+    def end_session(self, positions: List[tuple], alignment_success: List[bool], inliers: Optional[List[bool]] = None):
+        """最終位置と外れ値判定を加えて session.json を書き出す"""
+        if not self.enabled or self._session_dir is None:
+            return
+
+        measured = [entry for entry in self._pairs if entry["shift"] is not None]
+        if inliers is not None:
+            for entry, is_inlier in zip(measured, inliers):
+                entry["inlier"] = bool(is_inlier)
+
+        summary = {
+            **self._session,
+            "pairs": self._pairs,
+            "positions": [[int(x), int(y)] for x, y in positions],
+            "alignment_success": [bool(success) for success in alignment_success],
+        }
+        self._submit(self._write_summary, self._session_dir, summary)
+        self._session_dir = None
+
+    def flush(self, timeout: Optional[float] = None):
+        """キューに残っている書き込みを待つ"""
+        if self._queue is None:
+            return
+        done = threading.Event()
+        try:
+            self._queue.put(done.set, timeout=timeout)
+        except queue.Full:
+            return
+        done.wait(timeout)
+
+    def _start_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._worker = threading.Thread(target=self._worker_loop, name="AlignmentDebugWriter", daemon=True)
+        self._worker.start()
+
+    def _submit(self, func, *args):
+        try:
+            self._queue.put_nowait(lambda: func(*args))
+        except queue.Full:
+            self.dropped += 1
+
+    def _worker_loop(self):
+        while True:
+            task = self._queue.get()
+            try:
+                task()
+            except Exception as e:
+                logger.warning(f"Failed to write alignment debug artifact: {e}")
+
+    @staticmethod
+    def _write_strips(session_dir: str, prefix: str, ref_strip: np.ndarray, current_strip: np.ndarray):
+        os.makedirs(session_dir, exist_ok=True)
+        for name, strip in (("ref", ref_strip), ("current", current_strip)):
+            gray = cv2.cvtColor(strip, cv2.COLOR_BGR2GRAY) if len(strip.shape) == 3 else strip
+            _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_OTSU)
+            cv2.imwrite(os.path.join(session_dir, f"{prefix}_{name}.png"), strip)
+            cv2.imwrite(os.path.join(session_dir, f"{prefix}_{name}_binary.png"), binary)
+
+    @staticmethod
+    def _write_summary(session_dir: str, summary: Dict[str, Any]):
+        os.makedirs(session_dir, exist_ok=True)
+        with open(os.path.join(session_dir, "session.json"), "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        logger.info(f"Alignment debug artifacts saved to {session_dir}")
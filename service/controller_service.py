@@ -1,5 +1,6 @@
 from typing import Dict, Any
 import serial
+import threading
 import time
 
 from mock.test_env import test_env
@@ -18,6 +19,7 @@ def create_controller_service(config: Dict[str, Any]):
 class MockControllerService:
     def __init__(self, config: Dict[str, Any]):
         self.config = config
+        self.speed_level = None
         self.connect()
         self.setup_event_subscriptions()
 
@@ -30,6 +32,9 @@ class MockControllerService:
     def stop_move(self):
         test_env.stop_move()
 
+    def send_jog(self, degree: float):
+        test_env.start_move(degree)
+
     def is_moving(self):
         return test_env.is_moving
 
@@ -94,14 +99,32 @@ class MockControllerService:
         return True
 
     def change_speed(self, speed_level: SpeedLevel):
+        self.speed_level = speed_level
         speed = self.config["stage"]["speed"][speed_level.value] / 100
         test_env.change_speed(speed)
 
+    def set_jog_speed(self, speed_mm_s: float):
+        test_env.change_speed(speed_mm_s)
+
+    def timed_move(self, x: float, y: float) -> float:
+        start = time.perf_counter()
+        test_env.move_to(x, y, is_relative=True)
+        return time.perf_counter() - start
+
+    def restore_speed(self):
+        self.change_speed(self.speed_level or SpeedLevel.S1)
+
 
 class ControllerService:
     def __init__(self, config: Dict[str, Any]):
         self.config = config
         self.ser = None
+        # JOG操作のスレッド (JogController) とGUI・撮影のスレッドが同じシリアルポートを使うため、
+        # コマンドの送信 (応答があるコマンドは応答の受信まで) を1つずつ行う
+        # 移動の完了待ちではポーリングのたびに解放するため、その間もJOGの停止を送信できる
+        self.serial_lock = threading.RLock()
+        # change_speedで設定した速度段階 (連続移動撮影の後に戻すため)
+        self.speed_level = None
         self.connect()
         self.setup_event_subscriptions()
 
@@ -133,16 +156,22 @@ class ControllerService:
     def _send_command(self, command: str):
         """コマンドを送信"""
         cmd = command + '\r\n'
-        self.ser.write(cmd.encode())
+        with self.serial_lock:
+            self.ser.write(cmd.encode())
 
     def _read_response(self) -> str:
         """レスポンスを読み取り"""
         return self.ser.readline().decode().strip()
 
+    def _query(self, command: str) -> str:
+        """コマンドを送信してレスポンスを読み取る (間に他のスレッドのコマンドが入らないようにする)"""
+        with self.serial_lock:
+            self._send_command(command)
+            return self._read_response()
+
     def _check_ready(self) -> bool:
         """コントローラがReady状態かチェック"""
-        self._send_command('!:')
-        response = self._read_response()
+        response = self._query('!:')
         return 'R' in response
 
     def _ensure_ready(self):
@@ -155,8 +184,7 @@ class ControllerService:
 
     def check_status(self):
         """Q:コマンドでステータスをチェックし、エラーやリミットセンサを検出"""
-        self._send_command('Q:')
-        response = self._read_response()
+        response = self._query('Q:')
 
         # Parse response: "   -1000,   20000, ACK1, ACK2, ACK3"
         parts = [p.strip() for p in response.split(',')]
@@ -211,8 +239,7 @@ class ControllerService:
     def _wait_until_ready(self, poll_interval: float = 0.1):
         """ステージが停止するまで待機（!:コマンドでポーリング）"""
         while True:
-            self._send_command('!:')
-            response = self._read_response()
+            response = self._query('!:')
             if 'R' in response:  # Ready
                 break
             time.sleep(poll_interval)
@@ -221,13 +248,25 @@ class ControllerService:
         self.check_status()
 
     def _mm_to_pulses(self, mm: float) -> int:
-        """mmをパルス数に変換"""
-        return int(mm * self.config["stage"]["pulses_per_mm"])
+        """mmをパルス数に変換 (切り捨てると移動のたびに最大1パルスずつ目標からずれるため、四捨五入する)"""
+        return int(round(mm * self.config["stage"]["pulses_per_mm"]))
 
     def change_speed(self, speed_level: SpeedLevel):
         self._ensure_ready()
+        self.speed_level = speed_level
+        self._send_speed(self.config["stage"]["speed"][speed_level.value])
 
-        fast = self.config["stage"]["speed"][speed_level.value]
+    def set_jog_speed(self, speed_mm_s: float):
+        """JOG移動の速度をmm/sで設定する (連続移動撮影用)。元の速度段階にはrestore_speedで戻す"""
+        self._ensure_ready()
+        self._send_speed(max(1, int(round(speed_mm_s * self.config["stage"]["pulses_per_mm"]))))
+
+    def restore_speed(self):
+        """change_speedで最後に設定した速度段階に戻す"""
+        self.change_speed(self.speed_level or SpeedLevel.S1)
+
+    def _send_speed(self, fast: int):
+        """D:コマンドで両軸の起動速度・最高速度・加減速時間を設定する"""
         acceleration_time = self.config["stage"]["speed"]["acceleration_time"]
         slow = fast // 10  # slow = fast / 10
         if fast >= 50:  # fast rangeのslowの範囲は50~20000
@@ -244,7 +283,13 @@ class ControllerService:
         """JOG移動を開始（degree: 0/90/180/270）"""
         # Ensure controller is ready before sending command
         self._ensure_ready()
+        self.send_jog(degree)
 
+    def send_jog(self, degree: float):
+        """
+        JOG移動のコマンドをすぐに送信する (Readyの確認をしない。JogControllerが停止の完了を確認してから呼ぶ)
+        degree: 0/90/180/270
+        """
         # degree to axis and direction mapping
         if degree == 0:
             axis, direction = '1', '+'
@@ -258,8 +303,9 @@ class ControllerService:
             raise ValueError(f"Invalid degree: {degree}. Expected 0, 90, 180, or 270")
 
         # Send JOG command
-        self._send_command(f'J:{axis}{direction}')
-        self._send_command('G')
+        with self.serial_lock:
+            self._send_command(f'J:{axis}{direction}')
+            self._send_command('G')
 
     def stop_move(self):
         """移動を停止"""
@@ -267,8 +313,7 @@ class ControllerService:
 
     def is_moving(self) -> bool:
         """移動中かどうかを確認"""
-        self._send_command('!:')
-        response = self._read_response()
+        response = self._query('!:')
         return 'B' in response  # Busy
 
     def move_to(self, x: float, y: float, is_relative: bool = True):
@@ -290,17 +335,47 @@ class ControllerService:
 
         # M:WnmPxnmPx format for both axes
         cmd = f'M:W{x_dir}P{abs(x_pulses)}{y_dir}P{abs(y_pulses)}'
-        self._send_command(cmd)
-        self._send_command('G')
+        with self.serial_lock:
+            self._send_command(cmd)
+            self._send_command('G')
 
         # Wait until movement completes
         self._wait_until_ready()
 
+    def timed_move(self, x: float, y: float) -> float:
+        """
+        相対移動 (mm) して、コマンドの送信からReadyに戻るまでの時間 (秒) を返す (StageCalibrator用)
+        move_toより細かい間隔 (stage.calibration.poll_interval_s) で!:を送ってBusyからReadyへの変化を検出する
+        Readyに戻った時刻は、最後にBusyだった問い合わせと最初にReadyだった問い合わせの中間とする
+        (間隔を空けずに問い合わせるとシリアルとGILを移動中ずっと占有するため)
+        """
+        poll_interval = self.config["stage"].get("calibration", {}).get("poll_interval_s", 0.005)
+        self._ensure_ready()
+        x_pulses = self._mm_to_pulses(x)
+        y_pulses = self._mm_to_pulses(y)
+        x_dir = '+' if x_pulses >= 0 else '-'
+        y_dir = '+' if y_pulses >= 0 else '-'
+
+        start = time.perf_counter()
+        with self.serial_lock:
+            self._send_command(f'M:W{x_dir}P{abs(x_pulses)}{y_dir}P{abs(y_pulses)}')
+            self._send_command('G')
+        last_busy = start
+        while True:
+            queried_at = time.perf_counter()
+            if 'R' in self._query('!:'):
+                break
+            last_busy = queried_at
+            time.sleep(poll_interval)
+        elapsed = (last_busy + queried_at) / 2 - start
+
+        self.check_status()
+        return elapsed
+
     def get_current_position(self):
         """現在位置を取得（Q:コマンド）"""
         try:
-            self._send_command('Q:')
-            response = self._read_response()
+            response = self._query('Q:')
             # Parse response: "   -1000,   20000, ACK1, ACK2, ACK3"
             # Extract coordinates and convert to mm
             parts = response.split(',')
@@ -0,0 +1,189 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import os
+import threading
+
+import cv2
+import numpy as np
+
+from utils.frame import as_array
+from utils.logger import logger
+
+
+class FlatFieldCorrector:
+    """
+    フラットフィールド (シェーディング・周辺減光) 補正
+
+    corrected = (raw - dark) * mean(flat - dark) / (flat - dark)
+
+    - プロファイル (flat, dark) は倍率ごとに低解像度で保持し、calibration_directory/flat_field_<倍率>.npz に保存する
+    - プロファイルは何も写っていない視野の撮影 (calibrate) か、撮影したタイルの中央値 (estimate_from_images) から求める
+    - 画像サイズごとの補正係数はメモリにキャッシュし、補正は1回のcv2.subtract/cv2.multiplyで行う
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        flat_field_config = config.get("stitching", {}).get("flat_field", {}) or {}
+        self.enabled = flat_field_config.get("enabled", True)
+        self.calibration_directory = flat_field_config.get("calibration_directory", "settings/calibration")
+        self.estimate_from_tiles = flat_field_config.get("estimate_from_tiles", False)
+        self.min_tiles = flat_field_config.get("min_tiles", 9)
+        self.profile_scale = flat_field_config.get("profile_scale", 0.125)
+        self.smoothing = flat_field_config.get("smoothing", 0.01)
+        self.max_gain = flat_field_config.get("max_gain", 4.0)
+
+        self._profiles: Dict[str, Optional[Dict[str, Any]]] = {}
+        self._corrections: Dict[Tuple[str, Tuple[int, ...]], Tuple[np.ndarray, Optional[np.ndarray]]] = {}
+        self._lock = threading.Lock()
+
+    def has_profile(self, magnification: str) -> bool:
+        return self._get_profile(magnification) is not None
+
+    def calibrate(
+        self, magnification: str, flat_images: List[Any], dark_images: Optional[List[Any]] = None
+    ) -> bool:
+        """何も写っていない視野 (と遮光時) の撮影画像からプロファイルを作成し保存する"""
+        if not flat_images:
+            return False
+        flat = np.mean([self._downsample(image) for image in flat_images], axis=0)
+        dark = np.mean([self._downsample(image) for image in dark_images], axis=0) if dark_images else None
+        self._set_profile(magnification, flat, dark, "calibration", len(flat_images))
+        return True
+
+    def estimate_from_images(self, magnification: str, images: List[Any]) -> bool:
+        """
+        撮影したタイルの画素ごとの中央値からプロファイルを推定し保存する
+        試料の構造はタイルごとに異なるため、枚数が十分あれば中央値には照明むらだけが残る
+        """
+        if len(images) < self.min_tiles:
+            logger.info(f"Not enough tiles to estimate flat field ({len(images)} < {self.min_tiles})")
+            return False
+        flat = np.median(np.stack([self._downsample(image) for image in images]), axis=0)
+        self._set_profile(magnification, flat, None, "tiles", len(images))
+        return True
+
+    def apply(self, image: Any, magnification: str, dst: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        """
+        補正した画像を返す。プロファイルがない場合や無効な場合はNone
+
+        Args:
+            image: 補正する画像 (Frame/ndarray, uint8)
+            magnification: 倍率 ("x10"など)
+            dst: 出力先 (imageと同じ形状のuint8)。Noneなら新しく確保する。imageと同じ配列なら上書きする
+        """
+        if not self.enabled:
+            return None
+        src = as_array(image)
+        correction = self._get_correction(magnification, src.shape)
+        if correction is None:
+            return None
+
+        gain, dark = correction
+        if dst is None:
+            dst = np.empty_like(src)
+        if dark is not None:
+            cv2.subtract(src, dark, dst=dst)
+            src = dst
+        return cv2.multiply(src, gain, dst=dst, dtype=cv2.CV_8U)
+
+    def _downsample(self, image: Any) -> np.ndarray:
+        src = as_array(image)
+        return cv2.resize(
+            src, None, fx=self.profile_scale, fy=self.profile_scale, interpolation=cv2.INTER_AREA
+        ).astype(np.float32)
+
+    def _set_profile(self, magnification: str, flat: np.ndarray, dark: Optional[np.ndarray], source: str, count: int):
+        # 試料の構造やノイズが残らないように、プロファイルを平滑化する
+        sigma = max(1.0, self.smoothing * max(flat.shape[:2]))
+        flat = cv2.GaussianBlur(flat.astype(np.float32), (0, 0), sigma)
+        if dark is not None:
+            dark = cv2.GaussianBlur(dark.astype(np.float32), (0, 0), sigma)
+
+        profile = {"flat": flat, "dark": dark, "source": source, "count": count, "created": datetime.now().isoformat()}
+        with self._lock:
+            self._profiles[magnification] = profile
+            self._corrections = {key: value for key, value in self._corrections.items() if key[0] != magnification}
+        self._save_profile(magnification, profile)
+        logger.info(f"Flat field profile for {magnification} updated from {count} {source} image(s)")
+
+    def _get_profile(self, magnification: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if magnification in self._profiles:
+                return self._profiles[magnification]
+        profile = self._load_profile(magnification)
+        with self._lock:
+            self._profiles.setdefault(magnification, profile)
+            return self._profiles[magnification]
+
+    def _get_correction(
+        self, magnification: str, shape: Tuple[int, ...]
+    ) -> Optional[Tuple[np.ndarray, Optional[np.ndarray]]]:
+        """画像サイズに合わせた補正係数 (gain: float32, dark: uint8) を取得する"""
+        key = (magnification, tuple(shape))
+        with self._lock:
+            correction = self._corrections.get(key)
+        if correction is not None:
+            return correction
+
+        profile = self._get_profile(magnification)
+        if profile is None:
+            return None
+
+        height, width = shape[:2]
+        channels = shape[2] if len(shape) == 3 else 1
+        flat = self._resize_profile(profile["flat"], width, height, channels)
+        dark = None
+        if profile["dark"] is not None:
+            dark = self._resize_profile(profile["dark"], width, height, channels)
+            flat = np.maximum(flat - dark, 0)
+
+        # チャンネルごとの平均明るさに揃える
+        mean = flat.reshape(-1, channels).mean(axis=0)
+        gain = np.divide(mean, np.maximum(flat, 1e-3)).astype(np.float32)
+        np.minimum(gain, self.max_gain, out=gain)
+        if channels == 1:
+            gain = gain.reshape(height, width)
+        correction = (gain, np.clip(np.round(dark), 0, 255).astype(np.uint8).reshape(gain.shape) if dark is not None else None)
+
+        with self._lock:
+            self._corrections[key] = correction
+        return correction
+
+    @staticmethod
+    def _resize_profile(profile: np.ndarray, width: int, height: int, channels: int) -> np.ndarray:
+        resized = cv2.resize(profile, (width, height), interpolation=cv2.INTER_LINEAR)
+        if resized.ndim == 2:
+            resized = resized[:, :, np.newaxis]
+        if resized.shape[2] != channels:
+            # カラーのプロファイルをモノクロ画像に使う場合は平均、その逆は複製する
+            resized = resized.mean(axis=2, keepdims=True) if channels == 1 else np.repeat(resized[:, :, :1], channels, axis=2)
+        return resized.astype(np.float32)
+
+    def _profile_path(self, magnification: str) -> str:
+        return os.path.join(self.calibration_directory, f"flat_field_{magnification}.npz")
+
+    def _save_profile(self, magnification: str, profile: Dict[str, Any]):
+        try:
+            os.makedirs(self.calibration_directory, exist_ok=True)
+            arrays = {"flat": profile["flat"], "source": profile["source"], "count": profile["count"], "created": profile["created"]}
+            if profile["dark"] is not None:
+                arrays["dark"] = profile["dark"]
+            np.savez_compressed(self._profile_path(magnification), **arrays)
+        except Exception as e:
+            logger.warning(f"Failed to save flat field profile for {magnification}: {e}")
+
+    def _load_profile(self, magnification: str) -> Optional[Dict[str, Any]]:
+        path = self._profile_path(magnification)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                return {
+                    "flat": data["flat"].astype(np.float32),
+                    "dark": data["dark"].astype(np.float32) if "dark" in data.files else None,
+                    "source": str(data["source"]),
+                    "count": int(data["count"]),
+                    "created": str(data["created"]),
+                }
+        except Exception as e:
+            logger.warning(f"Failed to load flat field profile {path}: {e}")
+            return None
@@ -0,0 +1,106 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from enums.enums import FocusSurface
+
+
+class FocusMap:
+    """
+    疎な点で測定した合焦位置から、撮影範囲の各位置の合焦位置 (Z) を予測する
+
+    - plane: 最小二乗で当てはめた平面 (試料の傾き)
+    - tps: 薄板スプライン (スライドガラスのたわみなど、平面でない変化)。smoothingで測定点への当てはめを緩める
+      測定点が4点未満の場合は平面を使う
+    - 測定点が3点未満の場合は平均のZ (1点ならその点のZ)
+    - 各測定点の合焦度を保持し、撮影したタイルの合焦度と比べる基準にする (reference_score)
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        focus_map_config = (config.get("autofocus", {}) or {}).get("focus_map", {}) or {}
+        self.enabled = focus_map_config.get("enabled", False)
+        self.surface = FocusSurface(focus_map_config.get("surface", FocusSurface.PLANE.value))
+        self.smoothing = focus_map_config.get("smoothing", 0.0)
+        self.points_x = max(1, focus_map_config.get("points_x", 3))
+        self.points_y = max(1, focus_map_config.get("points_y", 3))
+        # 撮影したタイルの合焦度が低い場合に合焦し直す条件 (StitchingController._check_focus)
+        self.min_sharpness_ratio = focus_map_config.get("min_sharpness_ratio", 0.5)
+        self.refocus_range_mm = focus_map_config.get("refocus_range_mm", 0.02)
+        self.min_refocus_gain = focus_map_config.get("min_refocus_gain", 1.2)
+        self.max_refocus = focus_map_config.get("max_refocus", 5)
+        self.reset()
+
+    def reset(self):
+        self.points: List[Tuple[float, float, float, float]] = []
+        self._model = None
+
+    @property
+    def ready(self) -> bool:
+        return self._model is not None
+
+    def add(self, x: float, y: float, z: float, score: float):
+        """測定点 (ステージの位置、合焦位置、合焦度) を追加する。fitを呼ぶまで予測には反映しない"""
+        self.points.append((x, y, z, score))
+
+    def fit(self) -> bool:
+        if not self.points:
+            self._model = None
+            return False
+        xy = np.array([(x, y) for x, y, _, _ in self.points], dtype=np.float64)
+        z = np.array([point[2] for point in self.points], dtype=np.float64)
+        # 座標はステージの絶対位置なので、数値誤差を避けるため測定点の中心からの相対位置で当てはめる
+        origin = xy.mean(axis=0)
+        xy = xy - origin
+
+        if len(self.points) < 3:
+            self._model = ("constant", origin, float(z.mean()))
+        elif self.surface == FocusSurface.TPS and len(self.points) >= 4:
+            self._model = ("tps", origin, xy, self._fit_tps(xy, z))
+        else:
+            design = np.column_stack([np.ones(len(z)), xy])
+            coefficients, _, rank, _ = np.linalg.lstsq(design, z, rcond=None)
+            # 測定点が一直線上にある場合は傾きが決まらないため平均にする
+            self._model = ("plane", origin, coefficients) if rank == 3 else ("constant", origin, float(z.mean()))
+        return True
+
+    def _fit_tps(self, xy: np.ndarray, z: np.ndarray) -> np.ndarray:
+        n = len(z)
+        kernel = self._tps_kernel(xy, xy) + self.smoothing * np.eye(n)
+        affine = np.column_stack([np.ones(n), xy])
+        system = np.zeros((n + 3, n + 3))
+        system[:n, :n] = kernel
+        system[:n, n:] = affine
+        system[n:, :n] = affine.T
+        rhs = np.concatenate([z, np.zeros(3)])
+        # 測定点が一直線上にあるなど解が一意でない場合も最小二乗で解く
+        return np.linalg.lstsq(system, rhs, rcond=None)[0]
+
+    @staticmethod
+    def _tps_kernel(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        r2 = np.sum((a[:, None, :] - b[None, :, :]) ** 2, axis=2)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            kernel = 0.5 * r2 * np.log(r2)
+        return np.nan_to_num(kernel)
+
+    def predict(self, x: float, y: float) -> Optional[float]:
+        """(x, y) の合焦位置。当てはめていない場合はNone"""
+        if self._model is None:
+            return None
+        kind, origin = self._model[0], self._model[1]
+        position = np.array([x, y], dtype=np.float64) - origin
+        if kind == "constant":
+            return self._model[2]
+        if kind == "plane":
+            coefficients = self._model[2]
+            return float(coefficients[0] + coefficients[1:] @ position)
+        centers, weights = self._model[2], self._model[3]
+        n = len(centers)
+        kernel = self._tps_kernel(position[None, :], centers)[0]
+        return float(kernel @ weights[:n] + weights[n] + weights[n + 1:] @ position)
+
+    def reference_score(self, x: float, y: float) -> Optional[float]:
+        """(x, y) に最も近い測定点の合焦度"""
+        if not self.points:
+            return None
+        nearest = min(self.points, key=lambda point: (point[0] - x) ** 2 + (point[1] - y) ** 2)
+        return nearest[3]
@@ -0,0 +1,46 @@
+from typing import Any, Dict
+import cv2
+import numpy as np
+
+from enums.enums import FocusMetric
+from utils.frame import as_array
+
+
+class FocusMeasure:
+    """
+    画像の合焦度 (大きいほど焦点が合っている) を求める
+
+    - 画像の中央の roi_ratio の範囲だけを使い、長辺が max_roi_px 以下になるよう縮小してから計算する
+      (撮影画像全体で計算すると1回に数十msかかり、オートフォーカスの評価回数だけ積み重なるため)
+    - laplacian: ラプラシアンの分散、tenengrad: Sobelの勾配の2乗の平均
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        autofocus_config = config.get("autofocus", {}) or {}
+        self.metric = FocusMetric(autofocus_config.get("metric", FocusMetric.LAPLACIAN.value))
+        self.roi_ratio = autofocus_config.get("roi_ratio", 0.5)
+        self.max_roi_px = autofocus_config.get("max_roi_px", 512)
+
+    def measure(self, image: Any) -> float:
+        return self.measure_gray(self.roi(image))
+
+    def roi(self, image: Any) -> np.ndarray:
+        """中央の範囲を縮小したグレースケール画像 (float32)"""
+        src = as_array(image)
+        h, w = src.shape[:2]
+        roi_h, roi_w = max(1, int(h * self.roi_ratio)), max(1, int(w * self.roi_ratio))
+        y0, x0 = (h - roi_h) // 2, (w - roi_w) // 2
+        region = src[y0:y0 + roi_h, x0:x0 + roi_w]
+        gray = cv2.cvtColor(region, cv2.COLOR_BGR2GRAY) if region.ndim == 3 else region
+
+        scale = self.max_roi_px / max(roi_h, roi_w)
+        if scale < 1.0:
+            gray = cv2.resize(gray, (max(1, int(roi_w * scale)), max(1, int(roi_h * scale))), interpolation=cv2.INTER_AREA)
+        return gray.astype(np.float32)
+
+    def measure_gray(self, gray: np.ndarray) -> float:
+        if self.metric == FocusMetric.TENENGRAD:
+            gx = cv2.Sobel(gray, cv2.CV_32F, 1, 0, ksize=3)
+            gy = cv2.Sobel(gray, cv2.CV_32F, 0, 1, ksize=3)
+            return float(np.mean(gx * gx + gy * gy))
+        return float(cv2.Laplacian(gray, cv2.CV_32F).var())
@@ -0,0 +1,59 @@
+from typing import Any, Dict, Optional
+import cv2
+import numpy as np
+
+from utils.frame import as_array
+
+
+class FocusStacker:
+    """
+    Zを変えて撮影した複数の画像を、画素ごとに最も合焦している画像の値を選んで1枚に合成する (深度合成)
+
+    - 撮影はStitchingControllerが行う (各タイルで planes 枚を step_mm 間隔で、現在のZを中心に下から撮影する)
+    - 画像を受け取るたびに合成結果を更新するため、保持するのは合成結果と画素ごとの最大の合焦度だけ
+      (撮影した画像はaddの後すぐに返却できる)
+    - 画素の合焦度はラプラシアンの絶対値をガウシアンでぼかしたもの
+      ぼかさないとノイズで画素ごとに選ぶ画像がばらつき、合成結果がざらつく
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        stack_config = config.get("stitching", {}).get("focus_stack", {}) or {}
+        self.enabled = stack_config.get("enabled", False)
+        self.magnifications = stack_config.get("magnifications", ["x50", "x100"])
+        self.planes = max(1, stack_config.get("planes", 5))
+        self.step_mm = stack_config.get("step_mm", 0.002)
+        self.sharpness_sigma_px = stack_config.get("sharpness_sigma_px", 2.0)
+        self.reset()
+
+    def reset(self):
+        self._fused: Optional[np.ndarray] = None
+        self._best: Optional[np.ndarray] = None
+        self.num_planes = 0
+
+    def add(self, image: Any):
+        """1枚の画像を合成結果に反映する"""
+        src = as_array(image)
+        sharpness = self._sharpness(src)
+        if self._fused is None:
+            self._fused = src.copy()
+            self._best = sharpness
+        else:
+            # np.copytoでマスクをチャンネル方向にブロードキャストすると数十倍遅いため、OpenCVでコピーする
+            mask = cv2.compare(sharpness, self._best, cv2.CMP_GT)
+            np.maximum(self._best, sharpness, out=self._best)
+            cv2.copyTo(src, mask, self._fused)
+        self.num_planes += 1
+
+    def result(self) -> Optional[np.ndarray]:
+        """合成結果 (画像を1枚も受け取っていなければNone)。呼び出し後は新しい合成を始める"""
+        fused = self._fused
+        self.reset()
+        return fused
+
+    def _sharpness(self, src: np.ndarray) -> np.ndarray:
+        gray = cv2.cvtColor(src, cv2.COLOR_BGR2GRAY) if src.ndim == 3 else src
+        sharpness = cv2.Laplacian(gray, cv2.CV_32F, ksize=3)
+        np.abs(sharpness, out=sharpness)
+        if self.sharpness_sigma_px > 0:
+            sharpness = cv2.GaussianBlur(sharpness, (0, 0), self.sharpness_sigma_px)
+        return sharpness
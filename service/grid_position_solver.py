@@ -0,0 +1,232 @@
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+from utils.logger import logger
+
+
+class GridPositionSolver:
+    """
+    Solve tile positions of a stitching grid from all pairwise shift measurements
+
+    Every measurement says "tile j is at (dx, dy) from tile i" with a confidence weight.
+    Positions are found by weighted least squares over the whole graph instead of chaining
+    tiles from their left/top neighbour, so one bad pair no longer shifts everything after it.
+
+    - Weak priors keep the system well-posed: neighbour pairs are pulled toward their nominal
+      step, and every tile is pulled very weakly toward its nominal position (this also fixes
+      the global translation and tiles without any measurement)
+    - Measurements with large residuals are down-weighted (iteratively reweighted least squares);
+      those still far above the others are then rejected as outliers and the positions are solved
+      again from the remaining measurements with their original weights
+    - The normal equations are a sparse graph Laplacian; they are solved with Jacobi-preconditioned
+      conjugate gradients on edge lists, so memory and time scale with the number of pairs
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        solver_config = config.get("stitching", {}).get("global_alignment", {}) or {}
+        self.prior_weight = solver_config.get("prior_weight", 0.01)
+        self.anchor_weight = solver_config.get("anchor_weight", 1e-4)
+        self.outlier_threshold_px = solver_config.get("outlier_threshold_px", 2.0)
+        self.outlier_mad_scale = solver_config.get("outlier_mad_scale", 4.0)
+        self.robust_scale_px = solver_config.get("robust_scale_px", 1.0)
+        self.max_iterations = solver_config.get("max_iterations", 10)
+        self.cg_tolerance = solver_config.get("cg_tolerance", 1e-6)
+
+    def solve(
+        self,
+        nominal_positions: np.ndarray,
+        measurements: List[Tuple[int, int, float, float, float]],
+        neighbour_pairs: List[Tuple[int, int]],
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Args:
+            nominal_positions: (n, 2) expected (x, y) of each tile
+            measurements: (i, j, dx, dy, weight) meaning pos[j] - pos[i] = (dx, dy)
+            neighbour_pairs: (i, j) pairs that overlap nominally; used for the step priors
+
+        Returns:
+            Tuple of (positions, inliers) where:
+            - positions: (n, 2) float positions
+            - inliers: boolean mask over measurements that were kept
+        """
+        nominal = np.asarray(nominal_positions, dtype=np.float64).reshape(-1, 2)
+        num_tiles = len(nominal)
+
+        if measurements:
+            meas = np.asarray(measurements, dtype=np.float64).reshape(-1, 5)
+        else:
+            meas = np.zeros((0, 5), dtype=np.float64)
+        meas_i = meas[:, 0].astype(np.int64)
+        meas_j = meas[:, 1].astype(np.int64)
+        meas_d = meas[:, 2:4]
+        meas_w = np.clip(meas[:, 4], 1e-12, None)
+
+        # Prior weights are relative to the typical measurement weight so the units of the
+        # confidence (phase response or match count) do not matter
+        scale = float(np.median(meas_w)) if len(meas_w) else 1.0
+        pairs = np.asarray(neighbour_pairs, dtype=np.int64).reshape(-1, 2)
+        prior_i, prior_j = pairs[:, 0], pairs[:, 1]
+        prior_d = nominal[prior_j] - nominal[prior_i]
+        prior_w = np.full(len(pairs), self.prior_weight * scale)
+        anchor_w = np.full(num_tiles, self.anchor_weight * scale)
+
+        robust_w = np.ones(len(meas))
+        robust_scale = None
+        positions = nominal.copy()
+        for iteration in range(max(1, self.max_iterations)):
+            edge_i = np.concatenate([meas_i, prior_i])
+            edge_j = np.concatenate([meas_j, prior_j])
+            edge_d = np.concatenate([meas_d, prior_d])
+            edge_w = np.concatenate([meas_w * robust_w, prior_w])
+            positions = self._solve_least_squares(num_tiles, edge_i, edge_j, edge_d, edge_w, nominal, anchor_w, positions)
+
+            if not len(meas):
+                break
+            residuals = np.linalg.norm(positions[meas_j] - positions[meas_i] - meas_d, axis=1)
+
+            # 残差の大きい測定値ほど重みを下げて再計算する (Cauchy重みの反復再重み付け)
+            # 最小二乗だけでは1つの誤った測定値の誤差が周囲のタイルに分散してしまうため。
+            # 基準値は大きな値から徐々に小さくし、初回の解で引きずられたタイルも正しい位置へ戻れるようにする
+            if robust_scale is None:
+                robust_scale = max(self.robust_scale_px, float(np.percentile(residuals, 90)))
+            else:
+                robust_scale = max(self.robust_scale_px, robust_scale / 2.0)
+            new_robust_w = 1.0 / (1.0 + (residuals / robust_scale) ** 2)
+            if robust_scale == self.robust_scale_px and np.allclose(new_robust_w, robust_w, atol=1e-3):
+                break
+            robust_w = new_robust_w
+
+        # 最終的な残差が他より明らかに大きい測定値を外れ値とし、それを除いて元の重みで解き直す
+        # (重みを下げただけでは、外れ値が多い場合に周囲のタイルが数十ピクセル引きずられたままになるため)
+        # 解き直すと残差が変わるので、外れ値の判定が変わらなくなるまで繰り返す
+        inliers = np.ones(len(meas), dtype=bool)
+        for iteration in range(max(1, self.max_iterations)):
+            if not len(meas):
+                break
+            kept = residuals[inliers] if inliers.any() else residuals
+            mad = float(np.median(np.abs(kept - np.median(kept))))
+            threshold = max(self.outlier_threshold_px, self.outlier_mad_scale * 1.4826 * mad)
+            new_inliers = self._recover_isolated(positions, meas_i, meas_j, meas_d, residuals <= threshold, threshold)
+            if iteration > 0 and np.array_equal(new_inliers, inliers):
+                break
+            inliers = new_inliers
+            edge_i = np.concatenate([meas_i[inliers], prior_i])
+            edge_j = np.concatenate([meas_j[inliers], prior_j])
+            edge_d = np.concatenate([meas_d[inliers], prior_d])
+            edge_w = np.concatenate([meas_w[inliers], prior_w])
+            positions = self._solve_least_squares(num_tiles, edge_i, edge_j, edge_d, edge_w, nominal, anchor_w, positions)
+            residuals = np.linalg.norm(positions[meas_j] - positions[meas_i] - meas_d, axis=1)
+
+        rejected = int(len(meas) - inliers.sum())
+        if rejected:
+            logger.info(f"Global alignment rejected {rejected}/{len(meas)} pairwise shifts as outliers")
+        return positions, inliers
+
+    @staticmethod
+    def _recover_isolated(
+        positions: np.ndarray,
+        meas_i: np.ndarray,
+        meas_j: np.ndarray,
+        meas_d: np.ndarray,
+        inliers: np.ndarray,
+        threshold: float,
+    ) -> np.ndarray:
+        """
+        Keep measurements of tiles that would otherwise lose all of them
+
+        Such a tile was dragged by its bad measurements, so its good ones have large residuals too.
+        Each measurement gives a candidate position for the tile; the candidate that the most other
+        measurements agree with is kept (ties go to the one closest to the current, prior-driven position).
+        At least two measurements must agree, so a tile with a single unconfirmed shift stays on its prior
+        """
+        has_inlier = np.zeros(len(positions), dtype=bool)
+        has_inlier[meas_i[inliers]] = True
+        has_inlier[meas_j[inliers]] = True
+        inliers = inliers.copy()
+        for tile in np.unique(np.concatenate([meas_i, meas_j])):
+            if has_inlier[tile]:
+                continue
+            edges = np.flatnonzero((meas_i == tile) | (meas_j == tile))
+            if len(edges) < 2:
+                continue
+            is_j = (meas_j[edges] == tile)[:, np.newaxis]
+            candidates = np.where(is_j, positions[meas_i[edges]] + meas_d[edges], positions[meas_j[edges]] - meas_d[edges])
+            agree = np.linalg.norm(candidates[:, np.newaxis] - candidates[np.newaxis], axis=2) <= threshold
+            support = agree.sum(axis=1)
+            prior_distance = np.linalg.norm(candidates - positions[tile], axis=1)
+            best = np.lexsort((prior_distance, -support))[0]
+            if support[best] >= 2:
+                inliers[edges[agree[best]]] = True
+        return inliers
+
+    def _solve_least_squares(
+        self,
+        num_tiles: int,
+        edge_i: np.ndarray,
+        edge_j: np.ndarray,
+        edge_d: np.ndarray,
+        edge_w: np.ndarray,
+        anchors: np.ndarray,
+        anchor_w: np.ndarray,
+        initial: np.ndarray,
+    ) -> np.ndarray:
+        """Minimise sum w_e |x_j - x_i - d_e|^2 + sum a_k |x_k - anchor_k|^2 with preconditioned CG"""
+
+        def laplacian(x: np.ndarray) -> np.ndarray:
+            diff = (x[edge_j] - x[edge_i]) * edge_w[:, np.newaxis]
+            result = anchor_w[:, np.newaxis] * x
+            for axis in range(2):
+                result[:, axis] += np.bincount(edge_j, diff[:, axis], minlength=num_tiles)
+                result[:, axis] -= np.bincount(edge_i, diff[:, axis], minlength=num_tiles)
+            return result
+
+        weighted_d = edge_d * edge_w[:, np.newaxis]
+        rhs = anchor_w[:, np.newaxis] * anchors
+        for axis in range(2):
+            rhs[:, axis] += np.bincount(edge_j, weighted_d[:, axis], minlength=num_tiles)
+            rhs[:, axis] -= np.bincount(edge_i, weighted_d[:, axis], minlength=num_tiles)
+
+        diagonal = anchor_w + np.bincount(edge_i, edge_w, minlength=num_tiles) + np.bincount(
+            edge_j, edge_w, minlength=num_tiles
+        )
+        inv_diagonal = (1.0 / diagonal)[:, np.newaxis]
+
+        # Both axes share the same matrix and are solved together column by column
+        x = initial.copy()
+        r = rhs - laplacian(x)
+        z = r * inv_diagonal
+        p = z.copy()
+        rz = np.sum(r * z, axis=0)
+        rhs_norm = np.linalg.norm(rhs, axis=0)
+        rhs_norm[rhs_norm == 0] = 1.0
+
+        for _ in range(max(100, 10 * num_tiles)):
+            if np.all(np.linalg.norm(r, axis=0) <= self.cg_tolerance * rhs_norm):
+                break
+            ap = laplacian(p)
+            pap = np.sum(p * ap, axis=0)
+            alpha = np.divide(rz, pap, out=np.zeros_like(rz), where=pap > 0)
+            x += alpha * p
+            r -= alpha * ap
+            z = r * inv_diagonal
+            rz_new = np.sum(r * z, axis=0)
+            beta = np.divide(rz_new, rz, out=np.zeros_like(rz), where=rz > 0)
+            p = z + beta * p
+            rz = rz_new
+
+        return x
+
+
+def grid_neighbour_pairs(grid_x: int, grid_y: int, present: Optional[List[bool]] = None) -> List[Tuple[int, int, str]]:
+    """Left/top neighbour pairs (ref_idx, idx, direction) of a row-major grid, skipping missing tiles"""
+    pairs = []
+    for y in range(grid_y):
+        for x in range(grid_x):
+            idx = y * grid_x + x
+            if present is not None and not present[idx]:
+                continue
+            if x > 0 and (present is None or present[idx - 1]):
+                pairs.append((idx - 1, idx, "left"))
+            if y > 0 and (present is None or present[idx - grid_x]):
+                pairs.append((idx - grid_x, idx, "top"))
+    return pairs
@@ -4,6 +4,12 @@ import numpy as np
 
 from application.event_bus import event_bus, ErrorEvent
 from enums.enums import StitchingType
+from service.alignment_debug_writer import AlignmentDebugWriter
+from service.flat_field_corrector import FlatFieldCorrector
+from service.grid_position_solver import GridPositionSolver, grid_neighbour_pairs
+from service.tile_blender import FeatherBlender, MultiBandBlender
+from service.tile_edge_cache import TileEdgeCache
+from utils.frame import as_array
 from utils.logger import logger
 
 
@@ -19,9 +25,156 @@ class ImageProcessService:
         if ImageProcessService._orb is None:
             ImageProcessService._orb = cv2.ORB_create()
         self.orb = ImageProcessService._orb
+        self.position_solver = GridPositionSolver(config)
+
+        # 重複領域のスペクトル・特徴点のキャッシュ (再スティッチング時も再利用する)
+        stitching_config = config.get("stitching", {})
+        self.phase_window = stitching_config.get("phase_window", True)
+        self.spectrum_cache = TileEdgeCache(int(stitching_config.get("spectrum_cache_mb", 256) * 1024 * 1024))
+        self.feature_cache = TileEdgeCache(int(stitching_config.get("feature_cache_mb", 64) * 1024 * 1024))
+        # 特徴点がこの数を超える場合は総当たりではなくFLANN (LSH) で近傍探索する
+        self.flann_min_keypoints = stitching_config.get("alignment_quality", {}).get("flann_min_keypoints", 500)
+        self._hanning_windows: Dict[Tuple[int, int], np.ndarray] = {}
+        self._bf_matcher = None
+        self._flann_matcher = None
+        self._weight_masks: Dict[Tuple, np.ndarray] = {}
+        self.feather_blender = FeatherBlender(config)
+        self.multiband_blender = MultiBandBlender(config)
+
+        # 位置合わせのデバッグ用データ出力 (stitching.debug_artifacts.enabled で有効化)
+        self.debug_writer = AlignmentDebugWriter(config)
+
+        # タイルのシェーディング (周辺減光) 補正 (stitching.flat_field)
+        self.flat_field = FlatFieldCorrector(config)
+
+    def correct_flat_field(self, image: Any, magnification: str, dst: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        """
+        Correct vignetting of a captured tile before alignment and blending
+
+        Args:
+            image: Captured tile (Frame or ndarray)
+            magnification: Magnification of the tile ("x10" etc.), profiles are kept per magnification
+            dst: Output buffer (may be the input array itself); a new array is allocated when None
+
+        Returns:
+            Corrected uint8 image, or None when no profile is available for the magnification
+        """
+        return self.flat_field.apply(image, magnification, dst=dst)
+
+    def calibrate_flat_field(
+        self, magnification: str, flat_images: List[Any], dark_images: Optional[List[Any]] = None
+    ) -> bool:
+        """Create the flat-field profile from captures of an empty field (and optionally dark frames)"""
+        return self.flat_field.calibrate(magnification, flat_images, dark_images)
+
+    def estimate_flat_field(self, magnification: str, images: List[Any]) -> bool:
+        """Estimate the flat-field profile from the per-pixel median of the captured tiles"""
+        return self.flat_field.estimate_from_images(magnification, images)
+
+    def select_overlap_ratio(self, row_images: List[Any], stitching_type: str) -> float:
+        """
+        Choose the overlap ratio for the rest of a scan from the first row of tiles
+
+        The horizontal pairs of the first row (captured with stitching.overlap_ratio) are aligned
+        again on narrower strips that simulate each candidate overlap. The smallest candidate whose
+        shifts still agree with the full-overlap measurement is returned. When the full overlap itself
+        cannot be aligned reliably (feature-poor specimen), the maximum ratio is returned.
+
+        Args:
+            row_images: Tiles of the first row, left to right
+            stitching_type: Alignment method used for stitching ("phase_match", "feature_based")
+
+        Returns:
+            Overlap ratio (0.0-1.0) within stitching.adaptive_overlap.min_ratio/max_ratio
+        """
+        stitching_config = self.config.get("stitching", {})
+        adaptive_config = stitching_config.get("adaptive_overlap", {}) or {}
+        overlap_ratio = stitching_config.get("overlap_ratio", 0.1)
+        min_ratio = min(adaptive_config.get("min_ratio", 0.1), overlap_ratio)
+        max_ratio = max(adaptive_config.get("max_ratio", 0.3), overlap_ratio)
+        ratio_step = adaptive_config.get("ratio_step", 0.025)
+        min_agreement = adaptive_config.get("min_agreement", 0.75)
+        tolerance_px = adaptive_config.get("tolerance_px", 0.5)
+
+        if stitching_type == StitchingType.SIMPLE.value or len(row_images) < 2:
+            return overlap_ratio
+
+        images = [as_array(image) for image in row_images]
+        img_h, img_w = images[0].shape[:2]
+        full_overlap = int(img_w * overlap_ratio)
+
+        # 設定の重複率で測定したずれを基準とする
+        reference = [
+            self._find_alignment(images[idx - 1], images[idx], "left", full_overlap, stitching_type)
+            for idx in range(1, len(images))
+        ]
+        if np.mean([result is not None for result in reference]) < min_agreement:
+            logger.info(f"Alignment on the first row is unreliable, raising overlap ratio to {max_ratio:.3f}")
+            return max_ratio
+
+        # 小さい重複率から順に、右のタイルを切り詰めてその重複率で撮影した場合を再現し、同じずれが得られるか確認する
+        # 変更するのは行間隔なので、重複領域の幅は縦方向の重複画素数に合わせる
+        for ratio in np.arange(min_ratio, overlap_ratio - 1e-9, ratio_step):
+            overlap = int(img_h * ratio)
+            if overlap < 1 or overlap > full_overlap:
+                continue
+            agreed = 0
+            for idx, ref_result in enumerate(reference, start=1):
+                if ref_result is None:
+                    continue
+                result = self._find_alignment(
+                    images[idx - 1], images[idx][:, full_overlap - overlap :], "left", overlap, stitching_type
+                )
+                if result is not None and np.hypot(result[0] - ref_result[0], result[1] - ref_result[1]) <= tolerance_px:
+                    agreed += 1
+            if agreed / len(reference) >= min_agreement:
+                logger.info(f"Alignment agrees down to overlap ratio {ratio:.3f} on the first row")
+                return float(ratio)
+
+        return overlap_ratio
+
+    def measure_relative_position(
+        self, ref_img: Any, current_img: Any, direction: str, overlap: int, stitching_type: str
+    ) -> Optional[Tuple[float, float, float]]:
+        """
+        Measure where a tile lies relative to its left or top neighbour
+
+        Used while capturing (closed-loop stage correction); the edge spectra and features are
+        cached, so the measurement is reused when the same tiles are stitched afterwards.
+
+        Args:
+            ref_img: Left or top neighbour (Frame or ndarray)
+            current_img: Tile to measure
+            direction: "left" if ref_img is the left neighbour, "top" if it is the top neighbour
+            overlap: Overlap width in pixels along the direction
+            stitching_type: Alignment method ("phase_match", "feature_based")
+
+        Returns:
+            (dx, dy, confidence): offset of current_img from ref_img in pixels (image axes),
+            or None when the pair cannot be aligned reliably
+        """
+        if stitching_type == StitchingType.SIMPLE.value or overlap < 1:
+            return None
+        current = as_array(current_img)
+        result = self._find_alignment(as_array(ref_img), current, direction, overlap, stitching_type)
+        if result is None:
+            return None
+        shift_x, shift_y, confidence = result
+        img_h, img_w = current.shape[:2]
+        if direction == "left":
+            return (img_w - overlap - shift_x, -shift_y, confidence)
+        return (-shift_x, img_h - overlap - shift_y, confidence)
 
     def concatenate(
-        self, stitching_type: str, images: List[np.ndarray], grid_size_x: int, grid_size_y: int
+        self,
+        stitching_type: str,
+        images: List[np.ndarray],
+        grid_size_x: int,
+        grid_size_y: int,
+        overlap_ratio: Optional[Tuple[float, float]] = None,
+        grid_indices: Optional[List[Tuple[int, int]]] = None,
+        stage_offsets: Optional[List[Tuple[float, float]]] = None,
+        search_window_px: Optional[float] = None,
     ) -> Optional[np.ndarray]:
         """
         Concatenate images for stitching
@@ -31,6 +184,14 @@ class ImageProcessService:
             images: List of images to concatenate
             grid_size_x: Number of images in X direction
             grid_size_y: Number of images in Y direction
+            overlap_ratio: (x, y) overlap ratios the tiles were captured with; stitching.overlap_ratio when None
+            grid_indices: (column, row) of each image. When None, the images must cover the whole grid
+                in zigzag capture order. Cells without an image are left empty
+            stage_offsets: Expected (x, y) pixel position of each image from its stage position
+                (image axes, any origin), in the same order as images. Used as the alignment prior
+                instead of the nominal grid step when given ("simple" places the images at these positions)
+            search_window_px: With stage_offsets, only shifts within this distance of the predicted
+                shift are searched (phase correlation peak / feature matches)
 
         Returns:
             Concatenated image as numpy array
@@ -39,10 +200,24 @@ class ImageProcessService:
             if not images:
                 raise ValueError("No images to concatenate")
 
+            if overlap_ratio is None:
+                ratio = self.config.get("stitching", {}).get("overlap_ratio", 0.1)
+                overlap_ratio = (ratio, ratio)
+
+            # 格子の順 (左上から行ごと) に並べる。撮影しなかったセルはNone
+            if grid_indices is None:
+                grid_images = self._reorder_images_zigzag(images, grid_size_x, grid_size_y)
+                grid_offsets = self._reorder_images_zigzag(stage_offsets, grid_size_x, grid_size_y) if stage_offsets else None
+            else:
+                grid_images = self._arrange_images(images, grid_indices, grid_size_x, grid_size_y)
+                grid_offsets = self._arrange_images(stage_offsets, grid_indices, grid_size_x, grid_size_y) if stage_offsets else None
+
             if stitching_type == StitchingType.SIMPLE.value:
-                return self._concatenate_grid(images, grid_size_x, grid_size_y)
+                return self._concatenate_grid(grid_images, grid_size_x, grid_size_y, overlap_ratio, grid_offsets)
             elif stitching_type in [StitchingType.ADVANCED.value, StitchingType.FEATURE_BASED.value]:
-                return self._concatenate_grid2(images, grid_size_x, grid_size_y, stitching_type)
+                return self._concatenate_grid2(
+                    grid_images, grid_size_x, grid_size_y, stitching_type, overlap_ratio, grid_offsets, search_window_px
+                )
             else:
                 raise ValueError(f"Unsupported stitching type: {stitching_type}")
 
@@ -54,66 +229,69 @@ class ImageProcessService:
             event_bus.publish(error_event)
             return None
 
-    def _concatenate_grid(self, images: List[np.ndarray], grid_size_x: int, grid_size_y: int) -> np.ndarray:
-        """Simple grid concatenation with overlap from config"""
-        if len(images) != grid_size_x * grid_size_y:
-            raise ValueError(
-                f"Expected {grid_size_x * grid_size_y} images, got {len(images)}"
-            )
-
-        # Convert all images to numpy arrays
-        processed_images = []
-        for img in images:
-            if isinstance(img, np.ndarray):
-                processed_images.append(img)
-            else:
-                processed_images.append(np.array(img))
+    def _concatenate_grid(
+        self,
+        images: List[np.ndarray],
+        grid_size_x: int,
+        grid_size_y: int,
+        overlap_ratio: Tuple[float, float],
+        stage_offsets: Optional[List[Optional[Tuple[float, float]]]] = None,
+    ) -> np.ndarray:
+        """
+        Simple grid concatenation of images in grid order with the (x, y) overlap ratios they were captured with
+        With stage_offsets (grid order), each image is placed at its stage position instead of the grid step
+        """
+        # Convert all images to numpy arrays (shared frames are used as read-only views without copying)
+        processed_images = [as_array(img) if img is not None else None for img in images]
+        first_image = next(img for img in processed_images if img is not None)
 
         # Get dimensions from first image
-        if len(processed_images[0].shape) == 3:
-            img_height, img_width, channels = processed_images[0].shape
+        if len(first_image.shape) == 3:
+            img_height, img_width, channels = first_image.shape
         else:
-            img_height, img_width = processed_images[0].shape
+            img_height, img_width = first_image.shape
             channels = 1
 
-        # Get overlap ratio from config
-        overlap_ratio = self.config.get("stitching", {}).get("overlap_ratio", 0.1)
-
         # Calculate overlap in pixels
-        overlap_x = int(img_width * overlap_ratio)
-        overlap_y = int(img_height * overlap_ratio)
+        overlap_x = int(img_width * overlap_ratio[0])
+        overlap_y = int(img_height * overlap_ratio[1])
 
         # Calculate step size (image size minus overlap)
         step_x = img_width - overlap_x
         step_y = img_height - overlap_y
 
+        # 格子状に並べた位置 (ステージの位置があれば、最初の画像を格子の位置に合わせてその位置関係で並べる)
+        placements = [((idx % grid_size_x) * step_x, (idx // grid_size_x) * step_y) for idx in range(len(processed_images))]
+        if stage_offsets is not None:
+            first = next(idx for idx, img in enumerate(processed_images) if img is not None)
+            origin = np.asarray(stage_offsets[first], dtype=np.float64) - np.asarray(placements[first], dtype=np.float64)
+            placements = [
+                tuple(int(round(value)) for value in np.asarray(stage_offsets[idx], dtype=np.float64) - origin)
+                if processed_images[idx] is not None and stage_offsets[idx] is not None else placements[idx]
+                for idx in range(len(processed_images))
+            ]
+            min_x = min(position[0] for position in placements)
+            min_y = min(position[1] for position in placements)
+            placements = [(position[0] - min_x, position[1] - min_y) for position in placements]
+
         # Create output image with overlap accounted for
-        output_height = step_y * (grid_size_y - 1) + img_height
-        output_width = step_x * (grid_size_x - 1) + img_width
+        output_height = max(position[1] for position in placements) + img_height
+        output_width = max(position[0] for position in placements) + img_width
 
         if channels == 1:
-            stitched_image = np.zeros((output_height, output_width), dtype=processed_images[0].dtype)
+            stitched_image = np.zeros((output_height, output_width), dtype=first_image.dtype)
         else:
-            stitched_image = np.zeros((output_height, output_width, channels), dtype=processed_images[0].dtype)
+            stitched_image = np.zeros((output_height, output_width, channels), dtype=first_image.dtype)
 
         # Arrange images in grid pattern with overlap
         for y in range(grid_size_y):
             for x in range(grid_size_x):
-                start_y = y * step_y
+                start_x, start_y = placements[y * grid_size_x + x]
                 end_y = start_y + img_height
-                start_x = x * step_x
                 end_x = start_x + img_width
 
-                # Handle zigzag pattern
-                if y % 2 == 0:  # Even rows: left to right
-                    grid_x = x
-                else:  # Odd rows: right to left
-                    grid_x = grid_size_x - 1 - x
-
-                img_idx = y * grid_size_x + grid_x
-
-                if img_idx < len(processed_images):
-                    current_img = processed_images[img_idx]
+                current_img = processed_images[y * grid_size_x + x]
+                if current_img is not None:
                     if current_img.shape[:2] == (img_height, img_width):
                         stitched_image[start_y:end_y, start_x:end_x] = current_img
                     else:
@@ -123,39 +301,34 @@ class ImageProcessService:
         return stitched_image
 
     def _concatenate_grid2(
-        self, images: List[np.ndarray], grid_size_x: int, grid_size_y: int, stitching_type: str
+        self,
+        images: List[np.ndarray],
+        grid_size_x: int,
+        grid_size_y: int,
+        stitching_type: str,
+        overlap_ratio: Tuple[float, float],
+        stage_offsets: Optional[List[Optional[Tuple[float, float]]]] = None,
+        search_window_px: Optional[float] = None,
     ) -> np.ndarray:
-        """Grid concatenation with alignment and blending"""
-        if len(images) != grid_size_x * grid_size_y:
-            raise ValueError(
-                f"Expected {
-                    grid_size_x * grid_size_y} images, got {len(images)}"
-            )
-
-        images = self._reorder_images_zigzag(images, grid_size_x, grid_size_y)
-        # Convert all images to numpy arrays
-        processed_images = []
-        for img in images:
-            if isinstance(img, np.ndarray):
-                processed_images.append(img)
-            else:
-                processed_images.append(np.array(img))
+        """Grid concatenation of images in grid order (None for empty cells) with alignment and blending"""
+        # Convert all images to numpy arrays (shared frames are used as read-only views without copying)
+        processed_images = [as_array(img) if img is not None else None for img in images]
+        first_image = next(img for img in processed_images if img is not None)
 
         # Get dimensions
-        if len(processed_images[0].shape) == 3:
-            img_height, img_width, channels = processed_images[0].shape
+        if len(first_image.shape) == 3:
+            img_height, img_width, channels = first_image.shape
         else:
-            img_height, img_width = processed_images[0].shape
+            img_height, img_width = first_image.shape
             channels = 1
             # Convert grayscale to 3-channel for processing
             processed_images = [
-                cv2.cvtColor(img, cv2.COLOR_GRAY2BGR) if len(img.shape) == 2 else img for img in processed_images
+                cv2.cvtColor(img, cv2.COLOR_GRAY2BGR) if img is not None and len(img.shape) == 2 else img
+                for img in processed_images
             ]
 
-        # Get overlap ratio from config
-        overlap_ratio = self.config.get("stitching", {}).get("overlap_ratio", 0.1)
-        overlap_x = int(img_width * overlap_ratio)
-        overlap_y = int(img_height * overlap_ratio)
+        overlap_x = int(img_width * overlap_ratio[0])
+        overlap_y = int(img_height * overlap_ratio[1])
 
         # Build grid with alignment
         aligned_positions, alignment_success = self._align_grid(
@@ -167,11 +340,18 @@ class ImageProcessService:
             img_width,
             img_height,
             stitching_type,
+            stage_offsets,
+            search_window_px,
         )
 
         # Create canvas and blend images (only blend where alignment succeeded)
+        present = [idx for idx, img in enumerate(processed_images) if img is not None]
         stitched_image = self._blend_images(
-            processed_images, aligned_positions, alignment_success, img_width, img_height
+            [processed_images[idx] for idx in present],
+            [aligned_positions[idx] for idx in present],
+            [alignment_success[idx] for idx in present],
+            img_width,
+            img_height,
         )
 
         # Convert back to grayscale if original was grayscale
@@ -190,17 +370,23 @@ class ImageProcessService:
         img_w: int,
         img_h: int,
         stitching_type: str,
+        stage_offsets: Optional[List[Optional[Tuple[float, float]]]] = None,
+        search_window_px: Optional[float] = None,
     ) -> Tuple[List[Tuple[int, int]], List[bool]]:
         """
         Align images using alignment algorithms on overlap regions
 
+        Shifts are measured on every left/top neighbour pair and the tile positions are
+        solved globally (see GridPositionSolver), so a single bad pair is rejected as an
+        outlier instead of shifting all following tiles.
+
         The images are arranged in the following order:
         123
         456
         789
 
         Args:
-            images: List of images in grid order
+            images: List of images in grid order (None for cells that were not captured)
             grid_x: Number of images in x direction
             grid_y: Number of images in y direction
             overlap_x: Horizontal overlap in pixels
@@ -208,105 +394,124 @@ class ImageProcessService:
             img_w: Image width
             img_h: Image height
             stitching_type: Type of alignment algorithm to use
+            stage_offsets: Expected pixel position of each image from the stage (grid order, None for empty cells)
+            search_window_px: Search only this far from the shift predicted by stage_offsets
 
         Returns:
             Tuple of (positions, alignment_success) where:
             - positions: List of (x, y) positions for each image
             - alignment_success: List of booleans indicating if alignment was calculated
         """
-        # Pre-allocate positions array to match image indices
         num_images = grid_x * grid_y
-        positions = [None] * num_images
-        alignment_success = [False] * num_images
+        step_x = img_w - overlap_x
+        step_y = img_h - overlap_y
 
-        # Start with first image at origin (first image is always "successful")
-        positions[0] = (0, 0)
-        alignment_success[0] = True
+        # 格子状に並べた場合の予測位置 (測定できなかったタイルはこの位置関係に従う)
+        nominal_positions = np.array(
+            [((idx % grid_x) * step_x, (idx // grid_x) * step_y) for idx in range(num_images)], dtype=np.float64
+        )
 
-        for y in range(grid_y):
-            for x in range(grid_x):
-                if y == 0 and x == 0:
-                    continue  # Skip first image already placed
+        # ステージの位置があれば、格子の代わりにその位置関係を予測位置とし、探索範囲を予測したずれの周りに絞る
+        present = [image is not None for image in images]
+        if stage_offsets is not None:
+            first = present.index(True)
+            origin = np.asarray(stage_offsets[first], dtype=np.float64) - nominal_positions[first]
+            for idx in range(num_images):
+                if present[idx] and stage_offsets[idx] is not None:
+                    nominal_positions[idx] = np.asarray(stage_offsets[idx], dtype=np.float64) - origin
+        else:
+            search_window_px = None
+
+        # 左・上の隣接ペアすべてでずれを測定し、グラフの辺として集める
+        neighbour_pairs = grid_neighbour_pairs(grid_x, grid_y, present)
+        measurements = []
+        self.debug_writer.start_session(stitching_type, grid_x, grid_y, overlap_x, overlap_y)
+        for ref_idx, current_idx, direction in neighbour_pairs:
+            overlap = overlap_x if direction == "left" else overlap_y
+            expected_shift = None
+            if search_window_px is not None:
+                # 測定するずれとの関係は下の delta の逆 (左: delta = (step_x - shift_x, -shift_y))
+                predicted = nominal_positions[current_idx] - nominal_positions[ref_idx]
+                if direction == "left":
+                    expected_shift = (step_x - predicted[0], -predicted[1])
+                else:
+                    expected_shift = (-predicted[0], step_y - predicted[1])
+            result = self._find_alignment(
+                images[ref_idx], images[current_idx], direction, overlap, stitching_type, expected_shift, search_window_px
+            )
+            if self.debug_writer.enabled:
+                ref_edge, current_edge = ("right", "left") if direction == "left" else ("bottom", "top")
+                self.debug_writer.record_pair(
+                    ref_idx,
+                    current_idx,
+                    direction,
+                    self._edge_strip(images[ref_idx], ref_edge, overlap),
+                    self._edge_strip(images[current_idx], current_edge, overlap),
+                    result,
+                )
+            if result is None:
+                continue
 
-                current_idx = y * grid_x + x
-                current_img = images[current_idx]
+            shift_x, shift_y, confidence = result
+            if direction == "left":
+                delta = (step_x - shift_x, -shift_y)
+            else:
+                delta = (-shift_x, step_y - shift_y)
+            measurements.append((ref_idx, current_idx, delta[0], delta[1], confidence))
 
-                # 位置の事前予想
-                if x != 0:
-                    # 左側に画像があれば、左側の画像位置を基準にする
-                    new_x = positions[current_idx - 1][0] + img_w - overlap_x
-                    new_y = positions[current_idx - 1][1]
-                else:
-                    # 左側に画像がなければ、上側の画像位置を基準にする
-                    new_x = positions[current_idx - grid_x][0]
-                    new_y = positions[current_idx - grid_x][1] + img_h - overlap_y
-
-                pos_left = None
-                pos_top = None
-
-                if x > 0:  # Left neighbor exists
-                    ref_idx = current_idx - 1
-                    ref_img = images[ref_idx]
-
-                    ref_region = ref_img[:, -overlap_x:]
-                    curr_region = current_img[:, :overlap_x]
-                    shift = self._find_alignment(ref_region, curr_region, stitching_type)
-
-                    if shift is not None:
-                        new_x = positions[ref_idx][0] + img_w - overlap_x - shift[0]
-                        new_y = positions[ref_idx][1] - shift[1]
-                        pos_left = (int(new_x), int(new_y))
-
-                if y > 0:  # Top neighbor exists
-                    ref_idx = current_idx - grid_x
-                    ref_img = images[ref_idx]
-
-                    ref_region = ref_img[-overlap_y:, :]
-                    curr_region = current_img[:overlap_y, :]
-                    shift = self._find_alignment(ref_region, curr_region, stitching_type)
-                    if shift is not None:
-                        new_x = positions[ref_idx][0] - shift[0]
-                        new_y = positions[ref_idx][1] + img_h - overlap_y - shift[1]
-                        pos_top = (int(new_x), int(new_y))
-                # 水平方向の移動は上画像との合わせ込み優先
-                # 垂直方向の移動は左画像との合わせ込み優先
-                # 片方が失敗した場合はもう片方の情報を使う
-                is_left_aligned = pos_left is not None
-                is_top_aligned = pos_top is not None
-                if is_left_aligned and is_top_aligned:
-                    new_x = pos_top[0]
-                    new_y = pos_left[1]
-                    alignment_success[current_idx] = True
-                elif is_left_aligned and not is_top_aligned:
-                    new_x = pos_left[0]
-                    new_y = pos_left[1]
-                    alignment_success[current_idx] = True
-                elif not is_left_aligned and is_top_aligned:
-                    new_x = pos_top[0]
-                    new_y = pos_top[1]
-                    alignment_success[current_idx] = True
-                else:
-                    logger.info(
-                        f"Using default grid position for image {current_idx}. " f"Manual inspection recommended."
-                    )
-                    alignment_success[current_idx] = False
+        # 全体の重み付き最小二乗で位置を決める (左・上からの逐次配置では誤差が下流に蓄積するため)
+        solved, inliers = self.position_solver.solve(
+            nominal_positions, measurements, [(ref_idx, idx) for ref_idx, idx, _ in neighbour_pairs]
+        )
+        origin = solved[0]
+        positions = [(int(round(x - origin[0])), int(round(y - origin[1]))) for x, y in solved]
 
-                positions[current_idx] = (int(new_x), int(new_y))
+        # 外れ値として除外されなかった測定値を1つ以上持つタイルを位置合わせ成功とする
+        alignment_success = [False] * num_images
+        alignment_success[present.index(True)] = True
+        for (ref_idx, current_idx, _, _, _), is_inlier in zip(measurements, inliers):
+            if is_inlier:
+                alignment_success[ref_idx] = True
+                alignment_success[current_idx] = True
+
+        for idx, success in enumerate(alignment_success):
+            if not success and present[idx]:
+                logger.info(f"Using default grid position for image {idx}. " f"Manual inspection recommended.")
+
+        self.debug_writer.end_session(positions, alignment_success, inliers.tolist())
 
         return positions, alignment_success
 
-    def _find_alignment(self, img1: np.ndarray, img2: np.ndarray, stitching_type: str) -> Optional[Tuple[int, int]]:
+    def _find_alignment(
+        self,
+        ref_img: np.ndarray,
+        current_img: np.ndarray,
+        direction: str,
+        overlap: int,
+        stitching_type: str,
+        expected_shift: Optional[Tuple[float, float]] = None,
+        search_window: Optional[float] = None,
+    ) -> Optional[Tuple[float, float, float]]:
         """
-        Find alignment between two overlapping regions with quality guarantees
+        Find alignment between the overlapping edges of two neighbouring tiles with quality guarantees
 
         Args:
-            img1: First image region
-            img2: Second image region
+            ref_img: Reference tile (left or top neighbour)
+            current_img: Tile to align
+            direction: "left" if ref_img is the left neighbour, "top" if it is the top neighbour
+            overlap: Overlap width in pixels along the direction
             stitching_type: Type of stitching method to use
+            expected_shift: Shift predicted from the stage positions (same convention as the result)
+            search_window: With expected_shift, only shifts within this distance (pixels) are accepted;
+                the phase correlation peak and feature matches are searched inside the window only
 
         Returns:
-            Tuple of (shift_x, shift_y) or None if alignment quality is poor
+            Tuple of (shift_x, shift_y, confidence) or None if alignment quality is poor.
+            The confidence is the phase correlation response or the number of matches
+            that agree with the median shift, and is used as the weight in the global solver.
         """
+        ref_edge, current_edge = ("right", "left") if direction == "left" else ("bottom", "top")
+
         # Get quality thresholds from config
         quality_config = self.config.get("stitching", {}).get("alignment_quality", {})
         MIN_MATCHES = quality_config.get("min_matches", 10)
@@ -314,82 +519,274 @@ class ImageProcessService:
         MAX_MATCH_DISTANCE = quality_config.get("max_match_distance", 150)
         LOWE_RATIO = quality_config.get("lowe_ratio", 0.75)
         MIN_CONFIDENCE = quality_config.get("min_confidence", 0.1)
-
-        # Convert to grayscale if needed
-        if len(img1.shape) == 3:
-            gray1 = cv2.cvtColor(img1, cv2.COLOR_BGR2GRAY)
-            gray2 = cv2.cvtColor(img2, cv2.COLOR_BGR2GRAY)
-        else:
-            gray1, gray2 = img1, img2
-
-        _, binary1 = cv2.threshold(gray1, 0, 255, cv2.THRESH_OTSU)
-        _, binary2 = cv2.threshold(gray2, 0, 255, cv2.THRESH_OTSU)
-
-        cv2.imwrite("output/debug_binary1.png", binary1)
-        cv2.imwrite("output/debug_binary2.png", binary2)
+        INLIER_DISTANCE = quality_config.get("inlier_distance", 3.0)
 
         if stitching_type == StitchingType.ADVANCED.value:
             # Use phase correlation for phase_match stitching
-            shift, response = cv2.phaseCorrelate(
-                np.float32(binary1),
-                np.float32(binary2),
+            # 各タイルの辺のスペクトルはキャッシュされ、隣接ペアごとに掛け合わせて逆変換するだけで済む
+            shift, response = self._correlate_spectra(
+                self._edge_spectrum(ref_img, ref_edge, overlap),
+                self._edge_spectrum(current_img, current_edge, overlap),
+                expected_shift if search_window is not None else None,
+                search_window,
             )
             if response < MIN_CONFIDENCE:  # Threshold for confidence
                 return None
+            confidence = response
 
         elif stitching_type == StitchingType.FEATURE_BASED.value:
-            # Detect features
-            kp1, des1 = self.orb.detectAndCompute(binary1, None)
-            kp2, des2 = self.orb.detectAndCompute(binary2, None)
+            # 特徴点は辺ごとに一度だけ検出してキャッシュする
+            pts1, des1 = self._edge_features(ref_img, ref_edge, overlap)
+            pts2, des2 = self._edge_features(current_img, current_edge, overlap)
 
             # Check if we have enough keypoints
-            if des1 is None or des2 is None or len(kp1) < MIN_MATCHES or len(kp2) < MIN_MATCHES:
+            if des1 is None or des2 is None or len(pts1) < MIN_MATCHES or len(pts2) < MIN_MATCHES:
                 logger.warning(
                     f"Not enough features detected (kp1={
-                        len(kp1) if des1 is not None else 0}, "
+                        len(pts1) if des1 is not None else 0}, "
                     f"kp2={
-                        len(kp2) if des2 is not None else 0}). Cannot align."
+                        len(pts2) if des2 is not None else 0}). Cannot align."
                 )
                 return None
 
-            # Match features using BFMatcher
-            bf = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=False)
-            matches = bf.knnMatch(des1, des2, k=2)
-
-            # Apply Lowe's ratio test to filter good matches
-            good_matches = []
-            for match_pair in matches:
-                if len(match_pair) == 2:
-                    m, n = match_pair
-                    if m.distance < LOWE_RATIO * n.distance and m.distance < MAX_MATCH_DISTANCE:
-                        good_matches.append(m)
+            if expected_shift is not None and search_window is not None:
+                indices = self._match_in_window(pts1, des1, pts2, des2, expected_shift, search_window, LOWE_RATIO, MAX_MATCH_DISTANCE)
+            else:
+                # Match features (brute force for small sets, LSH index for large ones)
+                matches = self._get_matcher(min(len(des1), len(des2))).knnMatch(des1, des2, k=2)
+
+                # Apply Lowe's ratio test to filter good matches
+                pairs = [match_pair for match_pair in matches if len(match_pair) == 2]
+                if pairs:
+                    distances = np.array([(m.distance, n.distance) for m, n in pairs], dtype=np.float32)
+                    indices = np.array([(m.queryIdx, m.trainIdx) for m, _ in pairs], dtype=np.intp)
+                    good = (distances[:, 0] < LOWE_RATIO * distances[:, 1]) & (distances[:, 0] < MAX_MATCH_DISTANCE)
+                    indices = indices[good]
+                else:
+                    indices = np.empty((0, 2), dtype=np.intp)
 
             # Check if we have enough good matches
-            if len(good_matches) < MIN_GOOD_MATCHES:
+            if len(indices) < MIN_GOOD_MATCHES:
                 logger.warning(
                     f"Not enough good matches ({
-                        len(good_matches)}). Cannot align reliably."
+                        len(indices)}). Cannot align reliably."
                 )
                 return None
 
             # Calculate shifts from matched keypoints
-            shifts = []
-            for match in good_matches:
-                pt1 = kp1[match.queryIdx].pt
-                pt2 = kp2[match.trainIdx].pt
-                shifts.append((pt2[0] - pt1[0], pt2[1] - pt1[1]))
-
-            shifts = np.array(shifts)
+            shifts = pts2[indices[:, 1]] - pts1[indices[:, 0]]
 
             # Calculate median shift (robust to outliers)
             shift = np.median(shifts, axis=0)
+            # 中央値の近くに集まるマッチ数を信頼度とする
+            confidence = float(np.count_nonzero(np.linalg.norm(shifts - shift, axis=1) <= INLIER_DISTANCE))
 
-        # validation check
-        shift_squared = shift[0] ** 2 + shift[1] ** 2
-        if shift_squared > MAX_MATCH_DISTANCE**2:
+        # validation check (with a stage prior the shift must stay inside the search window instead)
+        if expected_shift is not None and search_window is not None:
+            if np.hypot(shift[0] - expected_shift[0], shift[1] - expected_shift[1]) > search_window + 1.0:
+                return None
+        elif shift[0] ** 2 + shift[1] ** 2 > MAX_MATCH_DISTANCE**2:
             return None
 
-        return (int(round(shift[0])), int(round(shift[1])))
+        return (float(shift[0]), float(shift[1]), float(confidence))
+
+    @staticmethod
+    def _edge_strip(image: np.ndarray, edge: str, overlap: int) -> np.ndarray:
+        """Overlap strip along one edge of a tile"""
+        if edge == "left":
+            return image[:, :overlap]
+        if edge == "right":
+            return image[:, -overlap:]
+        if edge == "top":
+            return image[:overlap, :]
+        return image[-overlap:, :]
+
+    @staticmethod
+    def _binarize(region: np.ndarray) -> np.ndarray:
+        """Otsu binarization used as preprocessing for alignment"""
+        gray = cv2.cvtColor(region, cv2.COLOR_BGR2GRAY) if len(region.shape) == 3 else region
+        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_OTSU)
+        return binary
+
+    def _edge_spectrum(self, image: np.ndarray, edge: str, overlap: int) -> np.ndarray:
+        """
+        Fourier spectrum of the binarized, windowed and zero-padded overlap strip of one tile edge
+
+        The spectrum is cached per tile, so each edge is transformed once even though it is
+        correlated with a different neighbour, and re-stitching the same tiles skips the FFTs.
+        """
+        key = (edge, overlap, self.phase_window)
+        spectrum = self.spectrum_cache.get(image, key)
+        if spectrum is not None:
+            return spectrum
+
+        binary = self._binarize(self._edge_strip(image, edge, overlap))
+        height, width = binary.shape
+        src = np.float32(binary)
+        if self.phase_window:
+            src *= self._hanning_window(height, width)
+        padded = cv2.copyMakeBorder(
+            src,
+            0,
+            cv2.getOptimalDFTSize(height) - height,
+            0,
+            cv2.getOptimalDFTSize(width) - width,
+            cv2.BORDER_CONSTANT,
+            value=0,
+        )
+        # Packed (CCS) real spectrum: several times faster than complex output and half the memory
+        spectrum = cv2.dft(padded)
+        self.spectrum_cache.put(image, key, spectrum)
+        return spectrum
+
+    def _edge_features(self, image: np.ndarray, edge: str, overlap: int) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        ORB keypoint positions (N x 2, strip coordinates) and descriptors of one tile edge
+
+        Cached per tile like the spectra, so keypoints on an edge are detected once.
+        """
+        key = (edge, overlap)
+        features = self.feature_cache.get(image, key)
+        if features is not None:
+            return features
+
+        keypoints, descriptors = self.orb.detectAndCompute(self._binarize(self._edge_strip(image, edge, overlap)), None)
+        points = cv2.KeyPoint_convert(keypoints) if keypoints else np.empty((0, 2), dtype=np.float32)
+        features = (points.reshape(-1, 2), descriptors)
+        nbytes = points.nbytes + (descriptors.nbytes if descriptors is not None else 0)
+        self.feature_cache.put(image, key, features, nbytes=nbytes)
+        return features
+
+    def _match_in_window(
+        self,
+        pts1: np.ndarray,
+        des1: np.ndarray,
+        pts2: np.ndarray,
+        des2: np.ndarray,
+        expected_shift: Tuple[float, float],
+        search_window: float,
+        lowe_ratio: float,
+        max_distance: float,
+    ) -> np.ndarray:
+        """
+        Match descriptors only between keypoints whose shift is within search_window of the expected shift
+
+        The ratio test is applied among the candidates inside the window, so repeated structures
+        outside the window no longer make a correct match ambiguous. A keypoint with a single
+        candidate in the window is kept when its descriptor distance is below max_distance.
+
+        Returns:
+            (N, 2) array of (index in pts1, index in pts2)
+        """
+        offsets = pts2[np.newaxis, :, :] - pts1[:, np.newaxis, :] - np.asarray(expected_shift, dtype=np.float32)
+        mask = (np.einsum("ijk,ijk->ij", offsets, offsets) <= search_window**2).astype(np.uint8)
+        if not mask.any():
+            return np.empty((0, 2), dtype=np.intp)
+
+        if self._bf_matcher is None:
+            self._bf_matcher = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=False)
+        indices = []
+        for candidates in self._bf_matcher.knnMatch(des1, des2, k=2, mask=mask):
+            if not candidates:
+                continue
+            best = candidates[0]
+            if best.distance >= max_distance:
+                continue
+            if len(candidates) == 2 and best.distance >= lowe_ratio * candidates[1].distance:
+                continue
+            indices.append((best.queryIdx, best.trainIdx))
+        return np.array(indices, dtype=np.intp).reshape(-1, 2)
+
+    def _get_matcher(self, num_keypoints: int):
+        """Descriptor matcher for binary ORB descriptors"""
+        if num_keypoints < self.flann_min_keypoints:
+            if self._bf_matcher is None:
+                self._bf_matcher = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=False)
+            return self._bf_matcher
+        if self._flann_matcher is None:
+            index_params = dict(algorithm=6, table_number=6, key_size=12, multi_probe_level=1)  # FLANN_INDEX_LSH
+            self._flann_matcher = cv2.FlannBasedMatcher(index_params, dict(checks=50))
+        return self._flann_matcher
+
+    def _hanning_window(self, height: int, width: int) -> np.ndarray:
+        window = self._hanning_windows.get((height, width))
+        if window is None:
+            window = cv2.createHanningWindow((width, height), cv2.CV_32F)
+            self._hanning_windows[(height, width)] = window
+        return window
+
+    @staticmethod
+    def _normalize_ccs_spectrum(spectrum: np.ndarray):
+        """Divide each complex element of a packed (CCS) spectrum by its magnitude, in place"""
+        rows, cols = spectrum.shape
+        eps = np.finfo(np.float32).eps
+
+        def normalize_pairs(real: np.ndarray, imag: np.ndarray):
+            magnitude = np.sqrt(real * real + imag * imag)
+            magnitude += eps
+            real /= magnitude
+            imag /= magnitude
+
+        # Columns 1.. hold (Re, Im) pairs along each row
+        num_pairs = (cols - 1) // 2
+        normalize_pairs(spectrum[:, 1 : 1 + 2 * num_pairs : 2], spectrum[:, 2 : 2 + 2 * num_pairs : 2])
+
+        # The first column (and the last one for even widths) hold a real spectrum packed along the rows
+        num_pairs = (rows - 1) // 2
+        for col in [0] + ([cols - 1] if cols % 2 == 0 else []):
+            normalize_pairs(spectrum[1 : 1 + 2 * num_pairs : 2, col], spectrum[2 : 2 + 2 * num_pairs : 2, col])
+            for row in [0] + ([rows - 1] if rows % 2 == 0 else []):
+                spectrum[row, col] = np.sign(spectrum[row, col])
+
+    @classmethod
+    def _correlate_spectra(
+        cls,
+        spectrum1: np.ndarray,
+        spectrum2: np.ndarray,
+        expected_shift: Optional[Tuple[float, float]] = None,
+        search_window: Optional[float] = None,
+    ) -> Tuple[Tuple[float, float], float]:
+        """
+        Phase correlation of two precomputed CCS spectra (same result as cv2.phaseCorrelate)
+
+        With expected_shift and search_window, the peak is searched only within the window
+        around the expected shift (stronger peaks of repetitive textures elsewhere are ignored).
+
+        Returns:
+            Tuple of ((shift_x, shift_y), response)
+        """
+        cross_power = cv2.mulSpectrums(spectrum1, spectrum2, 0, conjB=True)
+        cls._normalize_ccs_spectrum(cross_power)
+        correlation = np.fft.fftshift(cv2.idft(cross_power, flags=cv2.DFT_REAL_OUTPUT))
+        rows, cols = correlation.shape
+
+        if expected_shift is not None and search_window is not None:
+            # shift = 中心 - ピーク位置 なので、予測したずれに対応する位置の周りだけを探す
+            center_x, center_y = cols / 2.0 - expected_shift[0], rows / 2.0 - expected_shift[1]
+            x0, x1 = max(int(np.floor(center_x - search_window)), 0), min(int(np.ceil(center_x + search_window)) + 1, cols)
+            y0, y1 = max(int(np.floor(center_y - search_window)), 0), min(int(np.ceil(center_y + search_window)) + 1, rows)
+            if x0 >= x1 or y0 >= y1:
+                return (0.0, 0.0), 0.0
+            _, _, _, (peak_x, peak_y) = cv2.minMaxLoc(correlation[y0:y1, x0:x1])
+            # 窓の端で最大になる場合は本当のピークが窓の外にあるため、測定しない
+            if (peak_x == 0 and x0 > 0) or (peak_x == x1 - x0 - 1 and x1 < cols) or \
+                    (peak_y == 0 and y0 > 0) or (peak_y == y1 - y0 - 1 and y1 < rows):
+                return (0.0, 0.0), 0.0
+            peak_x, peak_y = peak_x + x0, peak_y + y0
+        else:
+            _, _, _, (peak_x, peak_y) = cv2.minMaxLoc(correlation)
+
+        # Sub-pixel peak by the weighted centroid of a 5x5 window around the maximum
+        y_start, y_end = max(peak_y - 2, 0), min(peak_y + 3, rows)
+        x_start, x_end = max(peak_x - 2, 0), min(peak_x + 3, cols)
+        window = correlation[y_start:y_end, x_start:x_end]
+        total = float(window.sum())
+        if total <= 0:
+            return (0.0, 0.0), 0.0
+        centroid_x = float(window.sum(axis=0) @ np.arange(x_start, x_end)) / total
+        centroid_y = float(window.sum(axis=1) @ np.arange(y_start, y_end)) / total
+
+        return (cols / 2.0 - centroid_x, rows / 2.0 - centroid_y), total / (rows * cols)
 
     def _blend_images(
         self,
@@ -412,85 +809,66 @@ class ImageProcessService:
         # Adjust positions to canvas
         adjusted_positions = [(x - min_x, y - min_y) for x, y in positions]
 
-        # Create output and weight accumulator
-        output = np.zeros((canvas_h, canvas_w, 3), dtype=np.float32)
-        weights = np.zeros((canvas_h, canvas_w), dtype=np.float32)
-
-        # Create feathering weight mask for aligned images
-        feathered_mask = self._create_weight_mask(img_h, img_w)
-
-        # First pass: blend only aligned images
-        for idx, (x, y) in enumerate(adjusted_positions):
-            if not alignment_success[idx]:
-                continue  # Skip non-aligned images in first pass
-
-            img = images[idx].astype(np.float32)
-
-            # Ensure we don't go out of bounds
-            y_end = min(y + img_h, canvas_h)
-            x_end = min(x + img_w, canvas_w)
-            y_start = max(0, y)
-            x_start = max(0, x)
-
-            # Crop weight mask if at edges
-            mask_y_start = y_start - y
-            mask_x_start = x_start - x
-            mask_y_end = mask_y_start + (y_end - y_start)
-            mask_x_end = mask_x_start + (x_end - x_start)
-
-            current_mask = feathered_mask[mask_y_start:mask_y_end, mask_x_start:mask_x_end]
-            current_img = img[mask_y_start:mask_y_end, mask_x_start:mask_x_end]
-
-            # Accumulate weighted image
-            output[y_start:y_end, x_start:x_end] += current_img * current_mask[:, :, np.newaxis]
-            weights[y_start:y_end, x_start:x_end] += current_mask
-
-        # Normalize by weights for blended regions
-        blend_mask = weights > 0
-        output[blend_mask] = output[blend_mask] / weights[blend_mask, np.newaxis]
-
-        # Second pass: directly place non-aligned images (no blending)
-        for idx, (x, y) in enumerate(adjusted_positions):
-            if alignment_success[idx]:
-                continue  # Skip aligned images in second pass
-
-            img = images[idx].astype(np.float32)
-
-            # Ensure we don't go out of bounds
-            y_end = min(y + img_h, canvas_h)
-            x_end = min(x + img_w, canvas_w)
-            y_start = max(0, y)
-            x_start = max(0, x)
-
-            # Crop image if at edges
-            img_y_start = y_start - y
-            img_x_start = x_start - x
-            img_y_end = img_y_start + (y_end - y_start)
-            img_x_end = img_x_start + (x_end - x_start)
-
-            current_img = img[img_y_start:img_y_end, img_x_start:img_x_end]
+        # 重なりのない部分はuint8のままコピーし、重複領域だけを浮動小数点でブレンドする
+        if self.config.get("stitching", {}).get("blend_method", "linear") == "multiband":
+            blender = self.multiband_blender
+        else:
+            blender = self.feather_blender
+        return blender.blend(
+            images,
+            adjusted_positions,
+            alignment_success,
+            canvas_w,
+            canvas_h,
+            self._create_weight_mask(img_h, img_w),
+        )
 
-            # Directly place image without blending
-            output[y_start:y_end, x_start:x_end] = current_img
+    def _create_weight_mask(
+        self, height: int, width: int, feather_pixels: int = None, kind: str = None, dtype=np.float32
+    ) -> np.ndarray:
+        """
+        Create a weight mask with feathering at edges
 
-        return output.astype(np.uint8)
+        The mask is built from 1-D edge ramps and memoized by (height, width, feather_pixels, dtype, kind).
+        The returned array is shared and read-only.
 
-    def _create_weight_mask(self, height: int, width: int, feather_pixels: int = None) -> np.ndarray:
-        """Create a weight mask with feathering at edges"""
+        Args:
+            kind: "linear" uses the minimum of the vertical and horizontal ramps (weight 1 in the interior),
+                  "feather" uses their product for smoother corners.
+                  Defaults to "feather" when blend_method is "feather", otherwise "linear"
+                  (multiband uses the linear mask as its per-tile weight)
+        """
+        stitching_config = self.config.get("stitching", {})
         if feather_pixels is None:
-            feather_pixels = self.config.get("stitching", {}).get("feather_pixels", 50)
-
-        mask = np.ones((height, width), dtype=np.float32)
-
-        # Apply feathering to all edges
-        for i in range(feather_pixels):
-            weight = i / feather_pixels
-            mask[i, :] = np.minimum(mask[i, :], weight)  # Top
-            # Bottom
-            mask[height - 1 - i, :] = np.minimum(mask[height - 1 - i, :], weight)
-            mask[:, i] = np.minimum(mask[:, i], weight)  # Left
-            mask[:, width - 1 - i] = np.minimum(mask[:, width - 1 - i], weight)  # Right
+            feather_pixels = stitching_config.get("feather_pixels", 50)
+        if kind is None:
+            kind = "feather" if stitching_config.get("blend_method", "linear") == "feather" else "linear"
+        dtype = np.dtype(dtype)
+
+        key = (height, width, feather_pixels, dtype.str, kind)
+        mask = self._weight_masks.get(key)
+        if mask is not None:
+            return mask
+
+        # ramp[i] = distance to the nearest edge / feather_pixels, clipped to 1 (0 on the outermost pixel)
+        def edge_ramp(length: int) -> np.ndarray:
+            index = np.arange(length)
+            distance = np.minimum(index, length - 1 - index)
+            if feather_pixels <= 0:
+                return np.ones(length, dtype=dtype)
+            return np.minimum(distance / feather_pixels, 1.0).astype(dtype)
+
+        ramp_y = edge_ramp(height)
+        ramp_x = edge_ramp(width)
+        if kind == "feather":
+            mask = np.multiply.outer(ramp_y, ramp_x)
+        elif kind == "linear":
+            mask = np.minimum.outer(ramp_y, ramp_x)
+        else:
+            raise ValueError(f"Unsupported weight mask kind: {kind}")
 
+        mask.flags.writeable = False
+        self._weight_masks[key] = mask
         return mask
 
     def _reorder_images_zigzag(self, images: List[np.ndarray], grid_x: int, grid_y: int) -> List[np.ndarray]:
@@ -525,3 +903,18 @@ class ImageProcessService:
                 reordered_images[grid_index] = images[zigzag_index]
 
         return reordered_images
+
+    def _arrange_images(
+        self, images: List[np.ndarray], grid_indices: List[Tuple[int, int]], grid_x: int, grid_y: int
+    ) -> List[Optional[np.ndarray]]:
+        """Place images captured in any order at their (column, row) grid cells; empty cells are None"""
+        if len(images) != len(grid_indices):
+            raise ValueError(f"Expected {len(images)} grid indices, got {len(grid_indices)}")
+
+        arranged_images = [None] * (grid_x * grid_y)
+        for image, (x, y) in zip(images, grid_indices):
+            if not (0 <= x < grid_x and 0 <= y < grid_y):
+                raise ValueError(f"Grid index ({x}, {y}) is outside the {grid_x}x{grid_y} grid")
+            arranged_images[y * grid_x + x] = image
+
+        return arranged_images
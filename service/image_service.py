@@ -1,9 +1,13 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+import time
 import cv2
+import numpy as np
 from datetime import datetime
 
 from mock.test_env import test_env
 from application.event_bus import event_bus, ImageCaptureEvent, ErrorEvent
+from utils.frame import Frame
+from utils.frame_pool import FramePool
 
 
 def create_image_service(config: Dict[str, Any]):
@@ -17,6 +21,8 @@ class MockImageService:
     def __init__(self, config: Dict[str, Any]):
         self.config = config
         self.connected = False
+        # grabで取り込んだ画像 (retrieveで返す)
+        self._grabbed = None
         self.connect()
 
     def connect(self):
@@ -34,24 +40,49 @@ class MockImageService:
         return self.connected
 
     def capture(self, refresh=False):
+        """画像をキャプチャ (戻り値のFrameは呼び出し側が所有し、不要になったらrelease()する)"""
         try:
             if not self.connected:
                 raise RuntimeError("Mock camera is not connected")
             print("Capturing image in MockImageService...")
             test_env.display_status()
             image_data = test_env.capture()
+            if image_data is None:
+                raise RuntimeError("Mock image is not available")
+            frame = Frame(image_data)
             # Publish image capture event
             event = ImageCaptureEvent(
-                image_data=image_data,
-                timestamp=datetime.now()
+                image_data=frame.data,
+                timestamp=frame.timestamp,
+                frame=frame,
             )
             event_bus.publish(event)
-            return image_data
+            return frame
         except Exception as e:
             error_event = ErrorEvent(error_message=f"Failed to capture image: {str(e)}")
             event_bus.publish(error_event)
             return None
 
+    def grab(self) -> Optional[float]:
+        """次のフレームの時刻まで待ち、その時刻 (time.perf_counter) を返す"""
+        if not self.connected:
+            return None
+        interval = 1.0 / self.config["camera"]["frame_rate"]
+        now = time.perf_counter()
+        next_frame = (np.floor(now / interval) + 1) * interval
+        time.sleep(next_frame - now)
+        self._grabbed = test_env.capture()
+        return next_frame
+
+    def retrieve(self) -> Optional[Frame]:
+        """直前にgrabしたフレームを返す (戻り値のFrameは呼び出し側が所有し、不要になったらrelease()する)"""
+        image_data = self._grabbed
+        if image_data is None:
+            return None
+        frame = Frame(image_data)
+        event_bus.publish(ImageCaptureEvent(image_data=frame.data, timestamp=frame.timestamp, frame=frame))
+        return frame
+
     def stop(self):
         """Stop mock camera"""
         self.disconnect()
@@ -61,6 +92,8 @@ class ImageService:
     def __init__(self, config: Dict[str, Any]):
         self.config = config
         self.cap = None
+        # cap.read()のたびに画像サイズのバッファを確保しないよう、読み込み先を使い回す
+        self.frame_pool = FramePool(max_size=config["camera"].get("frame_pool_size", 4))
         self.connect()
 
     def connect(self):
@@ -92,29 +125,41 @@ class ImageService:
         return self.cap is not None and self.cap.isOpened()
 
     def capture(self, refresh=False):
-        """画像をキャプチャ"""
+        """画像をキャプチャ (戻り値のFrameは呼び出し側が所有し、不要になったらrelease()する)"""
         try:
             if not self.cap or not self.cap.isOpened():
                 raise RuntimeError("Camera is not connected")
 
-            # Flush the camera buffer by reading and discarding several frames
+            # Flush the camera buffer by grabbing and discarding several frames
             # This ensures we get the latest frame, not a buffered old frame
+            # grab() does not decode the frame, so no image buffer is allocated
             if refresh:
                 num_frames_to_flush = 5
                 for _ in range(num_frames_to_flush):
-                    self.cap.read()
+                    self.cap.grab()
 
-            # Now read the actual frame
-            ret, frame = self.cap.read()
+            # Now read the actual frame into a pooled buffer
+            buffer = self.frame_pool.acquire()
+            ret, image = self.cap.read(image=buffer)
             if not ret:
+                if buffer is not None:
+                    self.frame_pool.release(buffer)
                 raise RuntimeError("Failed to capture frame")
 
             print("Image captured successfully")
 
+            # 購読者には読み取り専用のビューを渡し、コピーせずに共有する
+            # 参照がなくなったバッファはプールへ返却される
+            # (解像度が変わってプールのバッファに読み込めなかった場合は、新しい解像度でプールを作り直す)
+            if buffer is not None and not np.shares_memory(image, buffer):
+                self.frame_pool.reset(image.shape, image.dtype)
+            frame = self.frame_pool.wrap(image, timestamp=datetime.now())
+
             # Publish image capture event
             event = ImageCaptureEvent(
-                image_data=frame,
-                timestamp=datetime.now()
+                image_data=frame.data,
+                timestamp=frame.timestamp,
+                frame=frame,
             )
             event_bus.publish(event)
 
@@ -124,6 +169,44 @@ class ImageService:
             event_bus.publish(error_event)
             return None
 
+    def grab(self) -> Optional[float]:
+        """
+        ストリームから次のフレームを取り込み (デコードはしない)、取り込んだ時刻 (time.perf_counter) を返す
+        連続して呼び続けている間はバッファに古いフレームがたまらないため、時刻はフレームの到着時刻に近い
+        """
+        if not self.cap or not self.cap.isOpened():
+            return None
+        if not self.cap.grab():
+            return None
+        return time.perf_counter()
+
+    def retrieve(self, publish: bool = True) -> Optional[Frame]:
+        """
+        直前にgrabしたフレームをデコードしてFrameで返す (戻り値のFrameは呼び出し側が所有し、不要になったらrelease()する)
+        param publish: Falseの場合はImageCaptureEventを発行しない (時刻が重要なループの中では後でpublish_frameで発行する)
+        """
+        try:
+            buffer = self.frame_pool.acquire()
+            ret, image = self.cap.retrieve(image=buffer)
+            if not ret:
+                if buffer is not None:
+                    self.frame_pool.release(buffer)
+                raise RuntimeError("Failed to retrieve frame")
+
+            if buffer is not None and not np.shares_memory(image, buffer):
+                self.frame_pool.reset(image.shape, image.dtype)
+            frame = self.frame_pool.wrap(image, timestamp=datetime.now())
+            if publish:
+                self.publish_frame(frame)
+            return frame
+        except Exception as e:
+            event_bus.publish(ErrorEvent(error_message=f"Failed to capture image: {str(e)}"))
+            return None
+
+    def publish_frame(self, frame: Frame):
+        """retrieve(publish=False)で取り込んだフレームのImageCaptureEventを発行する"""
+        event_bus.publish(ImageCaptureEvent(image_data=frame.data, timestamp=frame.timestamp, frame=frame))
+
     def stop(self):
         """カメラを停止してリソースを解放"""
         self.disconnect()
@@ -152,8 +235,9 @@ if __name__ == "__main__":
     if frame is not None:
         # Save the captured image
         save_path = "output/test_capture.jpg"
-        cv2.imwrite(save_path, frame)
+        cv2.imwrite(save_path, frame.data)
         print(f"Image saved: {save_path} (shape: {frame.shape})")
+        frame.release()
     else:
         print("Failed to capture image")
 
@@ -0,0 +1,70 @@
+from typing import Any, Dict, Optional, Tuple
+
+
+class PositionCorrector:
+    """
+    画像の位置合わせで測定したタイルの位置のずれを、次の移動の指令位置に反映する (閉ループの位置補正)
+
+    - ずれ (実際の位置 - 指令した位置、mm) は軸ごと・移動方向ごとに指数移動平均で学習する
+      同じ軸で移動方向によってずれが異なる分がバックラッシュになる
+    - 次の移動では、その移動の方向で学習したずれを目標位置から差し引いて指令する
+    - 学習した値はスキャンをまたいで保持する (ステージのmm単位なので倍率によらない)
+    """
+
+    AXES = ("x", "y")
+
+    def __init__(self, config: Dict[str, Any]):
+        closed_loop_config = config.get("stitching", {}).get("closed_loop", {}) or {}
+        self.enabled = closed_loop_config.get("enabled", False)
+        self.gain = closed_loop_config.get("gain", 0.5)
+        self.max_error_mm = closed_loop_config.get("max_error_mm", 0.1)
+        self.reset()
+
+    def reset(self):
+        self._error = {axis: {1: 0.0, -1: 0.0} for axis in self.AXES}
+        self._learned = {axis: {1: False, -1: False} for axis in self.AXES}
+        self._last_direction = {axis: 1 for axis in self.AXES}
+
+    def command(self, start: Tuple[float, float], target: Tuple[float, float]) -> Tuple[Tuple[float, float], Tuple[int, int]]:
+        """
+        startからtargetへ移動するときに指令する位置
+        param start: 直前に指令した位置 (ステージが実際に受け取った位置)
+
+        return (commanded, directions): 指令位置と、軸ごとの移動方向 (+1/-1。移動しない軸は前回の方向)
+        """
+        directions = []
+        for index, axis in enumerate(self.AXES):
+            delta = target[index] - start[index]
+            if delta != 0:
+                self._last_direction[axis] = 1 if delta > 0 else -1
+            directions.append(self._last_direction[axis])
+        commanded = tuple(
+            target[index] - self._error[axis][directions[index]] for index, axis in enumerate(self.AXES)
+        )
+        return commanded, (directions[0], directions[1])
+
+    def update(self, directions: Tuple[int, int], error: Tuple[float, float]) -> bool:
+        """
+        測定したずれ (実際の位置 - 指令した位置、mm) で学習する
+        max_error_mmを超えるずれは位置合わせの誤りとみなして使わない
+
+        return 学習に使ったか
+        """
+        if any(abs(value) > self.max_error_mm for value in error):
+            return False
+        for index, axis in enumerate(self.AXES):
+            direction = directions[index]
+            if self._learned[axis][direction]:
+                self._error[axis][direction] += self.gain * (error[index] - self._error[axis][direction])
+            else:
+                # 最初の測定はそのまま使う (0から平均すると学習に数タイルかかるため)
+                self._error[axis][direction] = error[index]
+                self._learned[axis][direction] = True
+        return True
+
+    def backlash(self) -> Dict[str, Optional[float]]:
+        """軸ごとのバックラッシュ (+方向と-方向のずれの差、mm)。両方向を学習していない軸はNone"""
+        return {
+            axis: self._error[axis][1] - self._error[axis][-1] if all(self._learned[axis].values()) else None
+            for axis in self.AXES
+        }
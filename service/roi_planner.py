@@ -0,0 +1,102 @@
+from typing import Any, Dict, List, Tuple
+import cv2
+import numpy as np
+
+from utils.frame import as_array
+
+
+class RoiPlanner:
+    """
+    低倍率の全体像から試料のある領域を求め、高倍率で撮影するタイルを決める
+
+    - 全体像をぼかしてから大津の二値化で試料と背景に分ける (背景は画像の外周に多く写っている側とする)
+    - 高倍率のタイルの格子を全体像の範囲に敷き、試料の画素が min_fill 以上含まれるセルだけを撮影する
+    - セルごとの試料の割合は積分画像から一度に求める
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        roi_config = config.get("stitching", {}).get("roi", {}) or {}
+        self.blur_sigma_px = roi_config.get("blur_sigma_px", 2.0)
+        self.min_fill = roi_config.get("min_fill", 0.02)
+        self.dilate_cells = roi_config.get("dilate_cells", 0)
+
+    def segment(self, image: Any) -> np.ndarray:
+        """
+        Segment the specimen in an overview image
+
+        Returns:
+            Boolean mask (True = specimen) with the same height and width as the image
+        """
+        src = as_array(image)
+        gray = cv2.cvtColor(src, cv2.COLOR_BGR2GRAY) if src.ndim == 3 else src
+        if self.blur_sigma_px > 0:
+            gray = cv2.GaussianBlur(gray, (0, 0), self.blur_sigma_px)
+        _, binary = cv2.threshold(gray, 0, 1, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        mask = binary.astype(bool)
+
+        # 外周で多い方を背景とする (明視野では試料が暗く、蛍光では明るいため)
+        border = np.concatenate([mask[0], mask[-1], mask[:, 0], mask[:, -1]])
+        if border.mean() > 0.5:
+            mask = ~mask
+        return mask
+
+    def occupied_cells(
+        self,
+        mask: np.ndarray,
+        mm_per_px: float,
+        tile_size_mm: Tuple[float, float],
+        overlap_ratio: float,
+    ) -> np.ndarray:
+        """
+        Lay a grid of detail tiles over the overview and find the cells that contain specimen
+
+        Args:
+            mask: Specimen mask of the overview (top-left pixel = stage position of the overview's first tile)
+            mm_per_px: Stage distance per overview pixel
+            tile_size_mm: (width, height) of a detail tile
+            overlap_ratio: Overlap between detail tiles
+
+        Returns:
+            Boolean array (grid_y, grid_x); cell (col, row) is at (col * step_x, row * step_y) from the overview origin
+        """
+        mask_h, mask_w = mask.shape
+        tile_w, tile_h = tile_size_mm[0] / mm_per_px, tile_size_mm[1] / mm_per_px
+        step_x, step_y = tile_w * (1 - overlap_ratio), tile_h * (1 - overlap_ratio)
+        grid_x = max(1, int(np.ceil(max(0.0, mask_w - tile_w) / step_x - 1e-9)) + 1)
+        grid_y = max(1, int(np.ceil(max(0.0, mask_h - tile_h) / step_y - 1e-9)) + 1)
+
+        # セルの範囲 (全体像の画素) を求め、積分画像で試料の画素数を数える
+        x0 = np.clip(np.round(np.arange(grid_x) * step_x).astype(int), 0, mask_w)
+        x1 = np.clip(np.round(np.arange(grid_x) * step_x + tile_w).astype(int), 0, mask_w)
+        y0 = np.clip(np.round(np.arange(grid_y) * step_y).astype(int), 0, mask_h)
+        y1 = np.clip(np.round(np.arange(grid_y) * step_y + tile_h).astype(int), 0, mask_h)
+        integral = cv2.integral(mask.astype(np.uint8))
+        counts = (
+            integral[y1[:, None], x1[None, :]]
+            - integral[y0[:, None], x1[None, :]]
+            - integral[y1[:, None], x0[None, :]]
+            + integral[y0[:, None], x0[None, :]]
+        )
+        areas = np.maximum((y1 - y0)[:, None] * (x1 - x0)[None, :], 1)
+        occupied = counts / areas >= self.min_fill
+
+        # 試料の端を取りこぼさないように、撮影するセルを周囲に広げる
+        if self.dilate_cells > 0 and occupied.any():
+            size = 2 * self.dilate_cells + 1
+            occupied = cv2.dilate(occupied.astype(np.uint8), np.ones((size, size), np.uint8)).astype(bool)
+        return occupied
+
+    @staticmethod
+    def serpentine_order(occupied: np.ndarray) -> List[Tuple[int, int]]:
+        """Occupied cells (col, row) row by row, reversing direction after every row that has cells"""
+        order = []
+        left_to_right = True
+        for row in range(occupied.shape[0]):
+            cols = np.flatnonzero(occupied[row])
+            if not len(cols):
+                continue
+            if not left_to_right:
+                cols = cols[::-1]
+            order.extend((int(col), row) for col in cols)
+            left_to_right = not left_to_right
+        return order
@@ -0,0 +1,184 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import os
+
+import numpy as np
+
+from enums.enums import SpeedLevel
+from service.stage_kinematics import AxisProfile, calibration_path
+from utils.logger import logger
+
+
+class StageCalibrator:
+    """
+    ステージの移動時間を実測して、軸ごとの動作モデル (AxisProfile) のパラメータを求める
+
+    - 速度段階ごとに、各軸で長さの異なる往復移動を行い、コマンド送信からReadyに戻るまでの時間を測る
+      (ControllerService.timed_move)
+    - 最高速度・加減速時間・移動ごとのオーバーヘッドを最小二乗で当てはめる
+      起動速度は ControllerService.change_speed と同じく最高速度の1/10とする
+    - 結果は stage.calibration.file (JSON) に保存し、StageKinematics が読み込む
+    """
+
+    # 当てはめる最高速度の範囲 (設定値に対する比) と加減速時間の範囲 (秒)
+    SPEED_FACTOR_RANGE = (0.25, 4.0)
+    ACCEL_TIME_RANGE = (0.0, 2.0)
+
+    def __init__(self, config: Dict[str, Any], controller_service):
+        stage_config = config["stage"]
+        calibration_config = stage_config.get("calibration", {}) or {}
+        self.path = calibration_path(config)
+        self.speed_levels = calibration_config.get("speed_levels", ["s4"])
+        self.distances_mm = calibration_config.get("distances_mm", [0.01, 0.05, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0])
+        self.repeats = max(1, calibration_config.get("repeats", 2))
+        self.max_move_s = calibration_config.get("max_move_s", 5.0)
+
+        self.pulses_per_mm = stage_config.get("pulses_per_mm", 1000)
+        speed_config = stage_config.get("speed", {})
+        self.speed_table = {key: value for key, value in speed_config.items() if key != "acceleration_time"}
+        self.accel_time = speed_config.get("acceleration_time", 200) / 1000.0
+
+        self.controller_service = controller_service
+
+    def run(self, axes: Tuple[str, ...] = ("x", "y")) -> Optional[Dict[str, Any]]:
+        """
+        現在位置の周りで移動時間を測定して当てはめ、結果を保存する
+        移動範囲の端では負の方向から往復する。測定後は元の速度段階に戻す
+
+        return 保存した内容 (速度段階ごと・軸ごとのパラメータ)。当てはめられた軸がなければNone
+        """
+        results: Dict[str, Dict[str, Any]] = {}
+        previous_level = self.controller_service.speed_level
+        try:
+            for level in self.speed_levels:
+                self.controller_service.change_speed(SpeedLevel(level))
+                for axis in axes:
+                    samples = self._measure(axis, self.speed_table[level])
+                    fit = self.fit(samples, self.speed_table[level])
+                    if fit is None:
+                        logger.warning(f"Stage calibration failed for {level} axis {axis} ({len(samples)} moves)")
+                        continue
+                    results.setdefault(level, {})[axis] = fit
+                    logger.info(
+                        f"Stage calibration {level} {axis}: {fit['max_speed']:.0f} pps "
+                        f"(set {self.speed_table[level]}), accel {fit['accel_time'] * 1000:.0f} ms, "
+                        f"overhead {fit['overhead_s'] * 1000:.0f} ms, rms error {fit['rms_error_s'] * 1000:.1f} ms "
+                        f"over {fit['num_moves']} moves"
+                    )
+        finally:
+            self.controller_service.change_speed(previous_level or SpeedLevel.S1)
+
+        if not results:
+            return None
+        return self._save(results)
+
+    def _measure(self, axis: str, fast: int) -> List[Tuple[int, float]]:
+        """(移動パルス数, 移動時間) の一覧。設定値での見積もりがmax_move_sを超える移動は行わない"""
+        nominal = AxisProfile.from_speed(fast, self.accel_time, self.pulses_per_mm)
+        samples = []
+        for distance in self.distances_mm:
+            if float(nominal.move_time(distance)) > self.max_move_s:
+                continue
+            x, y = self.controller_service.get_current_position()
+            step = (distance, 0.0) if axis == "x" else (0.0, distance)
+            sign = 1.0 if self.controller_service.is_valid_movement(x + step[0], y + step[1], is_relative=False) else -1.0
+            if not self.controller_service.is_valid_movement(x + sign * step[0], y + sign * step[1], is_relative=False):
+                logger.warning(f"Stage calibration: {distance} mm move on axis {axis} exceeds movement limits")
+                continue
+
+            pulses = abs(int(round(distance * self.pulses_per_mm)))
+            for _ in range(self.repeats):
+                for direction in (sign, -sign):
+                    elapsed = self.controller_service.timed_move(direction * step[0], direction * step[1])
+                    samples.append((pulses, elapsed))
+        return samples
+
+    def fit(self, samples: List[Tuple[int, float]], fast: int) -> Optional[Dict[str, Any]]:
+        """
+        移動時間 = オーバーヘッド + 台形速度の移動時間 を当てはめる
+        最高速度と加減速時間は格子探索 (粗い格子の後に最良点の周りを細かく探す)、オーバーヘッドは残差の平均で求める
+
+        param samples: (移動パルス数, 移動時間) の一覧
+        param fast: 設定した最高速度 (PPS)
+        return {"start_speed", "max_speed", "accel_time", "overhead_s", "rms_error_s", "num_moves"}
+            短い移動と長い移動がそろっていない場合や、当てはめた値が探索範囲の端になった場合はNone
+        """
+        if len(samples) < 4 or len({pulses for pulses, _ in samples}) < 3:
+            return None
+        distance = np.array([pulses for pulses, _ in samples], dtype=np.float64) / self.pulses_per_mm
+        times = np.array([elapsed for _, elapsed in samples], dtype=np.float64)
+        start_ratio = AxisProfile.from_speed(fast, self.accel_time, self.pulses_per_mm).start_speed / fast
+
+        log_factors = np.linspace(np.log(self.SPEED_FACTOR_RANGE[0]), np.log(self.SPEED_FACTOR_RANGE[1]), 81)
+        accel_times = np.linspace(self.ACCEL_TIME_RANGE[0], self.ACCEL_TIME_RANGE[1], 81)
+        best = self._grid_search(distance, times, fast, start_ratio, log_factors, accel_times)
+        edge = (best[0] in (log_factors[0], log_factors[-1]), best[1] == accel_times[-1])
+
+        # 最良点の周りを細かく探す
+        log_step = log_factors[1] - log_factors[0]
+        accel_step = accel_times[1] - accel_times[0]
+        best = self._grid_search(
+            distance, times, fast, start_ratio,
+            np.linspace(best[0] - log_step, best[0] + log_step, 41),
+            np.linspace(max(best[1] - accel_step, 0.0), best[1] + accel_step, 41),
+        )
+        log_factor, accel_time, overhead, rms = best
+        if any(edge) or overhead < 0:
+            return None
+
+        max_speed = fast * float(np.exp(log_factor))
+        return {
+            "start_speed": max_speed * start_ratio,
+            "max_speed": max_speed,
+            "accel_time": float(accel_time),
+            "overhead_s": float(overhead),
+            "rms_error_s": float(rms),
+            "num_moves": len(samples),
+        }
+
+    def _grid_search(
+        self,
+        distance: np.ndarray,
+        times: np.ndarray,
+        fast: int,
+        start_ratio: float,
+        log_factors: np.ndarray,
+        accel_times: np.ndarray,
+    ) -> Tuple[float, float, float, float]:
+        """(最高速度の比の対数, 加減速時間, オーバーヘッド, 残差のRMS) の最良の組"""
+        best = None
+        for log_factor in log_factors:
+            max_speed = fast * np.exp(log_factor)
+            for accel_time in accel_times:
+                profile = AxisProfile(max_speed * start_ratio, max_speed, accel_time, self.pulses_per_mm)
+                residual = times - profile.move_time(distance)
+                overhead = float(np.mean(residual))
+                rms = float(np.sqrt(np.mean((residual - overhead) ** 2)))
+                if best is None or rms < best[3]:
+                    best = (float(log_factor), float(accel_time), overhead, rms)
+        return best
+
+    def _save(self, results: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """既存の結果に上書きして保存する (測定しなかった速度段階・軸の結果は残す)"""
+        data = {"speed_levels": {}}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except Exception as e:
+                logger.warning(f"Failed to read stage calibration {self.path}, overwriting: {e}")
+        data["created"] = datetime.now().isoformat(timespec="seconds")
+        data["pulses_per_mm"] = self.pulses_per_mm
+        levels = data.setdefault("speed_levels", {})
+        for level, axes in results.items():
+            levels.setdefault(level, {}).update(axes)
+
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+            logger.info(f"Stage calibration saved to {self.path}")
+        except Exception as e:
+            logger.warning(f"Failed to save stage calibration {self.path}: {e}")
+        return data
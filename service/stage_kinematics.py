@@ -0,0 +1,122 @@
+from typing import Any, Dict, Optional
+import json
+import os
+
+import numpy as np
+
+from utils.logger import logger
+
+
+def calibration_path(config: Dict[str, Any]) -> str:
+    """StageCalibratorの結果の保存先"""
+    calibration_config = config.get("stage", {}).get("calibration", {}) or {}
+    return calibration_config.get("file", "settings/calibration/stage_kinematics.json")
+
+
+class AxisProfile:
+    """
+    台形速度の動作モデル (1軸分)
+
+    起動速度 start_speed から最高速度 max_speed まで accel_time 秒で一定加速し、同じ時間で減速する。
+    最高速度に達する前に減速を始める短い移動は三角形の速度になる。
+    """
+
+    def __init__(self, start_speed: float, max_speed: float, accel_time: float, pulses_per_mm: float):
+        self.start_speed = float(start_speed)
+        self.max_speed = float(max(max_speed, start_speed))
+        self.accel_time = float(accel_time)
+        self.pulses_per_mm = float(pulses_per_mm)
+
+    @classmethod
+    def from_speed(cls, max_speed: float, accel_time: float, pulses_per_mm: float) -> "AxisProfile":
+        """ControllerService.change_speed と同じ起動速度 (最高速度の1/10、高速レンジでは50以上) のプロファイル"""
+        slow = max(50, max_speed // 10) if max_speed >= 50 else max(1, max_speed // 10)
+        return cls(slow, max_speed, accel_time, pulses_per_mm)
+
+    @property
+    def ramp_distance_mm(self) -> float:
+        """停止状態から最高速度に達するまでに進む距離 (mm)"""
+        return (self.start_speed + self.max_speed) / 2 * self.accel_time / self.pulses_per_mm
+
+    def distance_at(self, elapsed_s) -> np.ndarray:
+        """停止状態から最高速度に向けて加速を始めてからelapsed_s秒後に進んだ距離 (mm)"""
+        elapsed = np.maximum(np.asarray(elapsed_s, dtype=np.float64), 0.0)
+        if self.accel_time <= 0:
+            return elapsed * self.max_speed / self.pulses_per_mm
+        acceleration = (self.max_speed - self.start_speed) / self.accel_time
+        ramp = np.minimum(elapsed, self.accel_time)
+        pulses = self.start_speed * ramp + 0.5 * acceleration * ramp**2 + self.max_speed * (elapsed - ramp)
+        return pulses / self.pulses_per_mm
+
+    def move_time(self, distance_mm) -> np.ndarray:
+        """Time (s) to move the given distance(s) in mm; accepts scalars or arrays"""
+        distance = np.abs(np.asarray(distance_mm, dtype=np.float64)) * self.pulses_per_mm
+        start, peak = self.start_speed, self.max_speed
+        if self.accel_time <= 0 or peak <= start:
+            return distance / peak
+
+        acceleration = (peak - start) / self.accel_time
+        # 加速と減速で進む距離 (最高速度に達する場合)
+        ramp_distance = (peak + start) * self.accel_time
+
+        full = 2 * self.accel_time + np.maximum(distance - ramp_distance, 0) / peak
+        # 最高速度に達しない場合は、加速と減速の区間だけになる
+        reached = np.sqrt(start**2 + acceleration * distance)
+        short = 2 * (reached - start) / acceleration
+        return np.where(distance >= ramp_distance, full, short)
+
+
+class StageKinematics:
+    """
+    XYステージの移動時間のモデル
+
+    2軸は同時に動くため、移動時間は遅い方の軸で決まる。
+    速度は stage.speed の段階 (stitching.trajectory.speed_level) と ControllerService.change_speed と同じ
+    起動速度・加減速時間から求める。move_overhead_s は移動ごとのコマンド送信・整定時間。
+    StageCalibrator で測定した結果がその速度段階にあれば、測定した軸はその値を使う
+    (オーバーヘッドは1つのコマンドで両軸を動かすため、測定した軸の平均とする)。
+    """
+
+    def __init__(self, config: Dict[str, Any], speed_level: Optional[str] = None):
+        stage_config = config.get("stage", {})
+        speed_config = stage_config.get("speed", {})
+        trajectory_config = config.get("stitching", {}).get("trajectory", {}) or {}
+        speed_level = speed_level or trajectory_config.get("speed_level", "s4")
+
+        pulses_per_mm = stage_config.get("pulses_per_mm", 1000)
+        fast = speed_config.get(speed_level, 5000)
+        accel_time = speed_config.get("acceleration_time", 200) / 1000.0
+
+        self.axes = {
+            "x": AxisProfile.from_speed(fast, accel_time, pulses_per_mm),
+            "y": AxisProfile.from_speed(fast, accel_time, pulses_per_mm),
+        }
+        self.overhead_s = stage_config.get("move_overhead_s", 0.0)
+        self.calibrated = self._apply_calibration(calibration_path(config), speed_level, pulses_per_mm)
+
+    def _apply_calibration(self, path: str, speed_level: str, pulses_per_mm: float) -> bool:
+        if not os.path.exists(path):
+            return False
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                axes = json.load(f).get("speed_levels", {}).get(speed_level, {})
+            overheads = []
+            for axis, fit in axes.items():
+                if axis not in self.axes:
+                    continue
+                self.axes[axis] = AxisProfile(fit["start_speed"], fit["max_speed"], fit["accel_time"], pulses_per_mm)
+                overheads.append(fit["overhead_s"])
+        except Exception as e:
+            logger.warning(f"Failed to load stage calibration {path}: {e}")
+            return False
+        if not overheads:
+            return False
+        self.overhead_s = float(sum(overheads) / len(overheads))
+        return True
+
+    def move_time(self, dx_mm, dy_mm) -> np.ndarray:
+        """Time (s) of a move by (dx, dy) mm; accepts scalars or broadcastable arrays"""
+        dx_mm, dy_mm = np.broadcast_arrays(np.asarray(dx_mm, dtype=np.float64), np.asarray(dy_mm, dtype=np.float64))
+        travel = np.maximum(self.axes["x"].move_time(dx_mm), self.axes["y"].move_time(dy_mm))
+        moved = (dx_mm != 0) | (dy_mm != 0)
+        return np.where(moved, travel + self.overhead_s, 0.0)
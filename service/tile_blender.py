@@ -0,0 +1,290 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+import os
+
+import cv2
+import numpy as np
+
+
+class OverlapBlender:
+    """
+    Base class for blenders that only touch the overlap regions of the mosaic
+
+    - Aligned tiles are first pasted as-is into a uint8 canvas while counting how many tiles cover each pixel.
+      60-80% of each tile is not overlapped, and these pixels are never converted to float
+    - Only canvas blocks that contain pixels covered by two or more tiles are blended. Each block is
+      computed by the subclass from the tiles touching it (expanded by `margin` when the method needs context),
+      so memory scales with the block size rather than the mosaic size
+    - Blocks are independent and are computed in a thread pool (OpenCV/numpy release the GIL);
+      results are written back to overlapped pixels only
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        stitching_config = config.get("stitching", {})
+        self.block_size = stitching_config.get("blend_block_size", 512)
+        self.num_workers = stitching_config.get("blend_workers", 0) or os.cpu_count() or 1
+
+    @property
+    def margin(self) -> int:
+        """Extra context (px) around each block that the blending method needs"""
+        return 0
+
+    def blend(
+        self,
+        images: List[np.ndarray],
+        positions: List[Tuple[int, int]],
+        alignment_success: List[bool],
+        canvas_w: int,
+        canvas_h: int,
+        weight_mask: np.ndarray,
+    ) -> np.ndarray:
+        """
+        Args:
+            images: 3-channel uint8 tiles
+            positions: (x, y) of each tile on the canvas (already shifted to non-negative coordinates)
+            alignment_success: Only aligned tiles are blended; the others are pasted on top afterwards
+            canvas_w, canvas_h: Output size
+            weight_mask: Per-tile feather weight
+
+        Returns:
+            Blended uint8 canvas
+        """
+        img_h, img_w = images[0].shape[:2]
+        output = np.zeros((canvas_h, canvas_w, 3), dtype=np.uint8)
+        coverage = np.zeros((canvas_h, canvas_w), dtype=np.uint8)
+
+        aligned = [idx for idx, success in enumerate(alignment_success) if success]
+        for idx in aligned:
+            x, y = positions[idx]
+            output[y : y + img_h, x : x + img_w] = images[idx]
+            coverage[y : y + img_h, x : x + img_w] += 1
+
+        blocks = self._overlap_blocks([positions[idx] for idx in aligned], aligned, img_w, img_h, coverage)
+        if blocks:
+            tasks = [(block, tiles, images, positions, weight_mask, canvas_w, canvas_h) for block, tiles in blocks]
+            with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+                # mapは投入順に結果を返すため、ブロックごとの書き戻しは決定的になる
+                for ((x0, y0, x1, y1), _), (blended, valid) in zip(blocks, executor.map(self._blend_block_task, tasks)):
+                    overlap = coverage[y0:y1, x0:x1] >= 2
+                    if valid is not None:
+                        overlap &= valid
+                    output[y0:y1, x0:x1][overlap] = blended[overlap]
+
+        # 位置合わせに失敗したタイルはブレンドせずに上書きする
+        for idx, success in enumerate(alignment_success):
+            if not success:
+                x, y = positions[idx]
+                output[y : y + img_h, x : x + img_w] = images[idx]
+
+        return output
+
+    def _overlap_blocks(
+        self,
+        tile_positions: List[Tuple[int, int]],
+        tile_indices: List[int],
+        img_w: int,
+        img_h: int,
+        coverage: np.ndarray,
+    ) -> List[Tuple[Tuple[int, int, int, int], List[int]]]:
+        """Canvas blocks (x0, y0, x1, y1) that contain overlapping pixels, with the tiles touching each block"""
+        canvas_h, canvas_w = coverage.shape
+        size = self.block_size
+        blocks_x = (canvas_w + size - 1) // size
+        blocks_y = (canvas_h + size - 1) // size
+        margin = self.margin
+
+        # ブロックごとに、余白を含めて接するタイルを集める
+        block_tiles: Dict[Tuple[int, int], List[int]] = {}
+        for (x, y), idx in zip(tile_positions, tile_indices):
+            bx0 = max(0, (x - margin) // size)
+            bx1 = min(blocks_x - 1, (x + img_w + margin - 1) // size)
+            by0 = max(0, (y - margin) // size)
+            by1 = min(blocks_y - 1, (y + img_h + margin - 1) // size)
+            for by in range(by0, by1 + 1):
+                for bx in range(bx0, bx1 + 1):
+                    block_tiles.setdefault((by, bx), []).append(idx)
+
+        blocks = []
+        for (by, bx), tiles in sorted(block_tiles.items()):
+            if len(tiles) < 2:
+                continue
+            x0, y0 = bx * size, by * size
+            x1, y1 = min(x0 + size, canvas_w), min(y0 + size, canvas_h)
+            if np.any(coverage[y0:y1, x0:x1] >= 2):
+                blocks.append(((x0, y0, x1, y1), tiles))
+        return blocks
+
+    def _blend_block_task(self, task) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        return self._blend_block(*task)
+
+    def _blend_block(
+        self,
+        block: Tuple[int, int, int, int],
+        tiles: List[int],
+        images: List[np.ndarray],
+        positions: List[Tuple[int, int]],
+        weight_mask: np.ndarray,
+        canvas_w: int,
+        canvas_h: int,
+    ) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Blend one block
+
+        Returns:
+            Tuple of (uint8 block, valid) where valid marks the pixels that may be written back
+            (None means all pixels)
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def _intersection(
+        position: Tuple[int, int], tile_w: int, tile_h: int, region: Tuple[int, int, int, int]
+    ) -> Optional[Tuple[int, int, int, int]]:
+        """Intersection (x0, y0, x1, y1) of a tile with a canvas region, or None"""
+        x, y = position
+        rx0, ry0, rx1, ry1 = region
+        cx0, cy0 = max(rx0, x), max(ry0, y)
+        cx1, cy1 = min(rx1, x + tile_w), min(ry1, y + tile_h)
+        if cx0 >= cx1 or cy0 >= cy1:
+            return None
+        return cx0, cy0, cx1, cy1
+
+
+class FeatherBlender(OverlapBlender):
+    """Weighted average with the feather mask (blend_method: linear / feather), computed in overlap blocks only"""
+
+    def _blend_block(self, block, tiles, images, positions, weight_mask, canvas_w, canvas_h):
+        bx0, by0, bx1, by1 = block
+        block_h, block_w = by1 - by0, bx1 - bx0
+        img_h, img_w = images[tiles[0]].shape[:2]
+
+        accumulated = np.zeros((block_h, block_w, 3), dtype=np.float32)
+        weights = np.zeros((block_h, block_w), dtype=np.float32)
+        weighted_tile = np.empty((block_h, block_w, 3), dtype=np.float32)
+
+        for idx in tiles:
+            rect = self._intersection(positions[idx], img_w, img_h, block)
+            if rect is None:
+                continue
+            cx0, cy0, cx1, cy1 = rect
+            x, y = positions[idx]
+            tile_crop = images[idx][cy0 - y : cy1 - y, cx0 - x : cx1 - x]
+            mask_crop = weight_mask[cy0 - y : cy1 - y, cx0 - x : cx1 - x]
+            block_slice = (slice(cy0 - by0, cy1 - by0), slice(cx0 - bx0, cx1 - bx0))
+            current_weighted = weighted_tile[: cy1 - cy0, : cx1 - cx0]
+
+            np.multiply(tile_crop, mask_crop[:, :, np.newaxis], out=current_weighted)
+            accumulated[block_slice] += current_weighted
+            weights[block_slice] += mask_crop
+
+        # 重みが0の画素 (全タイルの最外周) は貼り付けた画素のままにする
+        valid = weights > 0
+        np.divide(accumulated, weights[:, :, np.newaxis], out=accumulated, where=valid[:, :, np.newaxis])
+        return accumulated.astype(np.uint8), valid
+
+
+class MultiBandBlender(OverlapBlender):
+    """
+    Laplacian pyramid (multiband) blending (blend_method: multiband)
+
+    Within a block every pixel is assigned to the tile with the largest feather weight (seam),
+    and the seam masks are smoothed band by band as in Burt & Adelson.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(config)
+        self.num_bands = config.get("stitching", {}).get("multiband_bands", 5)
+
+    @property
+    def margin(self) -> int:
+        return 2 ** (self.num_bands + 1)
+
+    def _blend_block(self, block, tiles, images, positions, weight_mask, canvas_w, canvas_h):
+        bx0, by0, bx1, by1 = block
+        margin = self.margin
+        # 余白を含めた処理領域
+        rx0, ry0 = max(0, bx0 - margin), max(0, by0 - margin)
+        rx1, ry1 = min(canvas_w, bx1 + margin), min(canvas_h, by1 + margin)
+        region_w, region_h = rx1 - rx0, ry1 - ry0
+        num_bands = max(0, min(self.num_bands, int(np.log2(max(1, min(region_w, region_h)))) - 1))
+
+        region = (rx0, ry0, rx1, ry1)
+        crops = []
+        weights = []
+        for idx in tiles:
+            image_crop = self._tile_region(images[idx], positions[idx], region)
+            if image_crop is None:
+                continue
+            crops.append(image_crop)
+            weights.append(self._tile_region(weight_mask, positions[idx], region))
+
+        # 各画素を重みが最大のタイルに割り当てる (継ぎ目マスク)
+        weight_stack = np.stack(weights)
+        owner = np.argmax(weight_stack, axis=0)
+        covered = weight_stack.max(axis=0) > 0
+
+        blended_pyramid: Optional[List[np.ndarray]] = None
+        band_weights: Optional[List[np.ndarray]] = None
+        for tile_number, image_crop in enumerate(crops):
+            seam_mask = ((owner == tile_number) & covered).astype(np.float32)
+            laplacian = self._laplacian_pyramid(image_crop.astype(np.float32), num_bands)
+            gaussian = self._gaussian_pyramid(seam_mask, num_bands)
+            if blended_pyramid is None:
+                blended_pyramid = [band * mask[..., np.newaxis] for band, mask in zip(laplacian, gaussian)]
+                band_weights = gaussian
+            else:
+                for level in range(num_bands + 1):
+                    blended_pyramid[level] += laplacian[level] * gaussian[level][..., np.newaxis]
+                    band_weights[level] += gaussian[level]
+
+        eps = np.float32(1e-6)
+        for level in range(num_bands + 1):
+            blended_pyramid[level] /= band_weights[level][..., np.newaxis] + eps
+
+        result = blended_pyramid[-1]
+        for level in range(num_bands - 1, -1, -1):
+            band = blended_pyramid[level]
+            result = cv2.pyrUp(result, dstsize=(band.shape[1], band.shape[0])) + band
+
+        result = np.clip(result, 0, 255).astype(np.uint8)
+        return result[by0 - ry0 : by1 - ry0, bx0 - rx0 : bx1 - rx0], None
+
+    def _tile_region(
+        self, image: np.ndarray, position: Tuple[int, int], region: Tuple[int, int, int, int]
+    ) -> Optional[np.ndarray]:
+        """
+        Crop a tile (or its weight mask) to a canvas region
+
+        Parts of the region outside the tile are filled by replicating the tile border for images
+        (so the pyramid does not see artificial edges) and with zeros for weight masks.
+        """
+        tile_h, tile_w = image.shape[:2]
+        rect = self._intersection(position, tile_w, tile_h, region)
+        if rect is None:
+            return None
+
+        x, y = position
+        rx0, ry0, rx1, ry1 = region
+        cx0, cy0, cx1, cy1 = rect
+        crop = image[cy0 - y : cy1 - y, cx0 - x : cx1 - x]
+        border_type = cv2.BORDER_REPLICATE if image.ndim == 3 else cv2.BORDER_CONSTANT
+        return cv2.copyMakeBorder(crop, cy0 - ry0, ry1 - cy1, cx0 - rx0, rx1 - cx1, border_type, value=0)
+
+    @staticmethod
+    def _gaussian_pyramid(image: np.ndarray, levels: int) -> List[np.ndarray]:
+        pyramid = [image]
+        for _ in range(levels):
+            pyramid.append(cv2.pyrDown(pyramid[-1]))
+        return pyramid
+
+    @staticmethod
+    def _laplacian_pyramid(image: np.ndarray, levels: int) -> List[np.ndarray]:
+        pyramid = []
+        current = image
+        for _ in range(levels):
+            down = cv2.pyrDown(current)
+            up = cv2.pyrUp(down, dstsize=(current.shape[1], current.shape[0]))
+            pyramid.append(current - up)
+            current = down
+        pyramid.append(current)
+        return pyramid
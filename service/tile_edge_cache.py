@@ -0,0 +1,104 @@
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+import threading
+import weakref
+
+import numpy as np
+
+
+class TileEdgeCache:
+    """
+    タイル画像の辺ごとの前処理済みデータ (重複領域のスペクトル・特徴点など) を保持するキャッシュ
+    - キーはタイル画像のオブジェクトと任意のキーの組。タイル画像が破棄されると該当エントリも削除する
+      (idの再利用で別の画像のデータを返さないようにするため)
+    - 合計サイズがmax_bytesを超えた場合は、最も長く使われていないエントリから削除する
+    - max_bytesが0の場合はキャッシュしない
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[int, Hashable], Tuple[Any, int]]" = OrderedDict()
+        self._owner_keys: Dict[int, set] = {}
+        self._finalizers: Dict[int, weakref.finalize] = {}
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, owner: np.ndarray, key: Hashable) -> Optional[Any]:
+        """ownerに対するkeyのエントリを取得する。なければNone"""
+        entry_key = (id(owner), key)
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(entry_key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, owner: np.ndarray, key: Hashable, value: Any, nbytes: Optional[int] = None):
+        """ownerに対するkeyのエントリを登録する"""
+        if nbytes is None:
+            nbytes = value.nbytes
+        if nbytes > self.max_bytes:
+            return
+
+        owner_id = id(owner)
+        entry_key = (owner_id, key)
+        with self._lock:
+            if owner_id not in self._finalizers:
+                try:
+                    self._finalizers[owner_id] = weakref.finalize(owner, self._discard_owner, owner_id)
+                except TypeError:
+                    # 弱参照できないオブジェクトは寿命を追えないためキャッシュしない
+                    return
+            if entry_key in self._entries:
+                self._remove_locked(entry_key)
+            self._entries[entry_key] = (value, nbytes)
+            self._owner_keys.setdefault(owner_id, set()).add(entry_key)
+            self.total_bytes += nbytes
+
+            while self.total_bytes > self.max_bytes and self._entries:
+                self._remove_locked(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            for finalizer in self._finalizers.values():
+                finalizer.detach()
+            self._entries.clear()
+            self._owner_keys.clear()
+            self._finalizers.clear()
+            self.total_bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def _remove_locked(self, entry_key: Tuple[int, Hashable]):
+        _, nbytes = self._entries.pop(entry_key)
+        self.total_bytes -= nbytes
+        owner_id = entry_key[0]
+        keys = self._owner_keys.get(owner_id)
+        if keys is not None:
+            keys.discard(entry_key)
+            if not keys:
+                del self._owner_keys[owner_id]
+                finalizer = self._finalizers.pop(owner_id, None)
+                if finalizer is not None:
+                    finalizer.detach()
+
+    def _discard_owner(self, owner_id: int):
+        """タイル画像が破棄されたときに、その画像のエントリをすべて削除する"""
+        with self._lock:
+            self._finalizers.pop(owner_id, None)
+            for entry_key in list(self._owner_keys.pop(owner_id, ())):
+                entry = self._entries.pop(entry_key, None)
+                if entry is not None:
+                    self.total_bytes -= entry[1]
@@ -0,0 +1,146 @@
+from typing import Dict, Any
+import serial
+import time
+
+from mock.test_env import test_env
+from application.event_bus import event_bus, ErrorEvent
+
+
+def create_z_axis_service(config: Dict[str, Any]):
+    """
+    Z軸 (フォーカス) のサービスを作成する
+    モックでは常にテスト環境のZ軸を使う。実機では z_axis.enabled がfalseならNone
+    """
+    if config["mock"]:
+        return MockZAxisService(config)
+    if not config.get("z_axis", {}).get("enabled", False):
+        return None
+    return ZAxisService(config)
+
+
+class MockZAxisService:
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.z_min = test_env.min_z
+        self.z_max = test_env.max_z
+        self.pulses_per_mm = config.get("z_axis", {}).get("pulses_per_mm", 10000)
+
+    def move_to(self, z: float, is_relative: bool = False):
+        # 実機と同じくパルス単位で移動する
+        z = round(z * self.pulses_per_mm) / self.pulses_per_mm
+        if not test_env.move_z(z, is_relative):
+            raise RuntimeError(f"Z position {z} out of range")
+
+    def get_current_position(self) -> float:
+        return test_env.get_z()
+
+    def is_valid_movement(self, z: float, is_relative: bool = False) -> bool:
+        if is_relative:
+            z += self.get_current_position()
+        return self.z_min <= z <= self.z_max
+
+
+class ZAxisService:
+    """
+    Z軸 (フォーカス) のステージコントローラ
+    XYのGSC-02とは別のコントローラ (GSC-01、またはHSC-103/SHRC-203などの1軸) を z_axis.com_port で使う
+    コマンドは軸番号を指定する形式 (M:1+P100、Q:の応答は軸ごとの位置をカンマで区切ったもの)
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        z_config = config["z_axis"]
+        self.axis = z_config.get("axis", 1)
+        self.pulses_per_mm = z_config.get("pulses_per_mm", 10000)
+        self.z_min = z_config.get("z_min", -1.0)
+        self.z_max = z_config.get("z_max", 1.0)
+        self.move_timeout_s = z_config.get("move_timeout_s", 10.0)
+        self.ser = None
+        self.connect()
+
+    def connect(self):
+        """Z軸コントローラへのシリアル接続を確立"""
+        z_config = self.config["z_axis"]
+        try:
+            self.ser = serial.Serial(
+                port=z_config["com_port"],
+                baudrate=z_config.get("baud_rate", 9600),
+                bytesize=serial.EIGHTBITS,
+                parity=serial.PARITY_NONE,
+                stopbits=serial.STOPBITS_ONE,
+                timeout=z_config.get("timeout", 5.0),
+                rtscts=True  # Hardware flow control
+            )
+            print(f"Connected to Z axis on {z_config['com_port']}")
+        except serial.SerialException as e:
+            error_msg = f"Failed to connect to Z axis controller on {z_config['com_port']}: {str(e)}"
+            event_bus.publish(ErrorEvent(error_message=error_msg))
+            raise RuntimeError(error_msg) from e
+
+    def _send_command(self, command: str):
+        """コマンドを送信"""
+        cmd = command + '\r\n'
+        self.ser.write(cmd.encode())
+
+    def _read_response(self) -> str:
+        """レスポンスを読み取り"""
+        return self.ser.readline().decode().strip()
+
+    def _wait_until_ready(self, poll_interval: float = 0.02):
+        """
+        移動が終わるまで待機（!:コマンドでポーリング）
+        move_timeout_s 以内にReadyにならない場合 (コントローラが応答しない場合を含む) は停止を送信してエラー
+        """
+        deadline = time.perf_counter() + self.move_timeout_s
+        while True:
+            self._send_command('!:')
+            if 'R' in self._read_response():
+                return
+            if time.perf_counter() > deadline:
+                self._send_command(f'L:{self.axis}')
+                error_msg = f"Z axis did not become ready within {self.move_timeout_s} s"
+                event_bus.publish(ErrorEvent(error_message=error_msg))
+                raise RuntimeError(error_msg)
+            time.sleep(poll_interval)
+
+    def move_to(self, z: float, is_relative: bool = False):
+        """
+        指定位置に移動（mmで指定）。移動が終わるまで戻らない
+        現在位置を取得できない場合や移動先が範囲外の場合は移動せずにエラー
+        """
+        current = self.get_current_position()
+        target = current + z if is_relative else z
+        if not self.z_min <= target <= self.z_max:
+            error_msg = f"Z position {target} out of range ({self.z_min} to {self.z_max})"
+            event_bus.publish(ErrorEvent(error_message=error_msg))
+            raise RuntimeError(error_msg)
+        z = target - current
+        pulses = int(round(z * self.pulses_per_mm))
+        if pulses == 0:
+            return
+        direction = '+' if pulses > 0 else '-'
+        self._send_command(f'M:{self.axis}{direction}P{abs(pulses)}')
+        self._read_response()
+        self._send_command('G:')
+        self._read_response()
+        self._wait_until_ready()
+
+    def get_current_position(self) -> float:
+        """
+        現在位置を取得（Q:コマンド）
+        取得できない場合はエラー (位置が分からないまま相対移動に変換すると、目標の絶対位置だけ動いてしまうため)
+        """
+        try:
+            self._send_command('Q:')
+            parts = self._read_response().split(',')
+            return int(parts[self.axis - 1].replace(' ', '')) / self.pulses_per_mm
+        except Exception as e:
+            error_msg = f"Failed to get Z position: {str(e)}"
+            event_bus.publish(ErrorEvent(error_message=error_msg))
+            raise RuntimeError(error_msg) from e
+
+    def is_valid_movement(self, z: float, is_relative: bool = False) -> bool:
+        """指定座標への移動が範囲内かチェックする"""
+        if is_relative:
+            z += self.get_current_position()
+        return self.z_min <= z <= self.z_max
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Behaviour checks for the EventBus delivery policies and shared frame lifetimes
+"""
+
+import threading
+import time
+
+from application.event_bus import EventBus, ImageCaptureEvent, PositionUpdateEvent, StitchingProgressEvent
+from enums.enums import DeliveryPolicy, DispatchMode, OverflowPolicy, ProgressStatus
+from utils.frame_pool import FramePool
+
+
+def publish_pooled_frame(bus: EventBus, pool: FramePool, value: int):
+    """Publish a pooled frame the way ImageService.capture does, then hand it back like its caller"""
+    frame = pool.wrap(pool.acquire())
+    frame._buffer[...] = value
+    bus.publish(ImageCaptureEvent(image_data=frame.data, timestamp=frame.timestamp, frame=frame))
+    frame.release()
+    return frame
+
+
+def test_latest_only_keeps_conflated_frame():
+    """A frame held back for a busy latest-only subscriber must not return to the pool before delivery"""
+    bus = EventBus()
+    bus.set_delivery_policy(ImageCaptureEvent, DeliveryPolicy.LATEST_ONLY)
+    pool = FramePool(max_size=2, shape=(4, 4))
+
+    entered = threading.Event()
+    gate = threading.Event()
+    seen = []
+
+    def slow_subscriber(event):
+        seen.append(int(event.image_data[0, 0]))
+        entered.set()
+        gate.wait(5.0)
+
+    bus.subscribe(ImageCaptureEvent, slow_subscriber)
+
+    # The first frame keeps the subscriber busy on another thread
+    publisher = threading.Thread(target=publish_pooled_frame, args=(bus, pool, 1))
+    publisher.start()
+    assert entered.wait(5.0)
+
+    # The second and third frames are held back; the second is replaced by the third
+    conflated = publish_pooled_frame(bus, pool, 2)
+    pending = publish_pooled_frame(bus, pool, 3)
+    assert conflated.is_released, "the replaced frame should go back to the pool"
+    assert not pending.is_released, "the pending frame must stay referenced until delivered"
+
+    # The next capture reuses a pooled buffer; it must not be the pending frame's buffer
+    buffer = pool.acquire()
+    buffer[...] = 99
+
+    gate.set()
+    publisher.join(5.0)
+
+    assert seen == [1, 3], seen
+    assert pending.is_released, "the pending frame should be returned after delivery"
+    stats = bus.get_stats()["ImageCaptureEvent"]
+    assert stats["conflated"] == 1, stats
+
+
+def test_deliver_all_sync():
+    """DELIVER_ALL calls every subscriber on the publishing thread, in order"""
+    bus = EventBus()
+    seen = []
+    bus.subscribe(PositionUpdateEvent, lambda event: seen.append(("a", event.x, threading.current_thread())))
+    bus.subscribe(PositionUpdateEvent, lambda event: seen.append(("b", event.x, threading.current_thread())))
+
+    for x in range(3):
+        bus.publish(PositionUpdateEvent(x=x, y=0))
+
+    assert [(name, x) for name, x, _ in seen] == [("a", 0), ("b", 0), ("a", 1), ("b", 1), ("a", 2), ("b", 2)]
+    assert all(thread is threading.current_thread() for _, _, thread in seen)
+
+
+def run_overflow(policy: OverflowPolicy):
+    """Publish 10 events to an ASYNC subscriber with a queue of 3 that is blocked on the first event"""
+    bus = EventBus()
+    bus.set_dispatch_mode(DispatchMode.ASYNC, queue_size=3, overflow_policy=policy)
+    entered = threading.Event()
+    gate = threading.Event()
+    seen = []
+
+    def subscriber(event):
+        entered.set()
+        gate.wait(5.0)
+        seen.append(event.x)
+
+    bus.subscribe(PositionUpdateEvent, subscriber)
+    bus.publish(PositionUpdateEvent(x=0, y=0))
+    assert entered.wait(5.0)
+
+    if policy == OverflowPolicy.BLOCK:
+        publisher = threading.Thread(
+            target=lambda: [bus.publish(PositionUpdateEvent(x=x, y=0)) for x in range(1, 10)]
+        )
+        publisher.start()
+        publisher.join(0.2)
+        assert publisher.is_alive(), "BLOCK should hold the publisher while the queue is full"
+        gate.set()
+        publisher.join(5.0)
+    else:
+        for x in range(1, 10):
+            bus.publish(PositionUpdateEvent(x=x, y=0))
+        gate.set()
+
+    assert bus.flush(5.0)
+    stats = bus.get_stats()["PositionUpdateEvent"]
+    bus.set_dispatch_mode(DispatchMode.SYNC)
+    return seen, stats
+
+
+def test_async_overflow_policies():
+    seen, stats = run_overflow(OverflowPolicy.DROP_OLDEST)
+    assert seen == [0, 7, 8, 9], seen
+    assert stats["dropped"] == 6, stats
+
+    seen, stats = run_overflow(OverflowPolicy.DROP_NEWEST)
+    assert seen == [0, 1, 2, 3], seen
+    assert stats["dropped"] == 6, stats
+
+    seen, stats = run_overflow(OverflowPolicy.BLOCK)
+    assert seen == list(range(10)), seen
+    assert stats.get("dropped", 0) == 0, stats
+
+
+def test_async_keeps_completion_events():
+    """Completion events are queued even when the queue is full"""
+    bus = EventBus()
+    bus.set_dispatch_mode(DispatchMode.ASYNC, queue_size=1, overflow_policy=OverflowPolicy.DROP_NEWEST)
+    gate = threading.Event()
+    seen = []
+    bus.subscribe(StitchingProgressEvent, lambda event: (gate.wait(5.0), seen.append(event.status)))
+
+    for _ in range(3):
+        bus.publish(StitchingProgressEvent(progress_message="working"))
+    bus.publish(StitchingProgressEvent(progress_message="done", status=ProgressStatus.COMPLETED))
+    gate.set()
+
+    assert bus.flush(5.0)
+    bus.set_dispatch_mode(DispatchMode.SYNC)
+    assert seen[-1] == ProgressStatus.COMPLETED, seen
+
+
+def test_restart_while_callback_runs_keeps_one_worker():
+    """Switching SYNC and back to ASYNC during a slow callback must not start a second worker on the queue"""
+    bus = EventBus()
+    bus.set_dispatch_mode(DispatchMode.ASYNC)
+    entered = threading.Event()
+    gate = threading.Event()
+    seen = []
+    lock = threading.Lock()
+    active = [0]
+    overlapped = []
+
+    def subscriber(event):
+        with lock:
+            active[0] += 1
+            overlapped.append(active[0] > 1)
+        entered.set()
+        gate.wait(5.0)
+        seen.append(event.x)
+        with lock:
+            active[0] -= 1
+
+    bus.subscribe(PositionUpdateEvent, subscriber)
+    subscription = bus._subscribers[PositionUpdateEvent][0]
+    bus.publish(PositionUpdateEvent(x=0, y=0))
+    assert entered.wait(5.0)
+    first_worker = subscription.worker
+
+    # The worker is still inside the callback when it is told to stop (join times out after 1 s)
+    bus.set_dispatch_mode(DispatchMode.SYNC)
+    bus.set_dispatch_mode(DispatchMode.ASYNC)
+    assert subscription.worker is first_worker, "the running worker should be resumed, not replaced"
+    for x in range(1, 4):
+        bus.publish(PositionUpdateEvent(x=x, y=0))
+    gate.set()
+
+    assert bus.flush(5.0)
+    assert seen == [0, 1, 2, 3], seen
+    assert not any(overlapped), "callbacks ran on two workers at once"
+    bus.set_dispatch_mode(DispatchMode.SYNC)
+    first_worker.join(5.0)
+    assert subscription.worker is None and not first_worker.is_alive()
+
+
+def check_rate_limited_trailing(mode: DispatchMode):
+    """Events suppressed by the rate limit are not lost: the newest one is delivered when the window expires"""
+    bus = EventBus()
+    bus.set_dispatch_mode(mode)
+    bus.set_delivery_policy(ImageCaptureEvent, DeliveryPolicy.RATE_LIMITED, max_rate_hz=20)
+    pool = FramePool(max_size=4, shape=(4, 4))
+    seen = []
+    bus.subscribe(ImageCaptureEvent, lambda event: seen.append((int(event.image_data[0, 0]), time.monotonic())))
+
+    frames = [publish_pooled_frame(bus, pool, value) for value in range(10)]
+    assert bus.flush(5.0)
+    assert [value for value, _ in seen] == [0], seen
+    assert not frames[-1].is_released, "the held back frame must stay referenced until delivered"
+    assert all(frame.is_released for frame in frames[1:-1]), "superseded frames should go back to the pool"
+
+    time.sleep(0.2)
+    assert bus.flush(5.0)
+    assert [value for value, _ in seen] == [0, 9], seen
+    assert seen[1][1] - seen[0][1] >= 0.045, "the trailing event must still respect the rate limit"
+    assert frames[-1].is_released
+    stats = bus.get_stats()["ImageCaptureEvent"]
+    assert stats["dropped"] == 8, stats
+    bus.set_dispatch_mode(DispatchMode.SYNC)
+
+
+def test_rate_limited_delivers_trailing_event():
+    check_rate_limited_trailing(DispatchMode.SYNC)
+    check_rate_limited_trailing(DispatchMode.ASYNC)
+
+
+def test_unsubscribe_cancels_trailing_event():
+    bus = EventBus()
+    bus.set_delivery_policy(ImageCaptureEvent, DeliveryPolicy.RATE_LIMITED, max_rate_hz=20)
+    pool = FramePool(max_size=2, shape=(4, 4))
+    seen = []
+
+    def subscriber(event):
+        seen.append(int(event.image_data[0, 0]))
+
+    bus.subscribe(ImageCaptureEvent, subscriber)
+    publish_pooled_frame(bus, pool, 1)
+    held = publish_pooled_frame(bus, pool, 2)
+    bus.unsubscribe(ImageCaptureEvent, subscriber)
+
+    time.sleep(0.2)
+    assert seen == [1], seen
+    assert held.is_released, "the held back frame should go back to the pool on unsubscribe"
+
+
+if __name__ == "__main__":
+    print("Testing event bus...")
+    test_latest_only_keeps_conflated_frame()
+    test_deliver_all_sync()
+    test_async_overflow_policies()
+    test_async_keeps_completion_events()
+    test_restart_while_callback_runs_keeps_one_worker()
+    test_rate_limited_delivers_trailing_event()
+    test_unsubscribe_cancels_trailing_event()
+    print("✓ Event bus test completed!")
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Reference counting checks for shared camera frames and their buffer pool
+"""
+
+import threading
+
+import numpy as np
+
+from utils.frame import Frame
+from utils.frame_pool import FramePool
+
+
+def test_refcount():
+    """The buffer is returned only when the last reference is released"""
+    returned = []
+    frame = Frame(np.zeros((4, 4), np.uint8), release_callback=returned.append)
+
+    frame.acquire()
+    assert frame.refcount == 2
+    frame.release()
+    assert frame.refcount == 1 and not returned and not frame.is_released
+
+    frame.release()
+    assert frame.is_released and len(returned) == 1
+
+    # An extra release is ignored and does not return the buffer twice
+    frame.release()
+    assert len(returned) == 1
+
+
+def test_acquire_released_frame():
+    """A released frame cannot be acquired again or read"""
+    frame = Frame(np.zeros((4, 4), np.uint8))
+    frame.release()
+
+    for operation in (frame.acquire, lambda: frame.data):
+        try:
+            operation()
+        except RuntimeError:
+            continue
+        raise AssertionError("using a released frame should raise RuntimeError")
+
+
+def test_data_is_read_only():
+    frame = Frame(np.zeros((4, 4), np.uint8))
+    try:
+        frame.data[0, 0] = 1
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("frame data should be read-only")
+
+    copy = frame.copy()
+    copy[0, 0] = 1
+    assert frame.data[0, 0] == 0
+    frame.release()
+
+
+def test_pool_reuse():
+    """Released frames return their buffer to the pool, and the pool never grows beyond max_size"""
+    pool = FramePool(max_size=2, shape=(4, 4))
+    assert pool.get_stats()["allocations"] == 2
+
+    frames = [pool.wrap(pool.acquire()) for _ in range(3)]
+    stats = pool.get_stats()
+    assert stats["allocations"] == 3 and stats["reuses"] == 2 and stats["free"] == 0, stats
+
+    buffers = [frame._buffer for frame in frames]
+    for frame in frames:
+        frame.release()
+    assert pool.get_stats()["free"] == 2
+
+    reused = pool.acquire()
+    assert any(reused is buffer for buffer in buffers), "a returned buffer should be reused"
+
+
+def test_pool_shape_change():
+    """Buffers with the old shape are not returned to the pool after reset"""
+    pool = FramePool(max_size=2, shape=(4, 4))
+    frame = pool.wrap(pool.acquire())
+    pool.reset((8, 8))
+    frame.release()
+
+    stats = pool.get_stats()
+    assert stats["shape"] == (8, 8) and stats["free"] == 0, stats
+    assert pool.acquire().shape == (8, 8)
+
+
+def test_pool_without_shape():
+    """A pool created without a shape adopts the shape of the first returned buffer"""
+    pool = FramePool(max_size=2)
+    assert pool.acquire() is None
+
+    pool.wrap(np.zeros((6, 5, 3), np.uint8)).release()
+    assert pool.get_stats()["shape"] == (6, 5, 3)
+    assert pool.acquire().shape == (6, 5, 3)
+
+
+def test_concurrent_release():
+    """Many threads acquiring and releasing the same frame return its buffer exactly once"""
+    returned = []
+    frame = Frame(np.zeros((4, 4), np.uint8), release_callback=returned.append)
+    start = threading.Event()
+
+    def worker():
+        start.wait()
+        for _ in range(1000):
+            frame.acquire()
+            frame.release()
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    start.set()
+    for thread in threads:
+        thread.join()
+
+    assert frame.refcount == 1 and not returned
+    frame.release()
+    assert len(returned) == 1
+
+
+if __name__ == "__main__":
+    print("Testing frame pool...")
+    test_refcount()
+    test_acquire_released_frame()
+    test_data_is_read_only()
+    test_pool_reuse()
+    test_pool_shape_change()
+    test_pool_without_shape()
+    test_concurrent_release()
+    print("✓ Frame pool test completed!")
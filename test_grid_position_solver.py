@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Regression check for the global tile position solver
+
+Builds synthetic grids with known tile positions, injects wrong pairwise shifts
+(random, and biased like a repeated-pattern false match) and checks that the
+solved positions stay close to the truth and the wrong shifts are rejected.
+"""
+
+import numpy as np
+
+from service.grid_position_solver import GridPositionSolver, grid_neighbour_pairs
+from utils import config_loader
+
+
+def create_grid_measurements(grid_x: int, grid_y: int, outlier_rate: float, biased: bool, seed: int):
+    """Return (truth, nominal, measurements, neighbour_pairs, is_outlier) for a synthetic grid"""
+    rng = np.random.default_rng(seed)
+    nominal = np.array([(x * 1600.0, y * 1200.0) for y in range(grid_y) for x in range(grid_x)])
+    # Stage repeatability: tiles are a few pixels off their nominal position
+    truth = nominal + rng.normal(0, 2.0, nominal.shape)
+
+    pairs = grid_neighbour_pairs(grid_x, grid_y)
+    measurements = []
+    is_outlier = []
+    for ref_idx, idx, _ in pairs:
+        shift = truth[idx] - truth[ref_idx] + rng.normal(0, 0.3, 2)
+        outlier = rng.random() < outlier_rate
+        if outlier:
+            if biased:
+                shift += np.array([45.0, -20.0]) + rng.normal(0, 3.0, 2)
+            else:
+                angle = rng.uniform(0, 2 * np.pi)
+                shift += rng.uniform(20, 100) * np.array([np.cos(angle), np.sin(angle)])
+        measurements.append((ref_idx, idx, shift[0], shift[1], rng.uniform(0.3, 1.0)))
+        is_outlier.append(outlier)
+    return truth, nominal, measurements, [(ref_idx, idx) for ref_idx, idx, _ in pairs], np.array(is_outlier)
+
+
+def check_outliers(name: str, grid_x: int, grid_y: int, outlier_rate: float, biased: bool, max_error_px: float):
+    config = config_loader.load_config("settings/config.yaml")
+    solver = GridPositionSolver(config)
+
+    for seed in range(3):
+        truth, nominal, measurements, pairs, is_outlier = create_grid_measurements(
+            grid_x, grid_y, outlier_rate, biased, seed
+        )
+        positions, inliers = solver.solve(nominal, measurements, pairs)
+
+        # The global translation is arbitrary, so compare positions relative to their mean
+        errors = np.linalg.norm((positions - positions.mean(axis=0)) - (truth - truth.mean(axis=0)), axis=1)
+        missed = int(np.sum(is_outlier & inliers))
+        print(f"  {name} (seed {seed}): max error {errors.max():.2f} px, "
+              f"{int(is_outlier.sum())} outliers, {missed} kept")
+
+        assert missed == 0, f"{name}: {missed} wrong shifts were kept"
+        assert errors.max() < max_error_px, f"{name}: max error {errors.max():.2f} px"
+
+
+def test_random_outliers():
+    """5% of the shifts are random wrong matches on a 20x20 grid"""
+    check_outliers("20x20, 5% random outliers", 20, 20, 0.05, biased=False, max_error_px=3.0)
+
+
+def test_biased_outliers():
+    """6% of the shifts are the same wrong match (repeated pattern) on a 60x60 grid"""
+    check_outliers("60x60, 6% biased outliers", 60, 60, 0.06, biased=True, max_error_px=3.0)
+
+
+def test_no_measurements():
+    """Without any measurement every tile stays at its nominal position"""
+    config = config_loader.load_config("settings/config.yaml")
+    solver = GridPositionSolver(config)
+    nominal = np.array([(x * 1600.0, y * 1200.0) for y in range(3) for x in range(3)])
+    pairs = [(ref_idx, idx) for ref_idx, idx, _ in grid_neighbour_pairs(3, 3)]
+
+    positions, inliers = solver.solve(nominal, [], pairs)
+
+    assert len(inliers) == 0
+    assert np.allclose(positions, nominal)
+
+
+if __name__ == "__main__":
+    print("Testing global tile position solver...")
+    test_random_outliers()
+    test_biased_outliers()
+    test_no_measurements()
+    print("✓ Global tile position solver test completed!")
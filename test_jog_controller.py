@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+State transition checks for the keyboard JOG controller
+
+Uses a simulated stage that keeps moving for a while after a stop command (deceleration),
+so the controller has to wait for Ready before sending the next JOG.
+"""
+
+import threading
+import time
+
+from application.event_bus import event_bus, ErrorEvent
+from application.jog_controller import JogController
+from enums.enums import JogState
+
+
+class SimulatedStage:
+    """Records the commands sent to the stage; a JOG sent while decelerating is recorded as an error"""
+
+    def __init__(self, decel_s: float = 0.1):
+        self.decel_s = decel_s
+        self.commands = []
+        self.errors = []
+        self.fail_jog = False
+        self._jogging = False
+        self._stopped_at = None
+        self._lock = threading.Lock()
+
+    def is_moving(self) -> bool:
+        with self._lock:
+            return self._jogging or (self._stopped_at is not None and time.perf_counter() - self._stopped_at < self.decel_s)
+
+    def send_jog(self, degree: float):
+        if self.fail_jog:
+            raise RuntimeError("no response")
+        if self.is_moving():
+            self.errors.append(f"jog {degree} sent while moving")
+        with self._lock:
+            self._jogging = True
+            self.commands.append(f"jog {degree:g}")
+
+    def stop_move(self):
+        with self._lock:
+            if self._jogging:
+                self._stopped_at = time.perf_counter()
+            self._jogging = False
+            self.commands.append("stop")
+
+
+def create_controller(decel_s: float = 0.1):
+    stage = SimulatedStage(decel_s)
+    config = {"stage": {"jog": {"poll_interval_s": 0.01, "stop_timeout_s": 2.0}}}
+    controller = JogController(config, stage)
+    controller.start()
+    return controller, stage
+
+
+def wait_for(predicate, timeout: float = 2.0) -> bool:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.005)
+    return predicate()
+
+
+def test_jog_and_stop():
+    """IDLE -> JOGGING -> STOPPING -> IDLE"""
+    controller, stage = create_controller()
+    try:
+        assert controller.state == JogState.IDLE and not controller.is_moving
+
+        controller.jog(90)
+        assert controller.is_moving, "a queued JOG already counts as moving"
+        assert wait_for(lambda: controller.state == JogState.JOGGING)
+        assert controller.direction == 90
+
+        controller.stop_jog()
+        assert wait_for(lambda: controller.state == JogState.STOPPING)
+        assert controller.is_moving, "the stage is still decelerating"
+        assert controller.wait_idle()
+        assert controller.state == JogState.IDLE and controller.direction is None and not controller.is_moving
+        assert stage.commands == ["jog 90", "stop"], stage.commands
+    finally:
+        controller.shutdown()
+
+
+def test_repeated_jog_is_sent_once():
+    """Key repeat in the same direction does not resend the JOG"""
+    controller, stage = create_controller()
+    try:
+        for _ in range(5):
+            controller.jog(0)
+        assert wait_for(lambda: controller.state == JogState.JOGGING)
+        controller.stop_jog()
+        assert controller.wait_idle()
+        assert stage.commands == ["jog 0", "stop"], stage.commands
+    finally:
+        controller.shutdown()
+
+
+def test_direction_change_waits_for_stop():
+    """Changing direction stops first and sends the new JOG only after deceleration has finished"""
+    controller, stage = create_controller()
+    try:
+        controller.jog(0)
+        assert wait_for(lambda: controller.state == JogState.JOGGING)
+        controller.jog(180)
+        assert wait_for(lambda: controller.direction == 180)
+        assert controller.state == JogState.JOGGING
+        assert stage.commands == ["jog 0", "stop", "jog 180"], stage.commands
+        assert not stage.errors, stage.errors
+    finally:
+        controller.shutdown()
+
+
+def test_stop_while_decelerating_cancels_jog():
+    """A stop requested while waiting for deceleration cancels the JOG that was waiting"""
+    controller, stage = create_controller(decel_s=0.3)
+    try:
+        controller.jog(0)
+        assert wait_for(lambda: controller.state == JogState.JOGGING)
+        controller.jog(90)
+        assert wait_for(lambda: controller.state == JogState.STOPPING)
+        controller.stop_jog()
+        assert controller.wait_idle()
+        assert stage.commands == ["jog 0", "stop"], stage.commands
+    finally:
+        controller.shutdown()
+
+
+def test_stop_when_idle_sends_nothing():
+    controller, stage = create_controller()
+    try:
+        controller.stop_jog()
+        assert controller.wait_idle()
+        assert stage.commands == []
+    finally:
+        controller.shutdown()
+
+
+def test_failed_jog_stops_stage():
+    """A failed command publishes an error, sends a stop and returns to IDLE once the stage is stopped"""
+    controller, stage = create_controller()
+    errors = []
+
+    def on_error(event):
+        errors.append(event.error_message)
+
+    event_bus.subscribe(ErrorEvent, on_error)
+    try:
+        stage.fail_jog = True
+        controller.jog(270)
+        assert wait_for(lambda: errors)
+        assert controller.wait_idle()
+        assert controller.state == JogState.IDLE
+        assert stage.commands == ["stop"], stage.commands
+        assert "Jog command failed" in errors[0], errors
+    finally:
+        event_bus.unsubscribe(ErrorEvent, on_error)
+        controller.shutdown()
+
+
+def test_shutdown_stops_jog():
+    controller, stage = create_controller()
+    controller.jog(90)
+    assert wait_for(lambda: controller.state == JogState.JOGGING)
+    controller.shutdown()
+    assert stage.commands == ["jog 90", "stop"], stage.commands
+    assert controller.latency_stats()["jog"]["count"] == 1
+
+
+if __name__ == "__main__":
+    print("Testing jog controller...")
+    test_jog_and_stop()
+    test_repeated_jog_is_sent_once()
+    test_direction_change_waits_for_stop()
+    test_stop_while_decelerating_cancels_jog()
+    test_stop_when_idle_sends_nothing()
+    test_failed_jog_stops_stage()
+    test_shutdown_stops_jog()
+    print("✓ Jog controller test completed!")
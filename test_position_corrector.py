@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Regression check for the closed-loop stage position correction
+
+Simulates a stage whose actual position differs from the commanded one depending on the
+direction of the last move on each axis (backlash), and checks that the learned errors
+bring the tiles onto their target positions.
+"""
+
+from service.position_corrector import PositionCorrector
+from utils import config_loader
+
+# Stage error (actual - commanded, mm) by axis and direction of the last move
+STAGE_ERROR = {"x": {1: 0.02, -1: -0.01}, "y": {1: 0.004, -1: 0.004}}
+
+
+def create_corrector(gain: float = 0.5) -> PositionCorrector:
+    config = config_loader.load_config("settings/config.yaml")
+    closed_loop = config["stitching"].setdefault("closed_loop", {})
+    closed_loop.update({"enabled": True, "gain": gain, "max_error_mm": 0.1})
+    return PositionCorrector(config)
+
+
+def zigzag_targets(grid_x: int, grid_y: int):
+    targets = []
+    for y in range(grid_y):
+        columns = range(grid_x) if y % 2 == 0 else reversed(range(grid_x))
+        targets.extend((x * 1.0, -y * 0.7) for x in columns)
+    return targets
+
+
+def scan(corrector: PositionCorrector, targets):
+    """Visit the targets and return the position error of each tile (actual - target, mm)"""
+    errors = []
+    previous = (0.0, 0.0)
+    for target in targets:
+        commanded, directions = corrector.command(previous, target)
+        actual = tuple(
+            commanded[index] + STAGE_ERROR[axis][directions[index]] for index, axis in enumerate(corrector.AXES)
+        )
+        corrector.update(directions, (actual[0] - commanded[0], actual[1] - commanded[1]))
+        errors.append((actual[0] - target[0], actual[1] - target[1]))
+        previous = commanded
+    return errors
+
+
+def test_learns_direction_dependent_error():
+    corrector = create_corrector()
+    targets = zigzag_targets(5, 4)
+    errors = scan(corrector, targets)
+
+    # Only the first move in each direction is uncorrected: the first tile, the first -y move
+    # (row change) and the first -x move. Every later tile lands on its target
+    uncorrected = [index for index, (dx, dy) in enumerate(errors) if abs(dx) > 1e-9 or abs(dy) > 1e-9]
+    print(f"  uncorrected tiles: {uncorrected}")
+    assert uncorrected == [0, 5, 6], uncorrected
+
+    backlash = corrector.backlash()
+    assert abs(backlash["x"] - 0.03) < 1e-9, backlash
+    assert abs(backlash["y"]) < 1e-9, backlash
+
+
+def test_direction_of_unmoved_axis_is_kept():
+    """An axis that does not move keeps the direction (and the error) of its last move"""
+    corrector = create_corrector()
+    _, directions = corrector.command((0.0, 0.0), (-1.0, -1.0))
+    assert directions == (-1, -1)
+    _, directions = corrector.command((-1.0, -1.0), (0.0, -1.0))
+    assert directions == (1, -1)
+
+
+def test_rejects_outliers():
+    """Errors larger than max_error_mm are treated as registration errors and not learned"""
+    corrector = create_corrector()
+    assert corrector.update((1, 1), (0.01, 0.0))
+    assert not corrector.update((1, 1), (0.5, 0.0))
+    commanded, _ = corrector.command((0.0, 0.0), (1.0, 0.0))
+    assert abs(commanded[0] - 0.99) < 1e-9, commanded
+
+
+def test_moving_average():
+    """After the first measurement the error is averaged with the configured gain"""
+    corrector = create_corrector(gain=0.25)
+    corrector.update((1, 1), (0.02, 0.0))
+    corrector.update((1, 1), (0.06, 0.0))
+    commanded, _ = corrector.command((0.0, 0.0), (1.0, 0.0))
+    assert abs(commanded[0] - (1.0 - 0.03)) < 1e-9, commanded
+
+    corrector.reset()
+    assert corrector.command((0.0, 0.0), (1.0, 0.0))[0] == (1.0, 0.0)
+    assert corrector.backlash() == {"x": None, "y": None}
+
+
+if __name__ == "__main__":
+    print("Testing position corrector...")
+    test_learns_direction_dependent_error()
+    test_direction_of_unmoved_axis_is_kept()
+    test_rejects_outliers()
+    test_moving_average()
+    print("✓ Position corrector test completed!")
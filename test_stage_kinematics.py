@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Regression check for the stage motion model and its calibration
+
+Checks the trapezoidal move times against hand-computed values, and that StageCalibrator
+recovers known speed, acceleration and overhead parameters from simulated timed moves.
+"""
+
+import os
+import tempfile
+
+import numpy as np
+
+from enums.enums import SpeedLevel
+from service.stage_calibrator import StageCalibrator
+from service.stage_kinematics import AxisProfile, StageKinematics
+from utils import config_loader
+
+
+def load_config(calibration_file: str):
+    config = config_loader.load_config("settings/config.yaml")
+    config["stage"]["calibration"]["file"] = calibration_file
+    return config
+
+
+class SimulatedStage:
+    """Stage whose timed moves follow known axis profiles plus a fixed overhead and timing noise"""
+
+    def __init__(self, profiles, overheads, pulses_per_mm: float, noise_s: float = 0.003, seed: int = 0):
+        self.profiles = profiles
+        self.overheads = overheads
+        self.pulses_per_mm = pulses_per_mm
+        self.noise_s = noise_s
+        self.rng = np.random.default_rng(seed)
+        self.position = [0.0, 0.0]
+        self.speed_level = SpeedLevel.S2
+
+    def change_speed(self, level):
+        self.speed_level = level
+
+    def get_current_position(self):
+        return tuple(self.position)
+
+    def is_valid_movement(self, x, y, is_relative=True):
+        return -50 <= x <= 50 and -50 <= y <= 50
+
+    def timed_move(self, dx, dy):
+        axis = "x" if dx else "y"
+        distance = round(abs(dx or dy) * self.pulses_per_mm) / self.pulses_per_mm
+        self.position[0] += dx
+        self.position[1] += dy
+        return float(self.profiles[axis].move_time(distance)) + self.overheads[axis] + self.rng.normal(0, self.noise_s)
+
+
+def test_axis_move_time():
+    """Trapezoidal and triangular moves match hand-computed times"""
+    profile = AxisProfile(500, 5000, 0.2, 1000)
+
+    # Accelerating to 5000 pps and back takes (500 + 5000) * 0.2 = 1100 pulses (1.1 mm) and 0.4 s
+    assert np.isclose(profile.ramp_distance_mm, 0.55)
+    assert np.isclose(profile.move_time(1.1), 0.4)
+    # A long move cruises the rest at 5000 pps
+    assert np.isclose(profile.move_time(10.0), 0.4 + (10000 - 1100) / 5000)
+    # A short move never reaches the maximum speed: 500 t + 11250 t^2 = 100 pulses per half
+    half = (-500 + np.sqrt(500**2 + 4 * 11250 * 100)) / (2 * 11250)
+    assert np.isclose(profile.move_time(0.2), 2 * half)
+
+    distances = np.linspace(0, 20, 401)
+    times = profile.move_time(distances)
+    assert np.all(np.diff(times) > 0), "move time must increase with distance"
+    assert np.allclose(profile.move_time(-distances), times), "move time must not depend on direction"
+
+    # Distance covered while accelerating matches the ramp distance
+    assert np.isclose(profile.distance_at(0.2), profile.ramp_distance_mm)
+    assert np.isclose(profile.distance_at(1.2) - profile.distance_at(0.2), 5.0)
+
+
+def test_from_speed():
+    """The start speed follows ControllerService.change_speed"""
+    assert AxisProfile.from_speed(5000, 0.2, 1000).start_speed == 500
+    assert AxisProfile.from_speed(200, 0.2, 1000).start_speed == 50
+    assert AxisProfile.from_speed(20, 0.2, 1000).start_speed == 2
+
+
+def test_stage_move_time():
+    """Both axes move at once, so the slower axis sets the time; no move costs nothing"""
+    with tempfile.TemporaryDirectory() as directory:
+        kinematics = StageKinematics(load_config(os.path.join(directory, "missing.json")))
+    assert not kinematics.calibrated
+
+    axis = kinematics.axes["x"]
+    overhead = kinematics.overhead_s
+    assert np.isclose(kinematics.move_time(3.0, 0.0), axis.move_time(3.0) + overhead)
+    assert np.isclose(kinematics.move_time(3.0, -1.0), axis.move_time(3.0) + overhead)
+    assert np.isclose(kinematics.move_time(-1.0, 3.0), axis.move_time(3.0) + overhead)
+    assert kinematics.move_time(0.0, 0.0) == 0.0
+
+    times = kinematics.move_time(np.array([0.0, 1.0, 2.0]), 0.5)
+    assert times.shape == (3,) and times[0] == kinematics.move_time(0.0, 0.5)
+
+
+def test_fit_recovers_parameters():
+    """StageCalibrator.fit recovers the speed, acceleration time and overhead of simulated moves"""
+    with tempfile.TemporaryDirectory() as directory:
+        config = load_config(os.path.join(directory, "stage.json"))
+        pulses_per_mm = config["stage"]["pulses_per_mm"]
+        truth = {"x": AxisProfile(380, 3800, 0.27, pulses_per_mm), "y": AxisProfile(620, 6200, 0.15, pulses_per_mm)}
+        overheads = {"x": 0.045, "y": 0.06}
+        stage = SimulatedStage(truth, overheads, pulses_per_mm)
+
+        result = StageCalibrator(config, stage).run()
+        assert result is not None
+        assert stage.speed_level == SpeedLevel.S2, "the previous speed level should be restored"
+
+        for axis, fit in result["speed_levels"]["s4"].items():
+            print(f"  {axis}: {fit['max_speed']:.0f} pps (true {truth[axis].max_speed:.0f}), "
+                  f"accel {fit['accel_time'] * 1000:.0f} ms (true {truth[axis].accel_time * 1000:.0f}), "
+                  f"overhead {fit['overhead_s'] * 1000:.1f} ms (true {overheads[axis] * 1000:.1f})")
+            assert abs(fit["max_speed"] / truth[axis].max_speed - 1) < 0.05, fit
+            assert abs(fit["accel_time"] - truth[axis].accel_time) < 0.03, fit
+            assert abs(fit["overhead_s"] - overheads[axis]) < 0.01, fit
+
+        # StageKinematics uses the saved result for the calibrated speed level
+        kinematics = StageKinematics(config)
+        assert kinematics.calibrated
+        assert np.isclose(kinematics.axes["y"].max_speed, result["speed_levels"]["s4"]["y"]["max_speed"])
+        distances = np.array([0.02, 0.3, 1.0, 4.0, 10.0])
+        error = kinematics.move_time(0.0, distances) - (truth["y"].move_time(distances) + overheads["y"])
+        assert np.all(np.abs(error) < 0.03), error
+
+
+def test_fit_rejects_insufficient_moves():
+    """Too few distinct distances, or instantaneous moves (mock stage), give no fit"""
+    with tempfile.TemporaryDirectory() as directory:
+        calibrator = StageCalibrator(load_config(os.path.join(directory, "stage.json")), None)
+    assert calibrator.fit([(1000, 0.5), (1000, 0.5), (5000, 1.3), (5000, 1.3)], 5000) is None
+    assert calibrator.fit([(pulses, 0.0) for pulses in (10, 200, 1000, 5000, 10000)], 5000) is None
+
+
+if __name__ == "__main__":
+    print("Testing stage kinematics...")
+    test_axis_move_time()
+    test_from_speed()
+    test_stage_move_time()
+    test_fit_recovers_parameters()
+    test_fit_rejects_insufficient_moves()
+    print("✓ Stage kinematics test completed!")
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Regression check for the overlap-block blenders
+
+The feather blender must give the same mosaic as a full-canvas weighted average, while
+leaving non-overlapped pixels untouched; the multiband blender must not change flat tiles.
+"""
+
+import numpy as np
+
+from service.tile_blender import FeatherBlender, MultiBandBlender
+
+TILE_W, TILE_H = 160, 120
+
+
+def linear_mask(height: int, width: int, feather_pixels: int = 20) -> np.ndarray:
+    """Per-tile weight: distance to the nearest edge / feather_pixels, clipped to 1"""
+
+    def edge_ramp(length: int) -> np.ndarray:
+        index = np.arange(length)
+        return np.minimum(np.minimum(index, length - 1 - index) / feather_pixels, 1.0).astype(np.float32)
+
+    return np.minimum.outer(edge_ramp(height), edge_ramp(width))
+
+
+def create_tiles(grid_x: int, grid_y: int, seed: int, flat: bool = False):
+    """Tiles with ~25% overlap and a few pixels of jitter; returns (images, positions, canvas_w, canvas_h)"""
+    rng = np.random.default_rng(seed)
+    images = []
+    positions = []
+    for y in range(grid_y):
+        for x in range(grid_x):
+            if flat:
+                images.append(np.full((TILE_H, TILE_W, 3), 128, dtype=np.uint8))
+            else:
+                images.append(rng.integers(0, 256, (TILE_H, TILE_W, 3), dtype=np.uint8))
+            positions.append((x * 120 + int(rng.integers(0, 5)), y * 90 + int(rng.integers(0, 5))))
+    canvas_w = max(px for px, _ in positions) + TILE_W
+    canvas_h = max(py for _, py in positions) + TILE_H
+    return images, positions, canvas_w, canvas_h
+
+
+def reference_feather(images, positions, canvas_w, canvas_h, weight_mask):
+    """Weighted average over the whole canvas, and the number of tiles covering each pixel"""
+    accumulated = np.zeros((canvas_h, canvas_w, 3), dtype=np.float32)
+    weights = np.zeros((canvas_h, canvas_w), dtype=np.float32)
+    coverage = np.zeros((canvas_h, canvas_w), dtype=np.uint8)
+    for image, (x, y) in zip(images, positions):
+        accumulated[y : y + TILE_H, x : x + TILE_W] += image.astype(np.float32) * weight_mask[:, :, np.newaxis]
+        weights[y : y + TILE_H, x : x + TILE_W] += weight_mask
+        coverage[y : y + TILE_H, x : x + TILE_W] += 1
+    valid = weights > 0
+    np.divide(accumulated, weights[:, :, np.newaxis], out=accumulated, where=valid[:, :, np.newaxis])
+    return accumulated.astype(np.uint8), coverage, valid
+
+
+def check_untouched(output, images, positions, coverage):
+    """Pixels covered by a single tile are that tile's pixels"""
+    for image, (x, y) in zip(images, positions):
+        single = coverage[y : y + TILE_H, x : x + TILE_W] == 1
+        assert np.array_equal(output[y : y + TILE_H, x : x + TILE_W][single], image[single])
+
+
+def test_feather_matches_full_canvas():
+    weight_mask = linear_mask(TILE_H, TILE_W)
+    for block_size in (64, 512):
+        blender = FeatherBlender({"stitching": {"blend_block_size": block_size, "blend_workers": 2}})
+        images, positions, canvas_w, canvas_h = create_tiles(3, 3, seed=block_size)
+        output = blender.blend(images, positions, [True] * len(images), canvas_w, canvas_h, weight_mask)
+        reference, coverage, valid = reference_feather(images, positions, canvas_w, canvas_h, weight_mask)
+
+        overlap = (coverage >= 2) & valid
+        difference = np.abs(output[overlap].astype(int) - reference[overlap].astype(int))
+        print(f"  feather, block {block_size}: {int(overlap.sum())} overlap pixels, max difference {difference.max()}")
+        assert difference.max() <= 1
+        check_untouched(output, images, positions, coverage)
+
+
+def test_failed_tiles_are_pasted_on_top():
+    weight_mask = linear_mask(TILE_H, TILE_W)
+    blender = FeatherBlender({"stitching": {"blend_block_size": 64}})
+    images, positions, canvas_w, canvas_h = create_tiles(2, 2, seed=1)
+    alignment_success = [True, False, True, True]
+    output = blender.blend(images, positions, alignment_success, canvas_w, canvas_h, weight_mask)
+
+    x, y = positions[1]
+    assert np.array_equal(output[y : y + TILE_H, x : x + TILE_W], images[1])
+
+
+def test_multiband_keeps_flat_tiles():
+    """Blending identical flat tiles gives the same flat image (no seams or ringing)"""
+    weight_mask = linear_mask(TILE_H, TILE_W)
+    blender = MultiBandBlender({"stitching": {"blend_block_size": 64, "multiband_bands": 4}})
+    images, positions, canvas_w, canvas_h = create_tiles(3, 2, seed=2, flat=True)
+    output = blender.blend(images, positions, [True] * len(images), canvas_w, canvas_h, weight_mask)
+
+    _, coverage, _ = reference_feather(images, positions, canvas_w, canvas_h, weight_mask)
+    covered = coverage > 0
+    difference = np.abs(output[covered].astype(int) - 128)
+    print(f"  multiband, flat tiles: max difference {difference.max()}")
+    assert difference.max() <= 1
+    check_untouched(output, images, positions, coverage)
+
+
+def test_multiband_stays_between_tiles():
+    """Across a seam between two flat tiles the result stays within their values"""
+    weight_mask = linear_mask(TILE_H, TILE_W)
+    blender = MultiBandBlender({"stitching": {"blend_block_size": 512, "multiband_bands": 4}})
+    images = [np.full((TILE_H, TILE_W, 3), 60, np.uint8), np.full((TILE_H, TILE_W, 3), 200, np.uint8)]
+    positions = [(0, 0), (100, 0)]
+    output = blender.blend(images, positions, [True, True], 260, TILE_H, weight_mask)
+
+    overlap = output[:, 100:160]
+    assert overlap.min() >= 59 and overlap.max() <= 201, (overlap.min(), overlap.max())
+    # The seam is smoothed: the row profile through the overlap rises monotonically
+    row = overlap[TILE_H // 2, :, 0].astype(int)
+    assert np.all(np.diff(row) >= -1), row
+
+
+if __name__ == "__main__":
+    print("Testing tile blenders...")
+    test_feather_matches_full_canvas()
+    test_failed_tiles_are_pasted_on_top()
+    test_multiband_keeps_flat_tiles()
+    test_multiband_stays_between_tiles()
+    print("✓ Tile blender test completed!")
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Regression check for the capture order planner
+
+The planner improves the caller's order (zigzag) and a nearest neighbour order with 2-opt
+and keeps the faster one, so the planned travel time must never exceed the zigzag time.
+"""
+
+import numpy as np
+
+from service.trajectory_planner import TrajectoryPlanner
+from utils import config_loader
+
+
+def zigzag_points(grid_x: int, grid_y: int, pitch=(1.05, 0.66)):
+    """Tile positions (mm) of a grid in zigzag order, like StitchingController.generate_trajectory"""
+    points = []
+    for y in range(grid_y):
+        columns = range(grid_x) if y % 2 == 0 else reversed(range(grid_x))
+        points.extend((x * pitch[0], -y * pitch[1]) for x in columns)
+    return points
+
+
+def check_not_worse(name: str, planner: TrajectoryPlanner, points, start):
+    order = planner.order(points, start=start)
+    assert sorted(order) == list(range(len(points))), f"{name}: order is not a permutation"
+
+    initial = planner.travel_time(points, range(len(points)), start)
+    planned = planner.travel_time(points, order, start)
+    print(f"  {name}: initial {initial:.2f}s, planned {planned:.2f}s")
+    assert planned <= initial + 1e-9, f"{name}: planned order is slower ({planned:.2f}s > {initial:.2f}s)"
+    return initial, planned
+
+
+def test_grid_never_worse_than_zigzag():
+    config = config_loader.load_config("settings/config.yaml")
+    planner = TrajectoryPlanner(config)
+    for grid_x, grid_y in ((3, 3), (5, 4), (10, 10)):
+        points = zigzag_points(grid_x, grid_y)
+        for start in ((0.0, 0.0), points[-1], None):
+            check_not_worse(f"{grid_x}x{grid_y} grid from {start}", planner, points, start)
+
+
+def test_scattered_points_improve():
+    """On scattered positions given in random order the planner should clearly beat the given order"""
+    config = config_loader.load_config("settings/config.yaml")
+    planner = TrajectoryPlanner(config)
+    rng = np.random.default_rng(0)
+    for seed in range(3):
+        points = [tuple(point) for point in rng.uniform(0, 20, (40, 2))]
+        initial, planned = check_not_worse(f"40 random points (seed {seed})", planner, points, (0.0, 0.0))
+        assert planned < 0.8 * initial
+
+
+def test_points_on_a_line():
+    """Positions on a line are visited in order of distance from the start"""
+    config = config_loader.load_config("settings/config.yaml")
+    planner = TrajectoryPlanner(config)
+    xs = [3.0, 0.5, 4.0, 1.0, 2.0, 5.5]
+    order = planner.order([(x, 0.0) for x in xs], start=(0.0, 0.0))
+    assert [xs[index] for index in order] == sorted(xs), order
+
+
+def test_optimize_disabled():
+    config = config_loader.load_config("settings/config.yaml")
+    config["stitching"].setdefault("trajectory", {})["optimize"] = False
+    planner = TrajectoryPlanner(config)
+    points = zigzag_points(4, 4)
+    initial = list(reversed(range(len(points))))
+    assert planner.order(points, start=(0.0, 0.0), initial_order=initial) == initial
+
+
+if __name__ == "__main__":
+    print("Testing trajectory planner...")
+    test_grid_never_worse_than_zigzag()
+    test_scattered_points_improve()
+    test_points_on_a_line()
+    test_optimize_disabled()
+    print("✓ Trajectory planner test completed!")
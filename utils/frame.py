@@ -0,0 +1,108 @@
+from datetime import datetime
+from typing import Callable, Optional
+import threading
+
+import numpy as np
+
+
+class Frame:
+    """
+    カメラ画像をコピーせずに共有するための、読み取り専用・参照カウント付きのバッファ
+
+    所有権のルール:
+    - capture() が返した Frame の最初の参照は呼び出し側が持つ。不要になったら release() する
+    - イベントの購読者はコールバック中だけ data を借用できる。コールバック後も保持する場合は
+      acquire() で参照を増やし、使い終わったら release() する
+    - data は読み取り専用のビューなので、書き換えが必要な場合は copy() で複製する
+    - 参照が0になると release_callback にバッファが返される (バッファプールへの返却に使う)
+    """
+
+    def __init__(
+        self,
+        buffer: np.ndarray,
+        timestamp: Optional[datetime] = None,
+        release_callback: Optional[Callable[[np.ndarray], None]] = None,
+    ):
+        self._buffer = buffer
+        # 購読者ごとにビューを作らないよう、同じ読み取り専用ビューを共有する
+        self._view = buffer.view()
+        self._view.flags.writeable = False
+        self.timestamp = timestamp or datetime.now()
+        self._release_callback = release_callback
+        self._refcount = 1
+        self._lock = threading.Lock()
+
+    @property
+    def data(self) -> np.ndarray:
+        """画像データの読み取り専用ビュー"""
+        if self._view is None:
+            raise RuntimeError("Frame has already been released")
+        return self._view
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    @property
+    def dtype(self):
+        return self.data.dtype
+
+    @property
+    def refcount(self) -> int:
+        with self._lock:
+            return self._refcount
+
+    @property
+    def is_released(self) -> bool:
+        return self._view is None
+
+    def acquire(self) -> "Frame":
+        """参照を1つ増やす"""
+        with self._lock:
+            if self._refcount <= 0:
+                raise RuntimeError("Cannot acquire a released frame")
+            self._refcount += 1
+        return self
+
+    def release(self):
+        """参照を1つ減らし、0になったらバッファを返却する"""
+        with self._lock:
+            if self._refcount <= 0:
+                return
+            self._refcount -= 1
+            if self._refcount > 0:
+                return
+            buffer = self._buffer
+            self._buffer = None
+            self._view = None
+
+        if self._release_callback is not None:
+            self._release_callback(buffer)
+
+    def copy(self) -> np.ndarray:
+        """書き込み可能な複製を作る"""
+        return self.data.copy()
+
+    def __array__(self, dtype=None, copy=None):
+        if copy:
+            return np.array(self.data, dtype=dtype, copy=True)
+        if dtype is None or np.dtype(dtype) == self.dtype:
+            return self.data
+        return self.data.astype(dtype)
+
+    def __enter__(self) -> "Frame":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+    def __repr__(self) -> str:
+        shape = self._view.shape if self._view is not None else None
+        return f"Frame(shape={shape}, timestamp={self.timestamp}, refcount={self._refcount})"
+
+
+def as_array(image) -> np.ndarray:
+    """Frame・ndarray・PIL画像などをコピーせずにndarrayとして扱う"""
+    if isinstance(image, Frame):
+        return image.data
+    return np.asarray(image)
@@ -0,0 +1,72 @@
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, Optional, Tuple
+import threading
+
+import numpy as np
+
+from utils.frame import Frame
+
+
+class FramePool:
+    """
+    カメラ画像用のバッファプール
+    - 最初に返却されたバッファの形状・型をプールの形状として採用する (カメラの実際の解像度に合わせるため)
+    - 空きがない場合は新しく確保し、返却時にmax_sizeを超える分は破棄する
+    """
+
+    def __init__(self, max_size: int = 4, shape: Optional[Tuple[int, ...]] = None, dtype=np.uint8):
+        self.max_size = max_size
+        self.shape = tuple(shape) if shape is not None else None
+        self.dtype = np.dtype(dtype)
+        self._free: Deque[np.ndarray] = deque()
+        self._lock = threading.Lock()
+        self.allocations = 0
+        self.reuses = 0
+
+        if self.shape is not None:
+            for _ in range(max_size):
+                self._free.append(np.empty(self.shape, dtype=self.dtype))
+                self.allocations += 1
+
+    def acquire(self) -> Optional[np.ndarray]:
+        """書き込み用のバッファを取得する。形状が未確定の場合はNone"""
+        with self._lock:
+            if self.shape is None:
+                return None
+            if self._free:
+                self.reuses += 1
+                return self._free.popleft()
+            self.allocations += 1
+        return np.empty(self.shape, dtype=self.dtype)
+
+    def release(self, buffer: np.ndarray):
+        """使い終わったバッファを返却する"""
+        with self._lock:
+            if self.shape is None:
+                self.shape = buffer.shape
+                self.dtype = buffer.dtype
+            if buffer.shape != self.shape or buffer.dtype != self.dtype:
+                return
+            if len(self._free) < self.max_size:
+                self._free.append(buffer)
+
+    def reset(self, shape: Tuple[int, ...], dtype=np.uint8):
+        """プールの形状を変更し、空きバッファを破棄する (カメラの解像度が変わった場合)"""
+        with self._lock:
+            self.shape = tuple(shape)
+            self.dtype = np.dtype(dtype)
+            self._free.clear()
+
+    def wrap(self, buffer: np.ndarray, timestamp: Optional[datetime] = None) -> Frame:
+        """バッファをFrameにし、参照がなくなったらこのプールへ返却されるようにする"""
+        return Frame(buffer, timestamp=timestamp, release_callback=self.release)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "shape": self.shape,
+                "free": len(self._free),
+                "allocations": self.allocations,
+                "reuses": self.reuses,
+            }
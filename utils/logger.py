@@ -159,9 +159,9 @@ class MicroscopeLogger:
         """警告ログの簡易関数"""
         self._logger.warning(msg)
 
-    def error(self, msg: str):
+    def error(self, msg: str, exc_info: bool = False):
         """エラーログの簡易関数"""
-        self._logger.error(msg)
+        self._logger.error(msg, exc_info=exc_info)
 
 
 # シングルトンインスタンス